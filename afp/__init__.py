@@ -18,6 +18,19 @@
 # Parser Interface
 from .parser import stream
 from .parser import load
+from .parser import scan
+from .parser import Recovery
+from .aio import astream
+from .incremental import IncrementalParser
+from .index import open_indexed
+from .resources import open_resources
+from .page import pages
+from .text import extract_text
+from .columns import load_ptoca_columns
+
+# Writer Interface
+from .writer import write
+from .structured_field import StructuredField
 
 # Exceptions
 from .exceptions import *
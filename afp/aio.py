@@ -0,0 +1,152 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   asyncio interface to the parser.
+
+   Structured fields are framed from an asyncio.StreamReader - such as one
+   returned by asyncio.open_connection - by their structured field length, so
+   an AFP stream arriving over a socket can be parsed as it arrives without
+   first being written to disk. Each structured field is decoded by the same
+   parser as stream uses, either in the event loop or, to keep the loop free
+   for other streams, in an executor.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import asyncio
+import time
+
+from . import exceptions
+from . import fields
+from . import parser
+
+async def _read_structured_field_length(stream_reader):
+    """Read the optional carriage control character and the structured field
+    length from stream_reader.
+
+    Returns the structured field length and the number of bytes read, or
+    (None, 0) at EOF.
+    """
+    try:
+        b = await stream_reader.readexactly(1)
+    except asyncio.IncompleteReadError:
+        return None, 0
+    try:
+        if b[0] == parser.CARRIAGE_CONTROL_CHAR:
+            length = await stream_reader.readexactly(2)
+            return int.from_bytes(length, 'big'), 3
+        length = b + await stream_reader.readexactly(1)
+        return int.from_bytes(length, 'big'), 2
+    except asyncio.IncompleteReadError:
+        raise exceptions.InvalidStructuredFieldError('Not enough data to read structured field length')
+
+async def astream(stream_reader,
+                  allow_unknown_fields=False,
+                  allow_unknown_triplets=False,
+                  allow_unknown_functions=False,
+                  strict=False,
+                  lazy=False,
+                  include=None,
+                  exclude=None,
+                  hooks=None,
+                  counters=None,
+                  executor=None):
+    """Interface to the parser for asyncio. Parse the AFP stream read from
+    asyncio.StreamReader stream_reader.
+
+    Returns an asynchronous generator of the structured fields, as dictionaries
+    as returned by stream. For example:
+
+        reader, writer = await asyncio.open_connection(host, port)
+        async for sf in afp.astream(reader):
+            # Do something with structured field sf
+
+    Each structured field is read in full before it is decoded. If executor is
+    given - a concurrent.futures executor - the structured fields are decoded
+    in it rather than in the event loop, so that the loop can go on reading
+    other streams meanwhile. A ProcessPoolExecutor needs lazy to be False and
+    hooks and counters to be None, as the parser configuration and results are
+    passed between processes.
+
+    Byte offsets in errors and passed to hooks count from the first byte read
+    from stream_reader.
+
+    For the other arguments see stream.
+    """
+    if include is not None:
+        include = frozenset(include)
+    if exclude is not None:
+        exclude = frozenset(exclude)
+    filtered = include is not None or exclude is not None
+    parser_config = parser.ParserConfig(allow_unknown_fields=allow_unknown_fields,
+                                        allow_unknown_triplets=allow_unknown_triplets,
+                                        allow_unknown_functions=allow_unknown_functions,
+                                        strict=strict,
+                                        hooks=hooks,
+                                        counters=counters)
+    instrumented = parser_config.instrumented
+    loop = asyncio.get_running_loop()
+    field_no = 1
+    field_start_offset = 0
+    try:
+        while True:
+            if instrumented:
+                start_ns = time.perf_counter_ns()
+            sf_length, header_length = await _read_structured_field_length(stream_reader)
+            if sf_length is None:
+                break
+            if sf_length <= 2:
+                raise exceptions.InvalidStructuredFieldError('Structured field incorrect length')
+            try:
+                data = await stream_reader.readexactly(sf_length - 2)
+            except asyncio.IncompleteReadError:
+                raise exceptions.InvalidStructuredFieldError('Not enough data to read structured field')
+            field_end_offset = field_start_offset + header_length + sf_length - 2
+            sf_type_id = None
+            if filtered:
+                sf_type_id = int.from_bytes(data[:parser.SF_TYPE_ID_LENGTH], 'big')
+            if sf_type_id is not None and \
+               ((include is not None and sf_type_id not in include) or
+                (exclude is not None and sf_type_id in exclude)):
+                if instrumented and parser_config.counters is not None:
+                    parser_config.counters.bytes_read += field_end_offset - field_start_offset
+            else:
+                if executor is None:
+                    sf = parser.parse_structured_field(sf_length, memoryview(data), parser_config, lazy=lazy)
+                else:
+                    sf = await loop.run_in_executor(executor,
+                                                    parser.parse_structured_field,
+                                                    sf_length,
+                                                    data,
+                                                    parser_config,
+                                                    lazy)
+                if lazy:
+                    sf.field_no = field_no
+                    sf.field_start_offset = field_start_offset
+                if instrumented:
+                    parser._instrument(parser_config,
+                                       field_no,
+                                       field_start_offset,
+                                       sf[fields.PNAME_SF_TYPE_ID],
+                                       sf_length,
+                                       field_end_offset,
+                                       start_ns)
+                yield sf
+            field_no += 1
+            field_start_offset = field_end_offset
+    except exceptions.ParseError as e:
+        e.field_no = field_no
+        e.field_start_offset = field_start_offset
+        parser.logger.error(e)
+        raise e
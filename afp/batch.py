@@ -0,0 +1,188 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Batch processing of many AFP files across a pool of worker processes, used
+   by the command-line utilities.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import collections
+import concurrent.futures
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from . import exceptions
+
+# The suffix added to the name of an AFP file to name its output file
+DEFAULT_SUFFIX = '.txt'
+
+# The result of processing one file
+# filename - The AFP file processed.
+# spool - The path of the temporary file holding the text output, for the
+#         caller to copy and delete, or None if it was written to its own file.
+# elapsed - The time taken in seconds.
+# error - The error message if processing failed, otherwise None.
+FileResult = collections.namedtuple('FileResult', ['filename', 'spool', 'elapsed', 'error'])
+
+def output_path(filename, outdir, suffix=DEFAULT_SUFFIX):
+    """Return the path in directory outdir of the output for AFP file
+    filename.
+    """
+    return os.path.join(outdir, os.path.basename(filename) + suffix)
+
+def output_paths(afp_files, outdir, suffix=DEFAULT_SUFFIX):
+    """Return the paths in directory outdir of the output for each of the AFP
+    files afp_files.
+
+    The output files are named after the AFP files. If two AFP files in
+    different directories have the same name, the output files are instead
+    placed in the same directory structure under outdir as the AFP files are
+    under the directory they have in common.
+
+    Raises Error if an AFP file is given more than once, as the output of one
+    would overwrite the other.
+    """
+    outpaths = [output_path(filename, outdir, suffix) for filename in afp_files]
+    if _distinct(outpaths):
+        return outpaths
+    filenames = [os.path.abspath(filename) for filename in afp_files]
+    common = os.path.commonpath([os.path.dirname(filename) for filename in filenames])
+    outpaths = [os.path.join(outdir, os.path.relpath(filename, common) + suffix)
+                for filename in filenames]
+    if not _distinct(outpaths):
+        raise exceptions.Error('The same AFP file is given more than once')
+    return outpaths
+
+def _distinct(paths):
+    """Return True if no two of paths name the same file."""
+    return len(set(os.path.normcase(path) for path in paths)) == len(paths)
+
+def process_file(func, filename, outpath=None):
+    """Process a single AFP file.
+
+    Calls func(infile, outfile=outfile) with the AFP file opened in binary and a
+    text file to write the output to - the file at outpath, or a temporary
+    spool file if outpath is None, so that the output isn't held in memory.
+    Errors are caught and returned rather than raised so that one bad file
+    doesn't abort a batch.
+
+    Returns a FileResult.
+    """
+    start = time.perf_counter()
+    spool = None
+    error = None
+    try:
+        with open(filename, 'rb') as infile:
+            if outpath is None:
+                outfile = tempfile.NamedTemporaryFile('w', suffix=DEFAULT_SUFFIX, delete=False)
+                spool = outfile.name
+            else:
+                outfile = open(outpath, 'w')
+            with outfile:
+                func(infile, outfile=outfile)
+    except Exception as e:
+        error = str(e).lower()
+    return FileResult(filename, spool, time.perf_counter() - start, error)
+
+def _copy_spool(spool, outfile):
+    """Copy the output in spool file spool to outfile and delete the spool."""
+    try:
+        with open(spool) as f:
+            shutil.copyfileobj(f, outfile)
+    finally:
+        os.remove(spool)
+
+def _remove_spool(future):
+    """Delete the spool file of the FileResult of a finished future."""
+    if future.done() and not future.cancelled() and future.exception() is None:
+        spool = future.result().spool
+        if spool is not None and os.path.exists(spool):
+            os.remove(spool)
+
+def process_files(func,
+                  afp_files,
+                  jobs=1,
+                  outdir=None,
+                  outfile=sys.stdout,
+                  suffix=DEFAULT_SUFFIX,
+                  header=None,
+                  prog=None):
+    """Process many AFP files, continuing past files that fail.
+
+    Each file is processed with func as described in process_file. If outdir
+    is given the output of each file is written to its own file in that
+    directory - see output_paths - otherwise the output of all the files is
+    written to outfile in the order of afp_files. The time taken by each file and any errors are
+    reported on stderr.
+
+    Arguments:
+    func - The function to process a file. It must be picklable - a
+           module-level function or a functools.partial of one - if jobs is
+           more than 1.
+    afp_files - The filenames of the AFP files.
+    jobs - The number of worker processes. 1 processes the files in this
+           process.
+    outdir - The directory to write the output files to.
+    outfile - The file to write the output to if outdir is None.
+    suffix - The suffix added to an AFP file name to name its output file.
+    header - A function header(filename, outfile) printing a heading before
+             the output of each file written to outfile, if there is more than
+             one file.
+    prog - The name of the utility for messages.
+
+    Returns the number of files that failed.
+    """
+    if prog is None:
+        prog = os.path.basename(sys.argv[0])
+    if outdir is None:
+        outpaths = [None] * len(afp_files)
+    else:
+        outpaths = output_paths(afp_files, outdir, suffix)
+        for outpath in outpaths:
+            os.makedirs(os.path.dirname(outpath) or os.curdir, exist_ok=True)
+    if jobs > 1:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+        futures = [executor.submit(process_file, func, filename, outpath)
+                   for filename, outpath in zip(afp_files, outpaths)]
+        results = (future.result() for future in futures)
+    else:
+        executor = None
+        futures = []
+        results = (process_file(func, filename, outpath)
+                   for filename, outpath in zip(afp_files, outpaths))
+    failures = 0
+    try:
+        for result in results:
+            if result.spool is not None:
+                if header is not None and len(afp_files) > 1:
+                    header(result.filename, outfile)
+                _copy_spool(result.spool, outfile)
+            if result.error is None:
+                print('{0}: {1}: {2:.3f}s'.format(prog, result.filename, result.elapsed), file=sys.stderr)
+            else:
+                failures += 1
+                print('{0}: error: {1}: {2} ({3:.3f}s)'.format(prog, result.filename, result.error, result.elapsed), file=sys.stderr)
+    finally:
+        if executor is not None:
+            for future in futures:
+                future.cancel()
+            executor.shutdown()
+            # Spool files of files processed but not copied to outfile
+            for future in futures:
+                _remove_spool(future)
+    return failures
@@ -0,0 +1,140 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Decoding text in the code page of its font.
+
+   A code page is identified by its Code Page Global Identifier (CPGID). The
+   table for decoding a code page is built once, from the Python codec of the
+   same number - CPGID 37 is codec cp037, 500 is cp500 and so on - or from an
+   encoding given to register, and then cached. Code pages without a codec are
+   decoded as the default code page, 500, which is what CHAR parameters are
+   decoded with.
+
+   The code page of each coded font is found from the Map Coded Font structured
+   fields: for MCF-1 from the name of its code page, for MCF from the Coded
+   Graphic Character Set Global Identifier triplet (0x01) or the Fully
+   Qualified Name triplet (0x02) of its code page.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import codecs
+
+from . import fields
+from . import parser
+from . import triplets
+
+# The code page text is decoded with when no other is known - International #5
+DEFAULT_CPGID = 500
+
+# Triplet 0x24 resource type of a coded font
+RESOURCE_TYPE_CODED_FONT = 0x05
+# Triplet 0x02 FQN type of a code page name reference
+FQN_TYPE_CODE_PAGE_NAME = 0x85
+
+# The encodings registered for code pages, by CPGID
+_encodings = {}
+# The decoding tables built so far, by CPGID
+_decoding_tables = {}
+
+def register(cpgid, encoding):
+    """Register the Python encoding to decode code page cpgid with, for code
+    pages whose encoding isn't named after their number.
+    """
+    codecs.lookup(encoding)
+    _encodings[cpgid] = encoding
+    _decoding_tables.pop(cpgid, None)
+
+def _build_decoding_table(cpgid):
+    """Build the decoding table for code page cpgid, or return None if there is
+    no codec for it.
+    """
+    encoding = _encodings.get(cpgid, 'cp{0:03d}'.format(cpgid))
+    try:
+        return bytes(range(256)).decode(encoding, errors='replace')
+    except LookupError:
+        return None
+
+def decoding_table(cpgid=DEFAULT_CPGID):
+    """Return the decoding table of code page cpgid - a string of 256
+    characters giving the character for each byte.
+
+    The table of a code page without a codec is that of DEFAULT_CPGID.
+    """
+    try:
+        return _decoding_tables[cpgid]
+    except KeyError:
+        pass
+    table = _build_decoding_table(cpgid)
+    if table is None:
+        table = decoding_table(DEFAULT_CPGID)
+    _decoding_tables[cpgid] = table
+    return table
+
+def decode(b, table=None):
+    """Decode bytes b with a decoding table, by default that of the default
+    code page.
+    """
+    if table is None:
+        table = decoding_table()
+    return codecs.charmap_decode(b, 'strict', table)[0]
+
+def cpgid_from_name(name):
+    """Return the CPGID of a code page from its name, or None if it can't be
+    told.
+
+    IBM code page names start 'T1' followed by two characters, and end with the
+    CPGID - 'T1V10500' is code page 500, 'T1001140' is 1140.
+    """
+    if name is None or len(name) != 8 or not name.startswith('T1'):
+        return None
+    digits = name[4:]
+    if not digits.isdigit():
+        return None
+    return int(digits)
+
+def font_code_pages(sf):
+    """Return the code pages of the coded fonts mapped by structured field sf.
+
+    Arguments:
+    sf - A parsed MCF or MCF-1 structured field.
+
+    Returns:
+    Dictionary of the CPGID of each coded font by its local ID. Fonts whose
+    code page can't be told are left out.
+    """
+    result = {}
+    sf_type_id = sf[fields.PNAME_SF_TYPE_ID]
+    for group in sf.get(parser.PNAME_REPEATING_GROUP, []):
+        if sf_type_id == fields.SF_MCF_1:
+            cpgid = cpgid_from_name(group.get('CPName'))
+            if cpgid is not None and 'CFLid' in group:
+                result[group['CFLid']] = cpgid
+            continue
+        lid = None
+        cpgid = None
+        name_cpgid = None
+        for triplet in group.get(fields.PNAME_TRIPLETS, []):
+            t_id = triplet[triplets.PNAME_T_ID]
+            if t_id == triplets.TT_24 and triplet.get('ResType') == RESOURCE_TYPE_CODED_FONT:
+                lid = triplet.get('ResLID')
+            elif t_id == triplets.TT_01:
+                cpgid = triplet.get('ID') or None
+            elif t_id == triplets.TT_02 and triplet.get('FQNType') == FQN_TYPE_CODE_PAGE_NAME:
+                name_cpgid = cpgid_from_name(triplet.get('FQName'))
+        if cpgid is None:
+            cpgid = name_cpgid
+        if lid is not None and cpgid is not None:
+            result[lid] = cpgid
+    return result
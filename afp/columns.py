@@ -0,0 +1,211 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Columnar loading of the PTOCA control sequences in an AFP file.
+
+   Rather than a dictionary for each control sequence, the control sequences
+   of all the PTX structured fields in a file are held in arrays - one entry
+   per control sequence in each array - with their main numeric operands
+   decoded into arrays of their own. The PTOCA data itself is kept once, in a
+   single buffer, and the data of each control sequence, such as the text of
+   a TRN, is found by its offset into the buffer.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import array
+
+from . import codepages
+from . import exceptions
+from . import fields
+from . import functions
+from . import parser
+from . import reader
+
+_ESCAPE_SEQUENCE = parser.PTX_ESCAPE_SEQUENCE.to_bytes(2, 'big')
+
+# The columns of a PtocaColumns, in order, and their array type codes
+COLUMNS = (
+    ('field_no', 'l'),
+    ('function', 'B'),
+    ('offset', 'q'),
+    ('length', 'B'),
+    ('dsplcmnt', 'i'),
+    ('incrment', 'i'),
+    ('rlength', 'i'),
+    ('rwidth', 'i'),
+    ('lid', 'H'),
+)
+
+class PtocaColumns:
+    """The PTOCA control sequences of an AFP file, in columns.
+
+    Row i of each column is the i-th control sequence in the file. Operands a
+    control sequence doesn't have, or that are missing from it, are 0.
+
+    Attributes:
+    data - Buffer of the PTOCA data of every PTX structured field, one after
+           another.
+    field_no - Array of the field number of the PTX holding each control
+               sequence.
+    function - Array of the function type of each control sequence, chained
+               or unchained - see functions.py.
+    offset - Array of the offset in data of the data of each control sequence,
+             following its length and function type.
+    length - Array of the length of each control sequence, including its
+             length and function type but not the escape sequence.
+    dsplcmnt - Array of the DSPLCMNT operand of AMI and AMB.
+    incrment - Array of the INCRMENT operand of RMI, RMB and SVI.
+    rlength - Array of the RLENGTH operand of DIR, DBR and RPS.
+    rwidth - Array of the RWIDTH operand of DIR and DBR.
+    lid - Array of the LID operand of SCFL, BSU and ESU.
+    """
+    def __init__(self):
+        self.data = bytearray()
+        for name, typecode in COLUMNS:
+            setattr(self, name, array.array(typecode))
+
+    def __len__(self):
+        return len(self.function)
+
+    def function_data(self, i):
+        """Return a memoryview of the data of control sequence i, following
+        its length and function type - for a TRN, its text.
+        """
+        offset = self.offset[i]
+        return memoryview(self.data)[offset:offset + self.length[i] - 2]
+
+    def text(self, i, decoding_table=None):
+        """Return the text of control sequence i - the TRNDATA of a TRN or the
+        RPTDATA of an RPS - with leading and trailing whitespace removed as by
+        the parser.
+
+        For any other function the whole of its data is decoded.
+        decoding_table is as for codepages.decode.
+        """
+        data = self.function_data(i)
+        if self.function[i] & 0xFE == functions.FN_U_RPS:
+            # RPTDATA follows the 2-byte RLENGTH
+            data = data[2:]
+        return codepages.decode(bytes(data), decoding_table).strip()
+
+    def to_numpy(self):
+        """Return a dictionary of the columns as NumPy arrays, by name.
+
+        The arrays share the memory of the columns rather than copying them, so
+        the columns mustn't be added to while the NumPy arrays are in use.
+        Requires NumPy.
+        """
+        import numpy
+        return {name: numpy.frombuffer(getattr(self, name), dtype=getattr(self, name).typecode)
+                for name, typecode in COLUMNS}
+
+    def _scan(self, ptoca_data, field_no):
+        """Add the control sequences of the PTOCA data of a PTX structured
+        field to the columns.
+        """
+        data = bytes(ptoca_data)
+        base = len(self.data)
+        self.data += data
+        field_nos = self.field_no
+        function_column = self.function
+        offsets = self.offset
+        lengths = self.length
+        dsplcmnts = self.dsplcmnt
+        incrments = self.incrment
+        rlengths = self.rlength
+        rwidths = self.rwidth
+        lids = self.lid
+        n = len(data)
+        p = 0
+        count = 0
+        chained = False
+        while p < n:
+            count += 1
+            if not chained:
+                if data[p:p + 2] != _ESCAPE_SEQUENCE:
+                    if p + 2 > n:
+                        raise exceptions.InvalidControlSequenceError('Not enough data to parse control sequence {0} escape sequence'.format(count))
+                    raise exceptions.InvalidControlSequenceError('Missing 0x{0:X} escape sequence before control sequence {1}'.format(parser.PTX_ESCAPE_SEQUENCE, count))
+                p += 2
+            if p + 2 > n:
+                raise exceptions.InvalidControlSequenceError('Not enough data to parse control sequence {0} function'.format(count))
+            length = data[p]
+            function = data[p + 1]
+            end = p + length
+            if length < 2 or end > n:
+                raise exceptions.InvalidControlSequenceError('Not enough data to parse control sequence {0} function data'.format(count))
+            dsplcmnt = incrment = rlength = rwidth = lid = 0
+            # The unchained and chained versions of a function differ in the
+            # lowest bit
+            fn = function & 0xFE
+            if fn == functions.FN_U_TRN:
+                pass
+            elif fn in (functions.FN_U_AMI, functions.FN_U_AMB):
+                if length >= 4:
+                    dsplcmnt = int.from_bytes(data[p + 2:p + 4], 'big', signed=True)
+            elif fn in (functions.FN_U_RMI, functions.FN_U_RMB, functions.FN_U_SVI):
+                if length >= 4:
+                    incrment = int.from_bytes(data[p + 2:p + 4], 'big', signed=True)
+            elif fn in (functions.FN_U_SCFL, functions.FN_U_BSU, functions.FN_U_ESU):
+                if length >= 3:
+                    lid = data[p + 2]
+            elif fn in (functions.FN_U_DIR, functions.FN_U_DBR):
+                if length >= 4:
+                    rlength = int.from_bytes(data[p + 2:p + 4], 'big', signed=True)
+                if length >= 7:
+                    rwidth = int.from_bytes(data[p + 4:p + 7], 'big', signed=True)
+            elif fn == functions.FN_U_RPS:
+                if length >= 4:
+                    rlength = int.from_bytes(data[p + 2:p + 4], 'big')
+            field_nos.append(field_no)
+            function_column.append(function)
+            offsets.append(base + p + 2)
+            lengths.append(length)
+            dsplcmnts.append(dsplcmnt)
+            incrments.append(incrment)
+            rlengths.append(rlength)
+            rwidths.append(rwidth)
+            lids.append(lid)
+            chained = function & 1
+            p = end
+        if chained:
+            raise exceptions.InvalidControlSequenceError('Final function is chained')
+
+def load_ptoca_columns(f):
+    """Load the PTOCA control sequences of the PTX structured fields of AFP
+    file f into columns.
+
+    Returns a PtocaColumns. As with parser.stream, f can be a file opened in
+    binary or the path of a file. Only the PTX structured fields are read, and
+    errors in the PTOCA data are raised as they would be by the parser.
+    Unknown functions are kept, with no operands.
+    """
+    columns = PtocaColumns()
+    parser_config = parser.ParserConfig(allow_unknown_fields=True,
+                                        allow_unknown_triplets=True,
+                                        allow_unknown_functions=True)
+    r = reader.open_reader(f)
+    try:
+        for sf in parser.read_structured_fields(r, parser_config, lazy=True, include={fields.SF_PTX}):
+            try:
+                columns._scan(sf.data, sf.field_no)
+            except exceptions.ParseError as e:
+                e.field_no = sf.field_no
+                e.field_start_offset = sf.field_start_offset
+                parser.logger.error(e)
+                raise e
+    finally:
+        r.close()
+    return columns
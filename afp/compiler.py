@@ -0,0 +1,357 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Compiles the syntaxes defined in fields.py, triplets.py and functions.py into
+   decoders.
+
+   parser.parse_syntax interprets a syntax afresh for every structured field,
+   triplet and control sequence it parses. A SyntaxDecoder does the analysis of
+   the syntax once: the parameters at fixed offsets at the start of the syntax
+   are decoded with a single precompiled struct, names that can't clash are
+   assigned directly, and the open-ended parameter or repeating group at the end
+   of the syntax is handled by targeted code.
+
+   Whenever the data doesn't fit the fast path - parameters are missing or
+   incomplete, or debugging output is enabled - a decoder hands the data to
+   parse_syntax, so the results are always the same as parse_syntax's.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import struct
+
+from . import codepages
+from . import exceptions
+from . import fields
+from . import functions
+from . import parser
+from . import records
+from . import triplets
+
+# struct format characters for numbers of the sizes struct supports
+_UNSIGNED_FORMATS = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+_SIGNED_FORMATS = {1: 'b', 2: 'h', 4: 'i', 8: 'q'}
+
+# Parameter names that may already be in the result dictionary when a syntax
+# is decoded - a structured field's parameters are added to the dictionary
+# holding its introducer.
+_SHARED_NAMES = frozenset([param.name for param in fields.SYNTAX_SFI] + [fields.PNAME_SF_LENGTH])
+
+# Preprocessor functions the decoder handles itself
+_GROUP_LENGTH_PREPROCS = (fields._next_group_length, fields._this_group_length)
+
+def _ubin(b):
+    """Convert bytes to an unsigned binary number."""
+    return int.from_bytes(b, 'big')
+
+def _sbin(b):
+    """Convert bytes to a signed binary number."""
+    return int.from_bytes(b, 'big', signed=True)
+
+def _chars(b):
+    """Convert EBCDIC bytes to text."""
+    return codepages.decode(b).strip()
+
+def _param_format(param):
+    """Return the struct format and converter function for a fixed-length
+    parameter.
+
+    The converter is None where struct returns the final value.
+    """
+    if param.datatype in (fields.PTYPE_CODE, fields.PTYPE_UBIN):
+        if param.length in _UNSIGNED_FORMATS:
+            return _UNSIGNED_FORMATS[param.length], None
+        return '{0}s'.format(param.length), _ubin
+    if param.datatype == fields.PTYPE_SBIN:
+        if param.length in _SIGNED_FORMATS:
+            return _SIGNED_FORMATS[param.length], None
+        return '{0}s'.format(param.length), _sbin
+    if param.datatype == fields.PTYPE_BYTE:
+        if param.length == 1:
+            return 'B', None
+        return '{0}s'.format(param.length), list
+    if param.datatype == fields.PTYPE_CHAR:
+        return '{0}s'.format(param.length), _chars
+    return None, None
+
+class _NotCompilable(Exception):
+    """Raised while compiling a syntax the decoder doesn't support."""
+    pass
+
+class SyntaxDecoder:
+    """Decodes data according to a syntax - the compiled form of the syntax.
+
+    A syntax is compiled into:
+    - a prefix: the parameters with a fixed offset and length at the start of
+      the syntax, decoded with a single struct;
+    - then either a tail: a final open-ended parameter, such as triplets or
+      PTOCA control sequences;
+    - or a repeating group, which is itself compiled to a SyntaxDecoder;
+    - or a remainder: parameters with preprocessor functions, which are only
+      interpreted when their preprocessor doesn't suppress them.
+
+    Syntaxes that don't fit that shape are left to parse_syntax.
+    """
+    def __init__(self, syntax):
+        self.syntax = syntax
+        # True if the syntax can't be compiled and parse_syntax is always used
+        self._generic = False
+        self._prefix = []
+        self._struct = None
+        self._converters = ()
+        self._names = ()
+        self._direct = ()
+        # The byte offset after the prefix
+        self._end = 0
+        # The index of the first prefix parameter after which all are optional
+        self._optional_from = 0
+        # Structs for decoding the first k parameters of the prefix, for data
+        # missing optional parameters at the end of the prefix
+        self._partial_structs = {}
+        # Index into the prefix of the parameter holding the length of the
+        # next repeating group, or of the current group.
+        self._next_group_length = None
+        self._this_group_length = False
+        self._tail = None
+        self._tail_direct = False
+        self._remainder = ()
+        self._group = None
+        self._group_length = 0
+        try:
+            self._compile(list(syntax))
+        except _NotCompilable:
+            self._generic = True
+
+    def _compile(self, items):
+        """Build the plan for decoding the syntax."""
+        if len(items) > 0 and type(items[-1]) == list:
+            group = items.pop()
+            self._group = SyntaxDecoder(group)
+            self._group_length = self._fixed_length(group)
+        i = 0
+        while i < len(items):
+            param = items[i]
+            if type(param) == list:
+                # Repeating groups are only supported at the end of a syntax
+                raise _NotCompilable()
+            if param.length == 0 or (param.preproc is not None and
+                                     param.preproc not in _GROUP_LENGTH_PREPROCS):
+                break
+            fmt, converter = _param_format(param)
+            if fmt is None or param.offset < self._end:
+                break
+            if param.preproc == fields._next_group_length:
+                self._next_group_length = i
+            elif param.preproc == fields._this_group_length:
+                if i != 0 or param.datatype != fields.PTYPE_UBIN:
+                    raise _NotCompilable()
+                self._this_group_length = True
+            self._prefix.append((param, fmt, converter))
+            self._end = param.offset + param.length
+            i += 1
+        rest = items[i:]
+        if len(rest) == 1 and rest[0].length == 0 and rest[0].preproc is None:
+            self._tail = rest[0]
+        elif len(rest) > 0:
+            for param in rest:
+                if type(param) == list or param.preproc in _GROUP_LENGTH_PREPROCS:
+                    raise _NotCompilable()
+            self._remainder = rest
+        if self._group is not None and (self._tail is not None or len(self._remainder) > 0):
+            raise _NotCompilable()
+        self._struct = self._prefix_struct(len(self._prefix))
+        self._optional_from = len(self._prefix)
+        while self._optional_from > 0 and not self._prefix[self._optional_from - 1][0].mandatory:
+            self._optional_from -= 1
+        self._converters = tuple(converter for param, fmt, converter in self._prefix)
+        self._names = tuple(param.name for param, fmt, converter in self._prefix)
+        # Names that appear once in the syntax and can't already be in the
+        # result are assigned directly, the others go through _add_param so
+        # that they are numbered.
+        names = [param.name for param in items]
+        unique = set(name for name in names if names.count(name) == 1 and name not in _SHARED_NAMES)
+        self._direct = tuple(name in unique for name in self._names)
+        if self._tail is not None:
+            self._tail_direct = self._tail.name in unique
+
+    def _prefix_struct(self, k):
+        """Return a struct to decode the first k parameters of the prefix,
+        skipping any gaps between parameters.
+        """
+        fmt = '>'
+        offset = 0
+        for param, param_fmt, converter in self._prefix[:k]:
+            if param.offset > offset:
+                fmt += '{0}x'.format(param.offset - offset)
+            fmt += param_fmt
+            offset = param.offset + param.length
+        return struct.Struct(fmt)
+
+    def _partial_values(self, data):
+        """Decode the prefix from data that is too short for all of it.
+
+        Returns the values of the parameters present, or None if a mandatory
+        parameter is missing or a parameter is incomplete.
+        """
+        n = len(data)
+        k = 0
+        while k < len(self._prefix) and self._prefix[k][0].offset + self._prefix[k][0].length <= n:
+            k += 1
+        if k < self._optional_from or self._prefix[k][0].offset < n:
+            return None
+        if self._next_group_length is not None and self._next_group_length >= k:
+            return None
+        if k not in self._partial_structs:
+            self._partial_structs[k] = self._prefix_struct(k)
+        return self._partial_structs[k].unpack_from(data)
+
+    @staticmethod
+    def _fixed_length(syntax):
+        """Return the number of bytes in a syntax, or zero if it has optional or
+        open-ended parameters - as parser.syntax_length.
+        """
+        length = 0
+        for param in syntax:
+            if type(param) == list or not param.mandatory or param.length == 0:
+                return 0
+            length += param.length
+        return length
+
+    def _decode_tail(self, data, parser_config):
+        """Decode the open-ended parameter at the end of the syntax."""
+        tail = self._tail
+        if tail.datatype == fields.PTYPE_TRIPLET:
+            return parser.parse_triplets(data, parser_config, offset=tail.offset)
+        elif tail.datatype == fields.PTYPE_PTOCA:
+            return parser.parse_ptoca(data, parser_config, offset=tail.offset)
+        elif tail.datatype == fields.PTYPE_BYTE:
+            return list(data[tail.offset:])
+        elif tail.datatype == fields.PTYPE_CHAR:
+            return _chars(bytes(data[tail.offset:]))
+        elif tail.datatype == fields.PTYPE_SBIN:
+            return parser.parse_sbin(data, 0, offset=tail.offset)
+        return parser.parse_ubin(data, 0, offset=tail.offset)
+
+    def decode(self, data, parser_config, result=None, param_appearance_counters=None):
+        """Decode data - arguments and return value are as for
+        parser.parse_syntax, without the syntax.
+        """
+        if data is None:
+            data = b''
+        if self._generic or parser_config.debug:
+            return parser.parse_syntax(data, self.syntax, parser_config, result, param_appearance_counters)
+        whole_data = data
+        n = len(data)
+        if self._this_group_length:
+            # The first parameter holds the length of this repeating group
+            param = self._prefix[0][0]
+            if n < param.offset + param.length:
+                return parser.parse_syntax(data, self.syntax, parser_config, result, param_appearance_counters)
+            length = int.from_bytes(data[param.offset:param.offset + param.length], 'big')
+            if length == 0:
+                raise exceptions.RepeatingGroupError('Repeating group length cannot be zero')
+            if length > n:
+                raise exceptions.RepeatingGroupError('Repeating group length longer than available data')
+            data = data[0:length]
+            n = length
+        if n >= self._end:
+            values = self._struct.unpack_from(data)
+        else:
+            values = self._partial_values(data)
+        if values is None or (self._tail is not None and self._tail.mandatory and self._tail.offset >= n):
+            # Missing or incomplete parameters
+            return parser.parse_syntax(whole_data, self.syntax, parser_config, result, param_appearance_counters)
+        if result is None:
+            result = records.record_class(self.syntax)() if parser_config.compact else {}
+        if param_appearance_counters is None:
+            param_appearance_counters = {}
+        converters = self._converters
+        names = self._names
+        direct = self._direct
+        # Records are filled straight through their slots
+        slot_names = result._slot_names if parser_config.compact else None
+        for i in range(len(values)):
+            value = values[i]
+            if converters[i] is not None:
+                value = converters[i](value)
+            if direct[i]:
+                if slot_names is None:
+                    result[names[i]] = value
+                else:
+                    setattr(result, slot_names[names[i]], value)
+            else:
+                parser._add_param(names[i], value, result, param_appearance_counters)
+        if self._tail is not None:
+            if self._tail.offset < n:
+                value = self._decode_tail(data, parser_config)
+                if self._tail_direct and slot_names is not None:
+                    setattr(result, slot_names[self._tail.name], value)
+                elif self._tail_direct:
+                    result[self._tail.name] = value
+                else:
+                    parser._add_param(self._tail.name, value, result, param_appearance_counters)
+        elif len(self._remainder) > 0:
+            for i, param in enumerate(self._remainder):
+                if param.preproc is None or param.preproc(result, param) is not None:
+                    return parser.parse_syntax(data, self._remainder[i:], parser_config, result, param_appearance_counters)
+        elif self._group is not None:
+            group_length = self._group_length
+            if self._next_group_length is not None:
+                group_length = values[self._next_group_length]
+                if converters[self._next_group_length] is not None:
+                    group_length = converters[self._next_group_length](group_length)
+                if group_length == 0:
+                    raise exceptions.RepeatingGroupError('Repeating group length cannot be zero')
+            value = []
+            offset = self._end
+            while offset < n:
+                if group_length != 0:
+                    if offset + group_length > n:
+                        raise exceptions.RepeatingGroupError('Repeating group length longer than available data')
+                    group_data = data[offset:offset + group_length]
+                else:
+                    group_data = data[offset:]
+                group_result, bytes_processed = self._group.decode(group_data, parser_config)
+                value.append(group_result)
+                offset += bytes_processed
+            if len(value) > 0:
+                parser._add_param(parser.PNAME_REPEATING_GROUP, value, result, param_appearance_counters)
+        return result, n
+
+# Compiled syntaxes, keyed by the id of the syntax
+_decoders = {}
+
+def syntax_decoder(syntax):
+    """Return the SyntaxDecoder for a syntax, compiling it on first use."""
+    entry = _decoders.get(id(syntax))
+    if entry is None or entry[0] is not syntax:
+        entry = (syntax, SyntaxDecoder(syntax))
+        _decoders[id(syntax)] = entry
+    return entry[1]
+
+def decode_syntax(data, syntax, parser_config, result=None, param_appearance_counters=None):
+    """Drop-in replacement for parser.parse_syntax using the compiled form of
+    the syntax.
+    """
+    return syntax_decoder(syntax).decode(data, parser_config, result, param_appearance_counters)
+
+# Ready-made decoders for the explicitly-supported structured fields, triplets
+# and functions
+SFI_DECODER = syntax_decoder(fields.SYNTAX_SFI)
+SF_DECODERS = {sf_type_id: syntax_decoder(sf_type.syntax)
+               for sf_type_id, sf_type in fields.SF_TYPES.items()}
+TRIPLET_DECODERS = {t_id: syntax_decoder(triplet_type.syntax)
+                    for t_id, triplet_type in triplets.TRIPLET_TYPES.items()}
+FUNCTION_DECODERS = {function: syntax_decoder(fn_info.syntax)
+                     for function, fn_info in functions.FUNCTIONS.items()}
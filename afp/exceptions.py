@@ -21,6 +21,15 @@ class Error(Exception):
     """Generic AFP parser exception."""
     pass
 
+class InvalidIndexError(Error):
+    """Exception reading a structured field index, or an index that doesn't
+    match its AFP file."""
+    pass
+
+class EncodeError(Error):
+    """Exception while encoding structured fields to write an AFP stream."""
+    pass
+
 class ParseError(Error):
     """Exception while parsing the AFP stream."""
 
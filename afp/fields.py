@@ -21,6 +21,8 @@
 
 import collections
 
+from . import exceptions
+
 # Data types
 PTYPE_CODE    = 1
 PTYPE_BYTE    = 2
@@ -111,7 +113,12 @@ def _suppress_if_no_extension(sf, param):
     Returns:
     The parameter in the syntax being processed or None if we wish to suppress
     the parameter.
+
+    Raises InvalidStructuredFieldError if the Structured Field Introducer is
+    too short to hold the flag byte.
     """
+    if PNAME_FLAG_BYTE not in sf:
+        raise exceptions.InvalidStructuredFieldError('Structured Field Introducer is truncated')
     if sfi_ext_flag(sf[PNAME_FLAG_BYTE]):
         return param
     else:
@@ -128,8 +135,13 @@ def _set_extension_length(sf, param):
     Returns:
     The Structured Field Introducer ExtData parameter with the length attribute
     set, or None if the Structured Field Introducer has no extension.
+
+    Raises InvalidStructuredFieldError if the extension flag is set but the
+    Structured Field Introducer is too short to hold the ExtLength parameter.
     """
     if sfi_ext_flag(sf[PNAME_FLAG_BYTE]):
+        if PNAME_EXT_LENGTH not in sf or sf[PNAME_EXT_LENGTH] < 1:
+            raise exceptions.InvalidStructuredFieldError('Structured Field Introducer extension is truncated')
         return ParameterType(param.offset,
                              sf[PNAME_EXT_LENGTH] - 1,
                              param.datatype,
@@ -490,14 +502,19 @@ SF_TYPES = {
     SF_TLE:   StructuredFieldType('TLE',   'Tag Logical Element',                        SYNTAX_FIELD_TLE),
 }
 
+# The bits of the Structured Field Introducer flag byte
+SFI_EXT_FLAG = 0b10000000
+SFI_SEG_FLAG = 0b00100000
+SFI_PAD_FLAG = 0b00001000
+
 def sfi_ext_flag(b):
     """Return true if the Stuctured Field Introducer extension flag is set."""
-    return b & 0b10000000 > 0
+    return b & SFI_EXT_FLAG > 0
 
 def sfi_seg_flag(b):
     """Return true if the Structured Field Introducer segmented flag is set."""
-    return b & 0b00100000 > 0
+    return b & SFI_SEG_FLAG > 0
 
 def sfi_pad_flag(b):
     """Return true if the Stuctured Field Introducer padding flag is set."""
-    return b & 0b00001000 > 0
+    return b & SFI_PAD_FLAG > 0
@@ -0,0 +1,237 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Incremental parser, fed the bytes of an AFP stream as they arrive.
+
+   The chunks fed to the parser are kept as they are in a queue and not
+   joined together. A structured field that lies within one chunk is decoded
+   from a memoryview of the chunk without being copied; only the bytes of a
+   structured field that is split between chunks are copied, into a buffer
+   the size of that structured field.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import collections
+import time
+
+from . import exceptions
+from . import fields
+from . import parser
+
+class IncrementalParser:
+    """Parser that is fed an AFP stream a chunk at a time, for example from a
+    message queue or an HTTP upload, and returns each structured field once
+    all of its bytes have arrived:
+
+        incremental_parser = afp.IncrementalParser()
+        for chunk in chunks:
+            for sf in incremental_parser.feed(chunk):
+                # Do something with structured field sf
+        incremental_parser.close()
+
+    When a structured field fails to parse, feed returns the structured fields
+    completed before it, if there are any, and the ParseError is raised by the
+    next call to feed or close. If there aren't, the ParseError is raised
+    straight away. Once a ParseError has been raised the parser can't be fed
+    any more.
+
+    Attributes:
+    field_no - The field number of the next structured field.
+    offset - The number of bytes fed to the parser that have been parsed,
+             which is the byte offset of the next structured field.
+    buffered - The number of bytes fed to the parser that are waiting for the
+               rest of their structured field.
+    """
+    def __init__(self,
+                 allow_unknown_fields=False,
+                 allow_unknown_triplets=False,
+                 allow_unknown_functions=False,
+                 strict=False,
+                 lazy=False,
+                 include=None,
+                 exclude=None,
+                 hooks=None,
+                 counters=None):
+        """
+        For the arguments see parser.stream. The time passed to the hooks is
+        the time taken to decode each structured field once it has arrived.
+        """
+        self._parser_config = parser.ParserConfig(allow_unknown_fields=allow_unknown_fields,
+                                                  allow_unknown_triplets=allow_unknown_triplets,
+                                                  allow_unknown_functions=allow_unknown_functions,
+                                                  strict=strict,
+                                                  hooks=hooks,
+                                                  counters=counters)
+        self._lazy = lazy
+        self._include = None if include is None else frozenset(include)
+        self._exclude = None if exclude is None else frozenset(exclude)
+        self.field_no = 1
+        self.offset = 0
+        self.buffered = 0
+        # memoryviews of the chunks fed and not yet parsed, the first one
+        # sliced past the bytes already parsed
+        self._chunks = collections.deque()
+        self._failed = False
+        # The ParseError held back to return the structured fields parsed
+        # before it, raised on the next call to feed or close
+        self._error = None
+
+    def _peek(self, n):
+        """Return the next n bytes, which must have been fed, without
+        consuming them.
+        """
+        first = self._chunks[0]
+        if len(first) >= n:
+            return first[:n]
+        b = bytearray()
+        for chunk in self._chunks:
+            b += chunk[:n - len(b)]
+            if len(b) == n:
+                break
+        return b
+
+    def _take(self, n):
+        """Consume the next n bytes, which must have been fed.
+
+        Returns a buffer of the bytes - a slice of the chunk they're in, or a
+        copy if they are split between chunks.
+        """
+        self.buffered -= n
+        first = self._chunks[0]
+        if len(first) > n:
+            self._chunks[0] = first[n:]
+            return first[:n]
+        if len(first) == n:
+            return self._chunks.popleft()
+        b = bytearray(n)
+        filled = 0
+        while filled < n:
+            chunk = self._chunks[0]
+            count = min(len(chunk), n - filled)
+            b[filled:filled + count] = chunk[:count]
+            filled += count
+            if count == len(chunk):
+                self._chunks.popleft()
+            else:
+                self._chunks[0] = chunk[count:]
+        return memoryview(b)
+
+    def _filtered_out(self, sf_type_id):
+        """Return True if structured fields of type sf_type_id are filtered-out
+        by include or exclude.
+        """
+        return (self._include is not None and sf_type_id not in self._include) or \
+               (self._exclude is not None and sf_type_id in self._exclude)
+
+    def feed(self, chunk):
+        """Feed the next chunk of bytes of the AFP stream to the parser.
+
+        chunk is a bytes-like object. Objects other than bytes are copied, as
+        the parser holds on to the bytes of incomplete structured fields and
+        of lazily-parsed structured fields.
+
+        Returns a list of the structured fields completed by the chunk, as
+        dictionaries or, if lazy is True, StructuredField objects. If a
+        structured field fails to parse, the structured fields before it are
+        returned and the ParseError is raised by the next call to feed or
+        close.
+        """
+        self._raise_error()
+        if self._failed:
+            raise exceptions.Error('The parser failed on an earlier chunk')
+        if not isinstance(chunk, bytes):
+            chunk = bytes(chunk)
+        if len(chunk) > 0:
+            self._chunks.append(memoryview(chunk))
+            self.buffered += len(chunk)
+        parser_config = self._parser_config
+        instrumented = parser_config.instrumented
+        filtered = self._include is not None or self._exclude is not None
+        result = []
+        try:
+            while self.buffered > 0:
+                header_length = 3 if self._chunks[0][0] == parser.CARRIAGE_CONTROL_CHAR else 2
+                if self.buffered < header_length:
+                    break
+                sf_length = int.from_bytes(self._peek(header_length)[header_length - 2:], 'big')
+                if sf_length <= 2:
+                    raise exceptions.InvalidStructuredFieldError('Structured field incorrect length')
+                field_length = header_length + sf_length - 2
+                if self.buffered < field_length:
+                    break
+                field_start_offset = self.offset
+                if filtered and sf_length - 2 >= parser.SF_TYPE_ID_LENGTH:
+                    sf_type_id = int.from_bytes(self._peek(header_length + parser.SF_TYPE_ID_LENGTH)[header_length:], 'big')
+                    if self._filtered_out(sf_type_id):
+                        self._take(field_length)
+                        self.offset += field_length
+                        self.field_no += 1
+                        if instrumented and parser_config.counters is not None:
+                            parser_config.counters.bytes_read += field_length
+                        continue
+                if instrumented:
+                    start_ns = time.perf_counter_ns()
+                self._take(header_length)
+                data = self._take(sf_length - 2)
+                sf = parser.parse_structured_field(sf_length, data, parser_config, lazy=self._lazy)
+                if self._lazy:
+                    sf.field_no = self.field_no
+                    sf.field_start_offset = field_start_offset
+                self.offset += field_length
+                if instrumented:
+                    parser._instrument(parser_config,
+                                       self.field_no,
+                                       field_start_offset,
+                                       sf[fields.PNAME_SF_TYPE_ID],
+                                       sf_length,
+                                       self.offset,
+                                       start_ns)
+                self.field_no += 1
+                result.append(sf)
+        except exceptions.ParseError as e:
+            self._failed = True
+            e.field_no = self.field_no
+            e.field_start_offset = self.offset
+            parser.logger.error(e)
+            if len(result) == 0:
+                raise e
+            self._error = e
+        return result
+
+    def _raise_error(self):
+        """Raise the ParseError held back by feed, if there is one."""
+        if self._error is not None:
+            e = self._error
+            self._error = None
+            raise e
+
+    def close(self):
+        """Finish the AFP stream. Raises InvalidStructuredFieldError if the
+        bytes fed end part way through a structured field, or the ParseError
+        held back by the last call to feed.
+        """
+        self._raise_error()
+        if self._failed or self.buffered == 0:
+            return
+        self._failed = True
+        header_length = 3 if self._chunks[0][0] == parser.CARRIAGE_CONTROL_CHAR else 2
+        if self.buffered < header_length:
+            e = exceptions.InvalidStructuredFieldError('Not enough data to read structured field length')
+        else:
+            e = exceptions.InvalidStructuredFieldError('Not enough data to read structured field')
+        e.field_no = self.field_no
+        e.field_start_offset = self.offset
+        parser.logger.error(e)
+        raise e
@@ -0,0 +1,326 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Structured field index for random access into AFP files.
+
+   An index is built with a single pass over the file that reads only the
+   Structured Field Introducers. It holds the offset, length and SFTypeID of
+   every structured field along with the page (BPG to EPG) and document (BDT to
+   EDT) boundaries, and can be saved to a sidecar file so it only needs to be
+   built once. An indexed file can then parse any structured field or page by
+   going straight to its bytes.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import array
+import logging
+import mmap
+import os
+import struct
+import sys
+
+from . import exceptions
+from . import fields
+from . import parser
+from . import reader
+
+logger = logging.getLogger(__name__)
+
+# Index file format. The header is followed by the arrays of the index in the
+# order they are listed in Index, all little-endian.
+INDEX_MAGIC = b'AFPINDEX'
+INDEX_VERSION = 1
+# magic, version, file size, file modification time (ns), field count, page
+# count, document count
+INDEX_HEADER = struct.Struct('<8sIQQQQQ')
+
+# Array type codes for byte offsets and for 32-bit values
+_OFFSET_TYPECODE = 'Q'
+_UINT32_TYPECODE = 'I' if array.array('I').itemsize == 4 else 'L'
+
+class Index:
+    """An index of the structured fields in an AFP file.
+
+    Fields, pages and documents are numbered from 0. Pages and documents are
+    held as ranges of field numbers, the stop field being the one after their
+    EPG or EDT.
+
+    Attributes:
+    offsets - The byte number where each field begins.
+    lengths - The number of bytes making up each field in the file, including
+              any carriage control character.
+    sf_type_ids - The SFTypeID of each field.
+    page_starts, page_stops - The field number range of each page.
+    document_starts, document_stops - The field number range of each document.
+    file_size - The size of the indexed file.
+    file_mtime_ns - The modification time of the indexed file, if known.
+    """
+    def __init__(self, file_size=0, file_mtime_ns=0):
+        self.offsets = array.array(_OFFSET_TYPECODE)
+        self.lengths = array.array(_UINT32_TYPECODE)
+        self.sf_type_ids = array.array(_UINT32_TYPECODE)
+        self.page_starts = array.array(_OFFSET_TYPECODE)
+        self.page_stops = array.array(_OFFSET_TYPECODE)
+        self.document_starts = array.array(_OFFSET_TYPECODE)
+        self.document_stops = array.array(_OFFSET_TYPECODE)
+        self.file_size = file_size
+        self.file_mtime_ns = file_mtime_ns
+
+    def _arrays(self):
+        """Return the arrays of the index in file order."""
+        return [self.offsets,
+                self.lengths,
+                self.sf_type_ids,
+                self.page_starts,
+                self.page_stops,
+                self.document_starts,
+                self.document_stops]
+
+    @classmethod
+    def build(cls, f):
+        """Build the index of AFP file f, which can be a file opened in binary
+        or the path of a file.
+
+        Structured fields are numbered from the position the file is at.
+        """
+        index = cls()
+        try:
+            if isinstance(f, (str, bytes, os.PathLike)):
+                st = os.stat(f)
+            else:
+                st = os.fstat(f.fileno())
+            index.file_mtime_ns = st.st_mtime_ns
+        except (AttributeError, OSError, ValueError):
+            pass
+        page_start = None
+        document_start = None
+        n = 0
+        for header in parser.scan(f):
+            index.offsets.append(header.offset)
+            index.lengths.append(header.end - header.offset)
+            index.sf_type_ids.append(header.sf_type_id)
+            if header.sf_type_id == fields.SF_BPG:
+                page_start = n
+            elif header.sf_type_id == fields.SF_EPG and page_start is not None:
+                index.page_starts.append(page_start)
+                index.page_stops.append(n + 1)
+                page_start = None
+            elif header.sf_type_id == fields.SF_BDT:
+                document_start = n
+            elif header.sf_type_id == fields.SF_EDT and document_start is not None:
+                index.document_starts.append(document_start)
+                index.document_stops.append(n + 1)
+                document_start = None
+            index.file_size = header.end
+            n += 1
+        logger.debug('Indexed {0} fields, {1} pages, {2} documents'.format(n, index.page_count(), index.document_count()))
+        return index
+
+    @classmethod
+    def load(cls, path):
+        """Load an index saved with save from the file at path."""
+        with open(path, 'rb') as f:
+            header = f.read(INDEX_HEADER.size)
+            if len(header) != INDEX_HEADER.size:
+                raise exceptions.InvalidIndexError('Index file {0} is too short'.format(path))
+            magic, version, file_size, file_mtime_ns, n_fields, n_pages, n_documents = INDEX_HEADER.unpack(header)
+            if magic != INDEX_MAGIC:
+                raise exceptions.InvalidIndexError('{0} is not an index file'.format(path))
+            if version != INDEX_VERSION:
+                raise exceptions.InvalidIndexError('Index file {0} is version {1}, expected {2}'.format(path, version, INDEX_VERSION))
+            index = cls(file_size, file_mtime_ns)
+            counts = [n_fields] * 3 + [n_pages] * 2 + [n_documents] * 2
+            for a, count in zip(index._arrays(), counts):
+                try:
+                    a.fromfile(f, count)
+                except EOFError:
+                    raise exceptions.InvalidIndexError('Index file {0} is truncated'.format(path))
+                if sys.byteorder != 'little':
+                    a.byteswap()
+        return index
+
+    def save(self, path):
+        """Save the index to the file at path."""
+        with open(path, 'wb') as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC,
+                                      INDEX_VERSION,
+                                      self.file_size,
+                                      self.file_mtime_ns,
+                                      len(self.offsets),
+                                      len(self.page_starts),
+                                      len(self.document_starts)))
+            for a in self._arrays():
+                if sys.byteorder != 'little':
+                    a = array.array(a.typecode, a)
+                    a.byteswap()
+                a.tofile(f)
+
+    def matches(self, path):
+        """Return True if the index looks to be of the file at path as it is
+        now, going by its size and modification time.
+        """
+        st = os.stat(path)
+        return st.st_size == self.file_size and st.st_mtime_ns == self.file_mtime_ns
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def page_count(self):
+        """Return the number of pages in the index."""
+        return len(self.page_starts)
+
+    def document_count(self):
+        """Return the number of documents in the index."""
+        return len(self.document_starts)
+
+    def field_range(self, start, stop):
+        """Return the byte range (start, end) of fields start to stop."""
+        return self.offsets[start], self.offsets[stop - 1] + self.lengths[stop - 1]
+
+    def page_fields(self, k):
+        """Return the field number range (start, stop) of page k."""
+        return self.page_starts[k], self.page_stops[k]
+
+    def document_fields(self, k):
+        """Return the field number range (start, stop) of document k."""
+        return self.document_starts[k], self.document_stops[k]
+
+class IndexedFile:
+    """An AFP file opened for random access through an Index.
+
+    Structured fields are parsed straight from a memory mapping of the file.
+    Fields, pages and documents are numbered from 0 - though field numbers in
+    exceptions count from 1 as they do in parser.stream.
+    """
+    def __init__(self,
+                 path,
+                 index,
+                 allow_unknown_fields=False,
+                 allow_unknown_triplets=False,
+                 allow_unknown_functions=False,
+                 strict=False,
+                 lazy=False):
+        """
+        Arguments:
+        path - The path of the AFP file.
+        index - The Index of the file.
+        lazy - As for parser.stream.
+
+        For the other arguments see the ParserConfig object in parser.py.
+        """
+        self.path = path
+        self.index = index
+        self._parser_config = parser.ParserConfig(allow_unknown_fields=allow_unknown_fields,
+                                                  allow_unknown_triplets=allow_unknown_triplets,
+                                                  allow_unknown_functions=allow_unknown_functions,
+                                                  strict=strict)
+        self._lazy = lazy
+        self._mmap = None
+        with open(path, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            if file_size < index.file_size:
+                raise exceptions.InvalidIndexError('Index does not match file {0}'.format(path))
+            if file_size > 0:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        """Unmap the file."""
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Parse results still hold views of the mapping; it's unmapped
+                # when the last of them is released.
+                pass
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.index)
+
+    def page_count(self):
+        """Return the number of pages in the file."""
+        return self.index.page_count()
+
+    def document_count(self):
+        """Return the number of documents in the file."""
+        return self.index.document_count()
+
+    def iter_fields(self, start=0, stop=None):
+        """Generator parsing fields start up to but not including stop, or to
+        the end of the file if stop is None.
+        """
+        start, stop, _ = slice(start, stop).indices(len(self.index))
+        if start >= stop:
+            return
+        begin, end = self.index.field_range(start, stop)
+        r = reader.MemoryReader(self._mmap, offset=begin, end=end, name=self.path)
+        try:
+            yield from parser.read_structured_fields(r,
+                                                     self._parser_config,
+                                                     field_no=start + 1,
+                                                     lazy=self._lazy)
+        finally:
+            r.close()
+
+    def get_field(self, n):
+        """Parse and return field n."""
+        if n < 0:
+            n += len(self.index)
+        if not 0 <= n < len(self.index):
+            raise IndexError('field number out of range')
+        return next(self.iter_fields(n, n + 1))
+
+    def get_page(self, k):
+        """Parse and return the list of fields of page k, from its BPG to its
+        EPG.
+        """
+        return list(self.iter_fields(*self.index.page_fields(k)))
+
+    def get_document(self, k):
+        """Parse and return the list of fields of document k, from its BDT to
+        its EDT.
+        """
+        return list(self.iter_fields(*self.index.document_fields(k)))
+
+def open_indexed(path, index_path=None, **kwargs):
+    """Open the AFP file at path for random access.
+
+    Returns an IndexedFile. If index_path is given the index is loaded from that
+    file, unless it is missing or out of date, in which case the index is built
+    and saved there. Otherwise the index is built in memory.
+
+    The other arguments are passed on to IndexedFile.
+    """
+    index = None
+    if index_path is not None and os.path.exists(index_path):
+        try:
+            index = Index.load(index_path)
+        except exceptions.InvalidIndexError as e:
+            logger.warning('{0} - rebuilding index'.format(e))
+        else:
+            if not index.matches(path):
+                logger.info('Index file {0} is out of date - rebuilding index'.format(index_path))
+                index = None
+    if index is None:
+        index = Index.build(path)
+        if index_path is not None:
+            index.save(index_path)
+    return IndexedFile(path, index, **kwargs)
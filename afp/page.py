@@ -0,0 +1,174 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Page-level access to AFP files.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from . import exceptions
+from . import fields
+from . import parser
+from . import reader
+
+class Page:
+    """A page of an AFP file, from its BPG structured field to its EPG.
+
+    Only the BPG is parsed when the page is read. The other structured fields
+    on the page are parsed when they are asked for with fields.
+
+    Attributes:
+    page_no - The page number in the file, counting from 1.
+    name - The PageName from the BPG, or None if it doesn't have one.
+    start_offset - The byte number where the BPG begins.
+    end_offset - The byte number just after the end of the EPG.
+    field_no - The field number in the file of the BPG.
+    field_count - The number of structured fields on the page, including the
+                  BPG and EPG.
+    """
+    def __init__(self, page_no, name, start_offset, end_offset, field_no, records, parser_config, lazy):
+        """
+        Arguments:
+        page_no - The page number in the file.
+        name - The page name.
+        start_offset - The byte number where the page begins.
+        end_offset - The byte number where the page ends.
+        field_no - The field number of the first structured field on the page.
+        records - List of (field start offset, sf_length, data) of each
+                  structured field on the page, as read by
+                  parser.read_structured_field_length and
+                  parser.read_structured_field_data.
+        parser_config - The ParserConfig to parse the structured fields with.
+        lazy - As for parser.stream.
+        """
+        self.page_no = page_no
+        self.name = name
+        self.start_offset = start_offset
+        self.end_offset = end_offset
+        self.field_no = field_no
+        self.field_count = len(records)
+        self._records = records
+        self._parser_config = parser_config
+        self._lazy = lazy
+
+    def fields(self):
+        """Generator parsing the structured fields on the page, from the BPG to
+        the EPG.
+        """
+        field_no = self.field_no
+        for field_start_offset, sf_length, data in self._records:
+            try:
+                sf = parser.parse_structured_field(sf_length, data, self._parser_config, lazy=self._lazy)
+            except exceptions.ParseError as e:
+                e.field_no = field_no
+                e.field_start_offset = field_start_offset
+                parser.logger.error(e)
+                raise e
+            if self._lazy:
+                sf.field_no = field_no
+                sf.field_start_offset = field_start_offset
+            yield sf
+            field_no += 1
+
+    def __repr__(self):
+        return '<Page {0} {1!r} bytes {2}-{3}, {4} fields>'.format(self.page_no,
+                                                                   self.name,
+                                                                   self.start_offset,
+                                                                   self.end_offset,
+                                                                   self.field_count)
+
+def _make_page(page_no, field_no, records, end_offset, parser_config, lazy):
+    """Make the Page of the structured field records read from its BPG to its
+    EPG, parsing the BPG for the page name.
+    """
+    bpg_start_offset, bpg_length, bpg_data = records[0]
+    try:
+        bpg = parser.parse_structured_field(bpg_length, bpg_data, parser_config)
+    except exceptions.ParseError as e:
+        e.field_no = field_no
+        e.field_start_offset = bpg_start_offset
+        parser.logger.error(e)
+        raise e
+    return Page(page_no,
+                bpg.get('PageName'),
+                bpg_start_offset,
+                end_offset,
+                field_no,
+                records,
+                parser_config,
+                lazy)
+
+def pages(f,
+          allow_unknown_fields=False,
+          allow_unknown_triplets=False,
+          allow_unknown_functions=False,
+          strict=False,
+          lazy=False):
+    """Read the pages of AFP file f.
+
+    Returns a generator of a Page for each BPG to EPG in the file. Structured
+    fields outside of pages are skipped. Apart from the BPG, the structured
+    fields on a page are only read, not parsed, until they are asked for with
+    Page.fields, so counting or splitting pages runs at close to the speed of
+    reading the file.
+
+    As with parser.stream, f can be a file opened in binary or the path of a
+    file. Regular files are memory-mapped and the pages refer to the mapping
+    rather than copying its bytes.
+
+    For the configuration arguments see the ParserConfig object in parser.py.
+    """
+    parser_config = parser.ParserConfig(allow_unknown_fields=allow_unknown_fields,
+                                        allow_unknown_triplets=allow_unknown_triplets,
+                                        allow_unknown_functions=allow_unknown_functions,
+                                        strict=strict)
+    r = reader.open_reader(f)
+    try:
+        page_no = 0
+        page_field_no = None
+        records = None
+        field_no = 1
+        field_start_offset = r.tell()
+        try:
+            while True:
+                sf_length = parser.read_structured_field_length(r, debug=parser_config.debug)
+                if sf_length is None:
+                    break
+                sf_type_id = parser.peek_sf_type_id(r)
+                if sf_type_id == fields.SF_BPG:
+                    if records is not None:
+                        raise exceptions.InvalidStructuredFieldError('Begin page within a page')
+                    page_field_no = field_no
+                    records = []
+                if records is None:
+                    parser.skip_structured_field_data(r, sf_length, debug=parser_config.debug)
+                else:
+                    data = parser.read_structured_field_data(r, sf_length, debug=parser_config.debug)
+                    records.append((field_start_offset, sf_length, data))
+                    if sf_type_id == fields.SF_EPG:
+                        page_no += 1
+                        yield _make_page(page_no, page_field_no, records, r.tell(), parser_config, lazy)
+                        records = None
+                field_no += 1
+                field_start_offset = r.tell()
+            if records is not None:
+                raise exceptions.InvalidStructuredFieldError('End of file within a page')
+        except exceptions.ParseError as e:
+            if e.field_no is None:
+                e.field_no = field_no
+                e.field_start_offset = field_start_offset
+                parser.logger.error(e)
+            raise e
+    finally:
+        r.close()
@@ -0,0 +1,201 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Parallel parsing of a single AFP file across multiple processes.
+
+   The file is first split into chunks of whole structured fields by a quick
+   scan of the Structured Field Introducers, cutting at page and document
+   boundaries where possible. The chunks are then parsed by a pool of worker
+   processes and the structured fields are returned in file order.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import collections
+import concurrent.futures
+import mmap
+import os
+
+from . import exceptions
+from . import fields
+from . import parser
+from . import reader
+
+# The number of bytes of AFP in each chunk handed to a worker
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+# The number of chunks queued or being parsed for each worker
+CHUNKS_PER_WORKER = 2
+# A chunk is cut before one of these structured fields once it is big enough
+CHUNK_BOUNDARY_TYPES = frozenset([fields.SF_BDT, fields.SF_BPG])
+# If there are no page or document boundaries, a chunk is cut before any
+# structured field once it reaches this many times the chunk size
+MAX_CHUNK_SIZE_FACTOR = 4
+
+# A chunk of an AFP file
+# start_offset - The byte number where the first field in the chunk begins
+# end_offset - The byte number just after the end of the chunk, or None for
+#              the end of the file
+# field_no - The field number in the file of the first field in the chunk
+Chunk = collections.namedtuple('Chunk', ['start_offset', 'end_offset', 'field_no'])
+
+def chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Split the AFP file at path into chunks of whole structured fields.
+
+    Returns a generator of Chunks. A chunk ends before the first BDT or BPG
+    after it reaches chunk_size bytes, or before any structured field once it
+    gets much bigger than that.
+
+    If the scan comes across something it can't read, the last chunk runs from
+    there to the end of the file and is left for the parser to report the
+    error.
+    """
+    start_offset = 0
+    start_field_no = 1
+    end_offset = None
+    field_no = 1
+    try:
+        for header in parser.scan(path):
+            if end_offset is None:
+                start_offset = header.offset
+            else:
+                size = header.offset - start_offset
+                if size >= chunk_size and \
+                   (header.sf_type_id in CHUNK_BOUNDARY_TYPES or size >= chunk_size * MAX_CHUNK_SIZE_FACTOR):
+                    yield Chunk(start_offset, header.offset, start_field_no)
+                    start_offset = header.offset
+                    start_field_no = field_no
+            end_offset = header.end
+            field_no += 1
+    except exceptions.ParseError:
+        yield Chunk(start_offset, None, start_field_no)
+        return
+    if end_offset is not None:
+        yield Chunk(start_offset, end_offset, start_field_no)
+
+# The memory mapping of the file being parsed in a worker process
+_worker_buffer = None
+
+def _init_worker(path):
+    """Memory-map the file at path in a worker process."""
+    global _worker_buffer
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size > 0:
+            _worker_buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            _worker_buffer = b''
+
+def _parse_chunk(chunk, parser_config, include, exclude):
+    """Parse a chunk of the file in a worker process.
+
+    Returns the list of structured fields in the chunk and None, or if a
+    structured field fails to parse, the structured fields before it and the
+    ParseError.
+    """
+    structured_fields = []
+    r = reader.MemoryReader(_worker_buffer, offset=chunk.start_offset, end=chunk.end_offset)
+    try:
+        for sf in parser.read_structured_fields(r,
+                                                parser_config,
+                                                field_no=chunk.field_no,
+                                                include=include,
+                                                exclude=exclude):
+            structured_fields.append(sf)
+    except exceptions.ParseError as e:
+        return structured_fields, e
+    finally:
+        r.close()
+    return structured_fields, None
+
+def _chunk_result(future):
+    """Generator of the structured fields parsed by the worker of future,
+    then raising the ParseError that stopped the worker, if there was one.
+    """
+    structured_fields, e = future.result()
+    yield from structured_fields
+    if e is not None:
+        raise e
+
+def stream(path,
+           workers=None,
+           chunk_size=DEFAULT_CHUNK_SIZE,
+           allow_unknown_fields=False,
+           allow_unknown_triplets=False,
+           allow_unknown_functions=False,
+           strict=False,
+           include=None,
+           exclude=None):
+    """Parse the AFP file at path using a pool of worker processes.
+
+    Returns a generator of the structured fields in the file, in order, just as
+    parser.stream does. Unlike parser.stream the file has to be given by its
+    path so that the workers can open it.
+
+    Arguments:
+    path - The path of the AFP file.
+    workers - The number of worker processes. None means one for each CPU.
+    chunk_size - The number of bytes of the file to hand to a worker at a time.
+
+    For the other arguments see parser.stream. As with parser.stream, the
+    structured fields before one that fails to parse are returned before the
+    ParseError is raised. The field number and offset of a ParseError are
+    those in the whole file.
+    """
+    if include is not None:
+        include = frozenset(include)
+    if exclude is not None:
+        exclude = frozenset(exclude)
+    parser_config = parser.ParserConfig(allow_unknown_fields=allow_unknown_fields,
+                                        allow_unknown_triplets=allow_unknown_triplets,
+                                        allow_unknown_functions=allow_unknown_functions,
+                                        strict=strict)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+                                                initializer=_init_worker,
+                                                initargs=(path,)) as executor:
+        max_pending = workers * CHUNKS_PER_WORKER
+        pending = collections.deque()
+        try:
+            for chunk in chunks(path, chunk_size):
+                pending.append(executor.submit(_parse_chunk, chunk, parser_config, include, exclude))
+                if len(pending) >= max_pending:
+                    yield from _chunk_result(pending.popleft())
+            while pending:
+                yield from _chunk_result(pending.popleft())
+        finally:
+            for future in pending:
+                future.cancel()
+
+def load(path,
+         workers=None,
+         chunk_size=DEFAULT_CHUNK_SIZE,
+         allow_unknown_fields=False,
+         allow_unknown_triplets=False,
+         allow_unknown_functions=False,
+         strict=False,
+         include=None,
+         exclude=None):
+    """Parse the AFP file at path using a pool of worker processes.
+
+    Returns a list of the structured fields in the file. See stream.
+    """
+    return list(stream(path,
+                       workers=workers,
+                       chunk_size=chunk_size,
+                       allow_unknown_fields=allow_unknown_fields,
+                       allow_unknown_triplets=allow_unknown_triplets,
+                       allow_unknown_functions=allow_unknown_functions,
+                       strict=strict,
+                       include=include,
+                       exclude=exclude))
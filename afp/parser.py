@@ -17,16 +17,24 @@
    limitations under the License.
 """
 
+import collections
 import logging
+import time
 
+from . import codepages
+from . import compiler
 from . import exceptions
 from . import fields
 from . import functions
+from . import reader
+from . import records
+from . import structured_field
 from . import triplets
 
 logger = logging.getLogger(__name__)
 
 CARRIAGE_CONTROL_CHAR = 0x5A
+_CARRIAGE_CONTROL = bytes([CARRIAGE_CONTROL_CHAR])
 PTX_ESCAPE_SEQUENCE = 0x2BD3
 
 # Parameter Names
@@ -35,6 +43,26 @@ PNAME_REPEATING_GROUP = 'RepeatingGroup'
 
 MODCA_CLASS_CODE = 0xD3
 
+# The number of bytes in the SFTypeID of a Structured Field Introducer
+SF_TYPE_ID_LENGTH = 3
+# The number of bytes in a Structured Field Introducer without extension,
+# including the structured field length
+SFI_LENGTH = 8
+
+# The kinds of syntax timed by a profile
+PROFILE_FIELD = 'field'
+PROFILE_TRIPLET = 'triplet'
+PROFILE_FUNCTION = 'function'
+
+# The position and type of a structured field in a file, as found by scan
+# offset - The byte number where the field begins
+# end - The byte number just after the end of the field
+# sf_length - The structured field length
+# sf_type_id - The structured field type ID
+# flag_byte - The structured field flag byte
+FieldHeader = collections.namedtuple('FieldHeader',
+                                     ['offset', 'end', 'sf_length', 'sf_type_id', 'flag_byte'])
+
 class ParserConfig:
     """Holds the configuration of the parser.
 
@@ -52,28 +80,97 @@ class ParserConfig:
              list of exceptions for the object being parsed and parsing continues.
              Errors that currently support this are RequiredParameterMissingError
              and IncompleteParameterError.
+    debug - True if debug logging is enabled. This is checked once, when the
+            ParserConfig is created at the start of a stream, so the parser
+            doesn't format debug messages that will never be output.
+    profile - An object whose record(kind, key, length, elapsed_ns) method is
+              called after each structured field, triplet and control sequence
+              is decoded, or None. kind is PROFILE_FIELD, PROFILE_TRIPLET or
+              PROFILE_FUNCTION, key is the SFTypeID, triplet ID or function
+              type, length is its length in bytes and elapsed_ns is the time
+              taken to decode it - for a structured field, including its
+              triplets and control sequences. See stats.py.
+    hooks - A list of callables, each called with (field_no, offset,
+            sf_type_id, length, elapsed_ns) after each structured field is
+            read and decoded. length is the structured field length and
+            elapsed_ns the time taken to read and decode it. Structured fields
+            filtered-out by include or exclude are not passed to the hooks.
+    counters - An object whose attributes bytes_read, fields_decoded,
+               exceptions_recorded, unknown_fields, unknown_triplets and
+               unknown_functions are incremented as the parser goes, or None.
+               See stats.Counters.
+    compact - If True, structured fields, triplets, control sequences and
+              repeating groups are returned as compact records rather than
+              dictionaries. See records.py.
+
+    When there are no hooks or counters the parser checks a single flag,
+    instrumented, per structured field.
     """
     def __init__(self,
                  allow_unknown_fields=False,
                  allow_unknown_triplets=False,
                  allow_unknown_functions=False,
-                 strict=False):
+                 strict=False,
+                 profile=None,
+                 hooks=None,
+                 counters=None,
+                 compact=False):
        self.allow_unknown_fields = allow_unknown_fields
        self.allow_unknown_triplets = allow_unknown_triplets
        self.allow_unknown_functions = allow_unknown_functions
        self.strict = strict
+       self.debug = logger.isEnabledFor(logging.DEBUG)
+       self.profile = profile
+       self.hooks = tuple(hooks) if hooks else ()
+       self.counters = counters
+       self.instrumented = len(self.hooks) > 0 or counters is not None
+       self.compact = compact
+
+# A range of bytes skipped by the parser in recover mode, after an error
+# field_no - The field number given to the range
+# start - The byte number where the range begins, that of the structured field
+#         in error
+# end - The byte number just after the end of the range, where parsing resumed
+# error - The ParseError that caused the range to be skipped
+SkippedRange = collections.namedtuple('SkippedRange', ['field_no', 'start', 'end', 'error'])
+
+class Recovery:
+    """The report of the errors recovered from by the parser in recover mode,
+    for the recover argument of parser.stream and parser.load.
+
+    Attributes:
+    skipped - List of a SkippedRange for each error, in file order.
+    """
+    def __init__(self):
+        self.skipped = []
+
+    @property
+    def errors(self):
+        """The ParseErrors recovered from, in file order."""
+        return [skipped_range.error for skipped_range in self.skipped]
 
-# The read_* functions are for reading data directly from a file.
-# The later parse_* are for reading from a byte buffer.
+    @property
+    def bytes_skipped(self):
+        """The total number of bytes skipped."""
+        return sum(skipped_range.end - skipped_range.start for skipped_range in self.skipped)
+
+# The read_* functions are for reading data directly from a file or a reader
+# (see reader.py).
+# The later parse_* are for reading from a byte buffer. Byte buffers are bytes
+# or memoryview objects, so slicing a buffer to hand part of it on to another
+# parse_* function doesn't copy the data.
 
 def read_bytes(f, n):
-    """Read n bytes from file f."""
+    """Read n bytes from file f.
+
+    Returns a memoryview of the bytes read.
+    """
     s = f.read(n)
     if len(s) == 0:
         return None
     if len(s) != n:
         raise exceptions.EOFWhileReadingError('Unexpected EOF while reading file')
-    return [s[i] for i in range(0, len(s))]
+    return memoryview(s)
 
 def read_byte(f):
     """Read a byte from file f."""
@@ -87,11 +184,7 @@ def read_ubin(f, n):
     b = read_bytes(f, n)
     if b is None:
         return None
-    u = 0
-    for b in b:
-        u = u << 8
-        u += b
-    return u
+    return int.from_bytes(b, 'big')
 
 def syntax_length(syntax):
     """Return the number of bytes in a particular syntax definition.
@@ -106,8 +199,13 @@ def syntax_length(syntax):
         length += param.length
     return length
 
-def parse_bytes(data, n, offset=0):
-    """Read n bytes from the byte buffer data starting at specified offset."""
+def parse_slice(data, n, offset=0):
+    """Return a slice n bytes long of the byte buffer data starting at
+    specified offset.
+
+    The slice is of the same type as data, so when data is a memoryview no
+    bytes are copied.
+    """
     # An n value of zero means read rest of stream
     if n == 0:
         n = len(data) - offset
@@ -117,35 +215,37 @@ def parse_bytes(data, n, offset=0):
         raise exceptions.EOSWhileReadingError('Out of data while parsing {0} byte(s) from offset {1} of {2}'.format(
             n,
             offset,
-            data
+            list(data)
         ))
-    return [data[i] for i in range(offset, offset + n)]
+    return data[offset:offset + n]
+
+def parse_bytes(data, n, offset=0):
+    """Read n bytes from the byte buffer data starting at specified offset.
+
+    Returns a list of the byte values.
+    """
+    b = parse_slice(data, n, offset=offset)
+    if b is None:
+        return None
+    return list(b)
 
 def parse_ubin(data, n, offset=0):
     """Parse an unsigned binary number n bytes long from byte buffer data
     starting at specified offset.
     """
-    b = parse_bytes(data, n, offset=offset)
+    b = parse_slice(data, n, offset=offset)
     if b is None:
         return None
-    u = 0
-    for b in b:
-        u = u << 8
-        u += b
-    return u
+    return int.from_bytes(b, 'big')
 
 def parse_sbin(data, n, offset=0):
     """Parse a signed binary number n bytes long from byte buffer data
     starting at specified offset.
     """
-    i = parse_ubin(data, n, offset=offset)
-    if i is None:
+    b = parse_slice(data, n, offset=offset)
+    if b is None:
         return None
-
-    if i & (1 << ((n * 8) - 1)) != 0:
-        i -= 1 << (n * 8)
-
-    return i
+    return int.from_bytes(b, 'big', signed=True)
 
 def parse_code(data, n, offset=0):
     """Parse a code (effectively an unsigned binary number) n bytes long from
@@ -153,14 +253,17 @@ def parse_code(data, n, offset=0):
     """
     return parse_ubin(data, n, offset=offset)
 
-def parse_chars(data, n, offset=0):
+def parse_chars(data, n, offset=0, table=None):
     """Parse text data n bytes long from byte buffer data starting at specified
     offset.
+
+    The text is decoded with decoding table table, see codepages.py, by default
+    that of the default code page.
     """
-    b = parse_bytes(data, n, offset=offset)
+    b = parse_slice(data, n, offset=offset)
     if b is None:
         return None
-    return bytes(b).decode('EBCDIC-CP-BE').strip()
+    return codepages.decode(b, table).strip()
 
 def parse_triplets(data, parser_config, offset=0):
     """Parse triplets from byte buffer data starting at specified offset.
@@ -172,11 +275,14 @@ def parse_triplets(data, parser_config, offset=0):
     # Keep going until we run out of data. Triplets are always at the end of a
     # structured field.
     while p < len(data):
-        logger.debug('Parsing triplet {0}'.format(i + 1))
+        if parser_config.debug:
+            logger.debug('Parsing triplet {0}'.format(i + 1))
         t_length = parse_ubin(data, 1, offset=p)
         t_id = parse_code(data, 1, offset=p + 1)
         if t_id is None:
             raise exceptions.InvalidTripletError('Not enough data to parse triplet {0} Id'.format(i + 1))
+        if t_length < 2:
+            raise exceptions.InvalidTripletError('Triplet {0} length {1} is too short'.format(i + 1, t_length))
         triplet_type = None
         # Check we know about the triplet type, and if we don't and we're not
         # allowing unknown triplets in parser output, raise an exception.
@@ -184,27 +290,36 @@ def parse_triplets(data, parser_config, offset=0):
             triplet_type = triplets.TRIPLET_TYPES[t_id]
         elif not parser_config.allow_unknown_triplets:
             raise exceptions.UnrecognizedTripletError('Unrecognized triplet 0x{0:02X}'.format(t_id))
+        elif parser_config.counters is not None:
+            parser_config.counters.unknown_triplets += 1
         # Get the rest of the triplet data
         try:
-            contents = parse_bytes(data, t_length - 2, offset=p + 2)
+            contents = parse_slice(data, t_length - 2, offset=p + 2)
             if contents is None:
                 raise exceptions.InvalidTripletError('Not enough data to parse triplet {0} contents'.format(i + 1))
         except exceptions.EOSWhileReadingError as e:
             raise exceptions.InvalidTripletError('Not enough data to parse triplet {0} contents'.format(i + 1))
-        # Get the description of the triplet for debug output
-        description = ''
-        if triplet_type is not None:
-            description = ' ({0})'.format(triplet_type.name)
-        logger.debug('Triplet length {0} type 0x{1:02X}{2}'.format(t_length, t_id, description))
+        if parser_config.debug:
+            # Get the description of the triplet for debug output
+            description = ''
+            if triplet_type is not None:
+                description = ' ({0})'.format(triplet_type.name)
+            logger.debug('Triplet length {0} type 0x{1:02X}{2}'.format(t_length, t_id, description))
         # Parse the contents
         syntax = triplets.SYNTAX_TRIPLET_RAW
         if triplet_type is not None and triplet_type.syntax is not None:
             syntax = triplet_type.syntax
-        triplet, bytes_processed = parse_syntax(contents, syntax, parser_config)
+        if parser_config.profile is not None:
+            start_ns = time.perf_counter_ns()
+        triplet = records.triplet_record_class(syntax)() if parser_config.compact else None
+        triplet, bytes_processed = compiler.decode_syntax(contents, syntax, parser_config, result=triplet)
+        if parser_config.profile is not None:
+            parser_config.profile.record(PROFILE_TRIPLET, t_id, t_length, time.perf_counter_ns() - start_ns)
         triplet[triplets.PNAME_T_LENGTH] = t_length
         triplet[triplets.PNAME_T_ID] = t_id
         triplet_list.append(triplet)
-        logger.debug('Triplet: {0}'.format(triplet))
+        if parser_config.debug:
+            logger.debug('Triplet: {0}'.format(triplet))
         p += t_length
         i += 1
     return triplet_list
@@ -219,7 +334,8 @@ def parse_ptoca(data, parser_config, offset=0):
     p = offset
     i = 0
     while p < len(data):
-        logger.debug('Parsing control sequence {0}'.format(i + 1))
+        if parser_config.debug:
+            logger.debug('Parsing control sequence {0}'.format(i + 1))
         if not chained:
             # Consume the escape sequence before an unchained control sequence
             try:
@@ -236,6 +352,8 @@ def parse_ptoca(data, parser_config, offset=0):
         function = parse_ubin(data, 1, offset=p)
         if function is None:
             raise exceptions.InvalidControlSequenceError('Not enough data to parse control sequence {0} function'.format(i + 1))
+        if length < 2:
+            raise exceptions.InvalidControlSequenceError('Control sequence {0} length {1} is too short'.format(i + 1, length))
         p += 1
         # Lookup the function. If we don't know what it is and we're not
         # allowing unknown functions then raise an exception.
@@ -244,14 +362,17 @@ def parse_ptoca(data, parser_config, offset=0):
             fn_info = functions.FUNCTIONS[function]
         elif not parser_config.allow_unknown_functions:
             raise exceptions.UnknownFunctionError('Unknown function 0x{0:X}'.format(function))
-        # Get the description of the triplet for debug output
-        description = ''
-        if fn_info is not None:
-            description = ' ({0.abbreviation} {0.name})'.format(fn_info)
-        logger.debug('Function length {0} type 0x{1:02X}{2}'.format(length, function, description))
+        elif parser_config.counters is not None:
+            parser_config.counters.unknown_functions += 1
+        if parser_config.debug:
+            # Get the description of the function for debug output
+            description = ''
+            if fn_info is not None:
+                description = ' ({0.abbreviation} {0.name})'.format(fn_info)
+            logger.debug('Function length {0} type 0x{1:02X}{2}'.format(length, function, description))
         # Get the rest of the control sequence data
         try:
-            function_data = parse_bytes(data, length - 2, offset=p)
+            function_data = parse_slice(data, length - 2, offset=p)
             p += length - 2
             if function_data is None and length - 2 > 0:
                 raise exceptions.InvalidControlSequenceError('Not enough data to parse control sequence {0} function data'.format(i + 1))
@@ -261,11 +382,17 @@ def parse_ptoca(data, parser_config, offset=0):
         syntax = functions.SYNTAX_FUNCTION_RAW
         if fn_info is not None and fn_info.syntax is not None:
             syntax = fn_info.syntax
-        ctrl_sequence, bytes_processed = parse_syntax(function_data, syntax, parser_config)
+        if parser_config.profile is not None:
+            start_ns = time.perf_counter_ns()
+        ctrl_sequence = records.function_record_class(syntax)() if parser_config.compact else None
+        ctrl_sequence, bytes_processed = compiler.decode_syntax(function_data, syntax, parser_config, result=ctrl_sequence)
+        if parser_config.profile is not None:
+            parser_config.profile.record(PROFILE_FUNCTION, function, length, time.perf_counter_ns() - start_ns)
         ctrl_sequence[functions.PNAME_CS_LENGTH] = length
         ctrl_sequence[functions.PNAME_CS_TYPE] = function
         ctrl_sequences.append(ctrl_sequence)
-        logger.debug('Control Sequence: {0}'.format(ctrl_sequence))
+        if parser_config.debug:
+            logger.debug('Control Sequence: {0}'.format(ctrl_sequence))
         chained = functions.chained_function(function)
         i += 1
     if chained:
@@ -300,7 +427,7 @@ def _add_param(name, value, result, param_appearance_counters):
     result[unique_name] = value
     return unique_name
 
-def _add_exception(e, result):
+def _add_exception(e, result, parser_config):
     """Add an exception to the parse result.
 
     Exceptions are stored in the special key _exceptions, a list of exceptions.
@@ -308,7 +435,10 @@ def _add_exception(e, result):
     Arguments:
     e - The exception
     result - The parse result dictionary to add the exception to.
+    parser_config - The ParserConfig, whose counters count the exception.
     """
+    if parser_config.counters is not None:
+        parser_config.counters.exceptions_recorded += 1
     if PNAME_EXCEPTIONS not in result:
         result[PNAME_EXCEPTIONS] = []
     result[PNAME_EXCEPTIONS].append((e.modca_code, str(e)))
@@ -320,8 +450,12 @@ def parse_syntax(data, syntax, parser_config, result=None, param_appearance_coun
     This is the heart of the parser. Syntaxes are lists of ParameterTypes and
     are defined in fields.py, triplets.py and functions.py.
 
+    This function interprets the syntax each time it is called. The parser
+    itself uses the compiled form of the syntaxes, see compiler.py, which falls
+    back to this function whenever the data doesn't fit its fast path.
+
     Arguments:
-    data - A list of bytes to parse the data from.
+    data - A byte buffer to parse the data from.
     syntax - The sytax of the structured field, triplet or PTOCA function to
              use to parse the data.
     parser_config - A ParserConfig object.
@@ -340,11 +474,11 @@ def parse_syntax(data, syntax, parser_config, result=None, param_appearance_coun
     next_group_length = 0
     next_field_offset = 0
     if result is None:
-        result = {}
+        result = records.record_class(syntax)() if parser_config.compact else {}
     if param_appearance_counters is None:
         param_appearance_counters = {}
     if data is None:
-        data = []
+        data = b''
     try:
         for param in syntax:
             if type(param) == list:
@@ -366,17 +500,19 @@ def parse_syntax(data, syntax, parser_config, result=None, param_appearance_coun
                         repeating_group_data = data[repeating_group_offset:repeating_group_offset + next_group_length]
                     else:
                         repeating_group_data = data[repeating_group_offset:]
-                    logger.debug('Parsing repeating group: offset {0}; length {1}'.format(repeating_group_offset,
-                                                                                          next_group_length))
+                    if parser_config.debug:
+                        logger.debug('Parsing repeating group: offset {0}; length {1}'.format(repeating_group_offset,
+                                                                                              next_group_length))
                     nested_group_result, bytes_processed = parse_syntax(repeating_group_data, param, parser_config)
                     value.append(nested_group_result)
                     repeating_group_offset += bytes_processed
                 if len(value) > 0:
                     unique_name = _add_param(PNAME_REPEATING_GROUP, value, result, param_appearance_counters)
-                    logger.debug('Parameter: {0} ({1}, 0) => <{2}>'.format(
-                        unique_name,
-                        next_field_offset,
-                        value))
+                    if parser_config.debug:
+                        logger.debug('Parameter: {0} ({1}, 0) => <{2}>'.format(
+                            unique_name,
+                            next_field_offset,
+                            value))
                 # Reset the next repeating group length after we've processed the group
                 next_group_length = 0
                 next_field_offset = repeating_group_offset
@@ -418,18 +554,19 @@ def parse_syntax(data, syntax, parser_config, result=None, param_appearance_coun
                         value = parse_ptoca(data, parser_config, offset=param.offset)
                     if value is not None and (type(value) != list or len(value) != 0):
                         unique_name = _add_param(param.name, value, result, param_appearance_counters)
-                        logger.debug('Parameter: {0} ({1}, {2}, {3}) => <{4}>'.format(
-                            unique_name,
-                            param.offset,
-                            param.length,
-                            fields.PARAM_TYPE_NAMES[param.datatype],
-                            value))
+                        if parser_config.debug:
+                            logger.debug('Parameter: {0} ({1}, {2}, {3}) => <{4}>'.format(
+                                unique_name,
+                                param.offset,
+                                param.length,
+                                fields.PARAM_TYPE_NAMES[param.datatype],
+                                value))
                     elif param.mandatory:
                         e = exceptions.RequiredParameterMissingError('Required parameter missing: {0}'.format(param.name))
                         if parser_config.strict:
                             raise e
                         else:
-                            _add_exception(e, result)
+                            _add_exception(e, result, parser_config)
                             logger.warning(e)
                     next_field_offset = param.offset + param.length
     except exceptions.EOSWhileReadingError as e:
@@ -440,62 +577,137 @@ def parse_syntax(data, syntax, parser_config, result=None, param_appearance_coun
         if parser_config.strict:
             raise e
         else:
-            _add_exception(e, result)
+            _add_exception(e, result, parser_config)
             logger.warning(e)
     return result, len(data)
 
-def read_structured_field(f, parser_config):
-    """Read a structured field from file f.
+def read_structured_field_length(f, debug=False):
+    """Read the start of a structured field from reader f - the optional
+    carriage control character and the structured field length. Debug messages
+    are only logged if debug is True.
+
+    Returns the structured field length, or None at EOF.
+    """
+    # Look for the record beginning marker
+    b = f.peek(1)
+    if len(b) == 0:
+        return None
+    if b[0] == CARRIAGE_CONTROL_CHAR:
+        # Carriage control character is optional, only consume it if it's
+        # there
+        f.skip(1)
+    # Read the field length
+    try:
+        sf_length = read_ubin(f, 2)
+        if sf_length is None:
+            raise exceptions.InvalidStructuredFieldError('Missing structured field length')
+    except exceptions.EOFWhileReadingError as e:
+        raise exceptions.InvalidStructuredFieldError('Not enough data to read structured field length')
+    if debug:
+        logger.debug('Reading structured field length {0} bytes'.format(sf_length))
+    return sf_length
+
+def read_structured_field_data(f, sf_length, debug=False):
+    """Read the rest of a structured field of length sf_length from reader f,
+    after its length has been read with read_structured_field_length. Debug
+    messages are only logged if debug is True.
+
+    Returns a buffer of the structured field introducer and data.
+    """
+    # Read the rest of the field - excluding the 2 bytes for the length that
+    # we've already read.
+    try:
+        data = None
+        if sf_length > 2:
+            data = read_bytes(f, sf_length - 2)
+        if data is None:
+            raise exceptions.InvalidStructuredFieldError('Structured field incorrect length')
+    except exceptions.EOFWhileReadingError as e:
+        raise exceptions.InvalidStructuredFieldError('Not enough data to read structured field')
+    if debug:
+        logger.debug('Structured Field data: {0}'.format(list(data)))
+    return data
+
+def skip_structured_field_data(f, sf_length, debug=False):
+    """Skip over the rest of a structured field of length sf_length in reader f,
+    after its length has been read with read_structured_field_length. Debug
+    messages are only logged if debug is True.
+    """
+    if sf_length <= 2:
+        raise exceptions.InvalidStructuredFieldError('Structured field incorrect length')
+    if f.skip(sf_length - 2) != sf_length - 2:
+        raise exceptions.InvalidStructuredFieldError('Not enough data to read structured field')
+    if debug:
+        logger.debug('Skipped structured field data')
+
+def peek_sf_type_id(f):
+    """Return the SFTypeID of the structured field whose introducer is next in
+    reader f, without consuming it, or None if there aren't enough bytes left.
+    """
+    b = f.peek(SF_TYPE_ID_LENGTH)
+    if len(b) < SF_TYPE_ID_LENGTH:
+        return None
+    return int.from_bytes(b, 'big')
+
+def pad_length(data, start):
+    """Return the number of bytes of padding at the end of byte buffer data,
+    which holds a structured field with the padding flag set following its
+    length. start is the offset of the structured field data, after the
+    introducer.
+
+    The last byte of the padding holds the length of the padding, itself
+    included. For 256 bytes of padding or more the last byte is zero and the
+    two bytes before it hold the length.
+    """
+    available = len(data) - start
+    if available < 1:
+        raise exceptions.InvalidStructuredFieldError('Not enough data to read structured field padding length')
+    length = data[-1]
+    if length == 0:
+        if available < 3:
+            raise exceptions.InvalidStructuredFieldError('Not enough data to read structured field padding length')
+        length = int.from_bytes(data[-3:-1], 'big')
+        if length < 3:
+            raise exceptions.InvalidStructuredFieldError('Structured field padding length {0} is too short'.format(length))
+    if length > available:
+        raise exceptions.InvalidStructuredFieldError('Structured field padding length {0} longer than structured field data'.format(length))
+    return length
+
+def parse_structured_field(sf_length, data, parser_config, lazy=False):
+    """Parse a structured field from byte buffer data, which holds everything in
+    the structured field after its length.
 
     Returns a dictionary containing all the parameters of the structured field,
-    including those of the structured field introducer.
+    including those of the structured field introducer. If lazy is True a
+    structured_field.StructuredField is returned instead, which only parses the
+    structured field data when a parameter from it is first needed.
     """
-    sf = None
     # To keep count of appearances of parameters with the same name so we can
     # append a counter to make unique names.
     param_appearance_counters = {}
-    # Read the record beginning marker
-    b = read_byte(f)
-    if b is not None:
-        if b != CARRIAGE_CONTROL_CHAR:
-            # Carriage control character is optional, if none detected, rewind
-            # the byte read and continue as normal
-            f.seek(-1, 1)
-        # Read the field length
-        try:
-            sf_length = read_ubin(f, 2)
-            if sf_length is None:
-                raise exceptions.InvalidStructuredFieldError('Missing structured field length')
-        except exceptions.EOFWhileReadingError as e:
-            raise exceptions.InvalidStructuredFieldError('Not enough data to read structured field length')
-        logger.debug('Reading structured field length {0} bytes'.format(sf_length))
-        # Read the rest of the field - excluding the 2 bytes for the length that
-        # we've already read.
-        try:
-            data = read_bytes(f, sf_length - 2)
-            if data is None:
-                raise exceptions.InvalidStructuredFieldError('Structured field incorrect length')
-        except exceptions.EOFWhileReadingError as e:
-            raise exceptions.InvalidStructuredFieldError('Not enough data to read structured field')
-        logger.debug('Structured Field data: {0}'.format(data))
-        # Parse the Structured Field Introducer
+    # Parse the Structured Field Introducer
+    if parser_config.debug:
         logger.debug('Parsing Structured Field Introducer')
-        sf, bytes_processed = parse_syntax(data,
-                                           fields.SYNTAX_SFI,
-                                           parser_config,
-                                           param_appearance_counters=param_appearance_counters)
-        sf[fields.PNAME_SF_LENGTH] = sf_length
-        if (sf[fields.PNAME_SF_TYPE_ID] & 0xFF0000) >> 16 != MODCA_CLASS_CODE:
-            raise exceptions.UnrecognizedIdentifierCodeError('Unrecognized class code 0x{0:06X} - MO:DCA uses class code 0x{1:02X}'.format(sf[fields.PNAME_SF_TYPE_ID], MODCA_CLASS_CODE))
-        # The parser doesn't currently support structured field padding
-        if fields.sfi_pad_flag(sf[fields.PNAME_FLAG_BYTE]):
-            raise exceptions.PaddingNotImplementedError('Structured Field padding is not supported')
-        # Find the structured field type info
-        sf_type = None
-        if sf[fields.PNAME_SF_TYPE_ID] in fields.SF_TYPES:
-            sf_type = fields.SF_TYPES[sf[fields.PNAME_SF_TYPE_ID]]
-        elif not parser_config.allow_unknown_fields:
-            raise exceptions.UnrecognizedStructuredFieldError('Unrecognized structured field 0x{0:06X}'.format(sf[fields.PNAME_SF_TYPE_ID]))
+    sf = None
+    if parser_config.compact:
+        sf = records.field_record_class(int.from_bytes(data[:SF_TYPE_ID_LENGTH], 'big'))()
+    sf, bytes_processed = compiler.decode_syntax(data,
+                                                 fields.SYNTAX_SFI,
+                                                 parser_config,
+                                                 result=sf,
+                                                 param_appearance_counters=param_appearance_counters)
+    sf[fields.PNAME_SF_LENGTH] = sf_length
+    if (sf[fields.PNAME_SF_TYPE_ID] & 0xFF0000) >> 16 != MODCA_CLASS_CODE:
+        raise exceptions.UnrecognizedIdentifierCodeError('Unrecognized class code 0x{0:06X} - MO:DCA uses class code 0x{1:02X}'.format(sf[fields.PNAME_SF_TYPE_ID], MODCA_CLASS_CODE))
+    # Find the structured field type info
+    sf_type = None
+    if sf[fields.PNAME_SF_TYPE_ID] in fields.SF_TYPES:
+        sf_type = fields.SF_TYPES[sf[fields.PNAME_SF_TYPE_ID]]
+    elif not parser_config.allow_unknown_fields:
+        raise exceptions.UnrecognizedStructuredFieldError('Unrecognized structured field 0x{0:06X}'.format(sf[fields.PNAME_SF_TYPE_ID]))
+    elif parser_config.counters is not None:
+        parser_config.counters.unknown_fields += 1
+    if parser_config.debug:
         description = ''
         if sf_type is not None:
             description = ' ({0.abbreviation} {0.name})'.format(sf_type)
@@ -520,28 +732,64 @@ def read_structured_field(f, parser_config):
                        sf[fields.PNAME_EXT_LENGTH],
                        fields.PNAME_EXT_DATA,
                        sf[fields.PNAME_EXT_DATA]))
-        # Get the rest of the field data
-        field_data_start = 6
-        if fields.sfi_ext_flag(sf[fields.PNAME_FLAG_BYTE]):
-            field_data_start += sf[fields.PNAME_EXT_LENGTH]
+    # Get the rest of the field data
+    field_data_start = 6
+    if fields.sfi_ext_flag(sf[fields.PNAME_FLAG_BYTE]):
+        field_data_start += sf[fields.PNAME_EXT_LENGTH]
+    if fields.sfi_pad_flag(sf[fields.PNAME_FLAG_BYTE]):
+        # Leave the padding out of the field data
+        field_data = data[field_data_start:len(data) - pad_length(data, field_data_start)]
+    else:
         field_data = data[field_data_start:]
-        # Parse the field data
-        syntax = fields.SYNTAX_FIELD_RAW
-        if sf_type is not None and sf_type.syntax is not None:
-            syntax = sf_type.syntax
-        parse_syntax(field_data,
-                     syntax,
-                     parser_config,
-                     result=sf,
-                     param_appearance_counters=param_appearance_counters)
+    # Parse the field data
+    syntax = fields.SYNTAX_FIELD_RAW
+    if sf_type is not None and sf_type.syntax is not None:
+        syntax = sf_type.syntax
+    if lazy:
+        return structured_field.StructuredField(sf,
+                                                field_data,
+                                                syntax,
+                                                parser_config,
+                                                param_appearance_counters,
+                                                raw=data)
+    if parser_config.profile is not None:
+        start_ns = time.perf_counter_ns()
+    compiler.decode_syntax(field_data,
+                           syntax,
+                           parser_config,
+                           result=sf,
+                           param_appearance_counters=param_appearance_counters)
+    if parser_config.profile is not None:
+        parser_config.profile.record(PROFILE_FIELD, sf[fields.PNAME_SF_TYPE_ID], sf_length, time.perf_counter_ns() - start_ns)
+    if parser_config.debug:
         logger.debug('Structured Field: {0}'.format(sf))
     return sf
 
+def read_structured_field(f, parser_config, lazy=False):
+    """Read a structured field from reader f.
+
+    Returns a dictionary containing all the parameters of the structured field,
+    including those of the structured field introducer, or None at EOF. See
+    parse_structured_field for the lazy argument.
+    """
+    sf_length = read_structured_field_length(f, debug=parser_config.debug)
+    if sf_length is None:
+        return None
+    data = read_structured_field_data(f, sf_length, debug=parser_config.debug)
+    return parse_structured_field(sf_length, data, parser_config, lazy=lazy)
+
 def stream(f,
            allow_unknown_fields=False,
            allow_unknown_triplets=False,
            allow_unknown_functions=False,
-           strict=False):
+           strict=False,
+           lazy=False,
+           include=None,
+           exclude=None,
+           hooks=None,
+           counters=None,
+           compact=False,
+           recover=False):
     """Interface to the parser. Parse AFP file f.
 
     Returns a generator so that the AFP file can be iterated-over without loading
@@ -551,39 +799,247 @@ def stream(f,
             for sf in afp.stream(f):
                 # Do something with structured field sf
 
-    Open AFP files in binary as the encoding is not ASCII but EBCDIC.
+    f can be a file opened in binary - the encoding is not ASCII but EBCDIC - or
+    the path of a file, which is opened and closed by the parser:
 
-    For the configuration arguments see the ParserConfig object at the top of
-    this file.
+        for sf in afp.stream('myfile'):
+            # Do something with structured field sf
+
+    Regular files are memory-mapped. Pipes, sockets and other files that can't
+    be memory-mapped are read through a buffer, starting from their current
+    position.
+
+    If lazy is True, the generator yields structured_field.StructuredField
+    objects rather than dictionaries. They behave like the dictionaries but
+    only the Structured Field Introducer is parsed up-front; the rest of each
+    structured field is parsed the first time one of its parameters is
+    accessed. Errors in the structured field data are then raised on that
+    access.
+
+    include and exclude filter the structured fields by their SFTypeID - the
+    SF_* constants in afp.fields. If include is given, only structured fields
+    of those types are returned. Structured fields of the types in exclude are
+    not returned. Only the SFTypeID of a structured field that is filtered-out
+    is looked at; the rest of it is skipped without being parsed or checked.
+    Field numbers still count every structured field in the file.
+
+    If compact is True the structured fields, and the triplets, control
+    sequences and repeating groups in them, are records.Record objects - compact
+    mappings with the same keys and values as the dictionaries - which take
+    much less memory when many structured fields are kept.
+
+    If recover is True, or a Recovery object, an error reading or parsing a
+    structured field doesn't abort parsing. The error is logged, the parser
+    skips forward to the next plausible structured field - a carriage control
+    character and structured field length followed by the MO:DCA class code,
+    whose end is at the next carriage control character or at EOF - and
+    carries on from there. The bytes skipped count as one structured field in
+    the field numbers. If recover is a Recovery object each error is added to
+    it with the range of bytes skipped. When the length of the structured
+    field in error is intact parsing resumes just after it, if a structured
+    field seems to start there, whether or not the file has carriage control
+    characters. Otherwise resynchronizing depends on the carriage control
+    characters, so a file without them is only recovered where the structured
+    field in error is intact. Any exception raised parsing a structured field
+    is recovered from, not only ParseErrors. Errors in lazily-parsed
+    structured field data are raised when the data is accessed and aren't
+    recovered from.
+
+    For the configuration arguments, including hooks and counters to observe
+    the parser with, see the ParserConfig object at the top of this file.
     """
-    field_no = 1
+    if include is not None:
+        include = frozenset(include)
+    if exclude is not None:
+        exclude = frozenset(exclude)
     parser_config = ParserConfig(allow_unknown_fields=allow_unknown_fields,
                                  allow_unknown_triplets=allow_unknown_triplets,
                                  allow_unknown_functions=allow_unknown_functions,
-                                 strict=strict)
-    logger.debug('Loading file {0}'.format(f.name))
-    field_start_offset = f.tell()
+                                 strict=strict,
+                                 hooks=hooks,
+                                 counters=counters,
+                                 compact=compact)
+    if recover is True:
+        recover = Recovery()
+    r = reader.open_reader(f)
     try:
-        logger.debug('Reading structured field {0} at offset {1}'.format(field_no, field_start_offset))
-        sf = read_structured_field(f, parser_config)
-        while sf is not None:
-            yield sf
+        if parser_config.debug:
+            logger.debug('Loading file {0}'.format(r.name))
+        yield from read_structured_fields(r,
+                                          parser_config,
+                                          lazy=lazy,
+                                          include=include,
+                                          exclude=exclude,
+                                          recovery=recover or None)
+        if parser_config.debug:
+            logger.debug('End of file {0}'.format(r.name))
+    finally:
+        r.close()
+
+def read_structured_fields(r, parser_config, field_no=1, lazy=False, include=None, exclude=None, recovery=None):
+    """Generator reading structured fields from reader r until EOF.
+
+    field_no is the field number of the first structured field read, used to
+    number the fields in errors. include and exclude are sets of SFTypeIDs to
+    filter the structured fields with - see stream. If recovery is a Recovery
+    object, errors are recovered from and reported to it rather than raised -
+    see stream.
+    """
+    filtered = include is not None or exclude is not None
+    debug = parser_config.debug
+    instrumented = parser_config.instrumented
+    field_start_offset = r.tell()
+    while True:
+        framed = False
+        try:
+            while True:
+                framed = False
+                if debug:
+                    logger.debug('Reading structured field {0} at offset {1}'.format(field_no, field_start_offset))
+                if instrumented:
+                    start_ns = time.perf_counter_ns()
+                sf_length = read_structured_field_length(r, debug=debug)
+                if sf_length is None:
+                    return
+                if recovery is not None and r.tell() - field_start_offset == 3:
+                    _check_framing(r, sf_length)
+                sf_type_id = peek_sf_type_id(r) if filtered else None
+                if sf_type_id is not None and \
+                   ((include is not None and sf_type_id not in include) or
+                    (exclude is not None and sf_type_id in exclude)):
+                    skip_structured_field_data(r, sf_length, debug=debug)
+                    framed = True
+                    if instrumented and parser_config.counters is not None:
+                        parser_config.counters.bytes_read += r.tell() - field_start_offset
+                else:
+                    data = read_structured_field_data(r, sf_length, debug=debug)
+                    framed = True
+                    try:
+                        sf = parse_structured_field(sf_length, data, parser_config, lazy=lazy)
+                    except exceptions.ParseError:
+                        raise
+                    except Exception as e:
+                        if recovery is None:
+                            raise
+                        # Corrupt data can trip up the parser in ways it
+                        # doesn't check for - recover from those too
+                        raise exceptions.InvalidStructuredFieldError('Structured field could not be parsed: {0!r}'.format(e)) from e
+                    if lazy:
+                        sf.field_no = field_no
+                        sf.field_start_offset = field_start_offset
+                    if instrumented:
+                        _instrument(parser_config,
+                                    field_no,
+                                    field_start_offset,
+                                    sf[fields.PNAME_SF_TYPE_ID],
+                                    sf_length,
+                                    r.tell(),
+                                    start_ns)
+                    yield sf
+                field_no += 1
+                field_start_offset = r.tell()
+        except exceptions.ParseError as e:
+            e.field_no = field_no
+            e.field_start_offset = field_start_offset
+            logger.error(e)
+            if recovery is None:
+                raise e
+            _resync(r, field_start_offset, framed)
+            recovery.skipped.append(SkippedRange(field_no, field_start_offset, r.tell(), e))
+            logger.warning('Skipped bytes {0} to {1} after error in structured field {2}'.format(field_start_offset,
+                                                                                              r.tell(),
+                                                                                              field_no))
             field_no += 1
-            field_start_offset = f.tell()
-            logger.debug('Reading structured field {0} at offset {1}'.format(field_no, field_start_offset))
-            sf = read_structured_field(f, parser_config)
-    except exceptions.ParseError as e:
-        e.field_no = field_no
-        e.field_start_offset = field_start_offset
-        logger.error(e)
-        raise e
-    logger.debug('End of file {0}'.format(f.name))
+            field_start_offset = r.tell()
+
+def _check_framing(r, sf_length):
+    """Raise InvalidStructuredFieldError if the structured field of length
+    sf_length, whose length has just been read from reader r after a carriage
+    control character, isn't followed by another carriage control character or
+    EOF. In recover mode this catches a corrupt length before the structured
+    fields it overruns, or the end of the file, are read as its data.
+    """
+    if sf_length <= 2:
+        return
+    b = r.peek(sf_length - 1)
+    if len(b) < sf_length - 2:
+        raise exceptions.InvalidStructuredFieldError('Not enough data to read structured field')
+    if len(b) == sf_length - 1 and b[-1] != CARRIAGE_CONTROL_CHAR:
+        raise exceptions.InvalidStructuredFieldError('Structured field length {0} does not end at the next structured field'.format(sf_length))
+
+def _plausible_structured_field(r):
+    """Return True if the next bytes in reader r, starting with a carriage
+    control character, look like a structured field: a structured field length
+    of at least a Structured Field Introducer, the MO:DCA class code, and
+    either another carriage control character or EOF just after the end of the
+    structured field.
+    """
+    b = r.peek(SF_TYPE_ID_LENGTH + 1)
+    if len(b) < SF_TYPE_ID_LENGTH + 1 or b[3] != MODCA_CLASS_CODE:
+        return False
+    sf_length = int.from_bytes(b[1:3], 'big')
+    if sf_length < SFI_LENGTH:
+        return False
+    b = r.peek(sf_length + 2)
+    return len(b) == sf_length + 1 or (len(b) == sf_length + 2 and b[-1] == CARRIAGE_CONTROL_CHAR)
+
+def _plausible_structured_field_start(r):
+    """Return True if the next bytes in reader r look like the start of a
+    structured field, with or without a carriage control character: a
+    structured field length of at least a Structured Field Introducer followed
+    by the MO:DCA class code.
+    """
+    b = r.peek(SF_TYPE_ID_LENGTH + 1)
+    if len(b) > 0 and b[0] == CARRIAGE_CONTROL_CHAR:
+        b = b[1:]
+    if len(b) < 3 or b[2] != MODCA_CLASS_CODE:
+        return False
+    return int.from_bytes(b[:2], 'big') >= SFI_LENGTH
+
+def _resync(r, field_start_offset, framed=False):
+    """Skip forward in reader r, after an error in the structured field at
+    byte number field_start_offset, to the next plausible structured field or
+    EOF.
+
+    If framed is True the length of the structured field in error was intact
+    and the reader is at its end, where the next structured field is expected,
+    so parsing resumes there if it looks like the start of a structured field.
+    Otherwise the reader searches for each carriage control character in turn,
+    so the bytes skipped aren't looked at one by one.
+    """
+    if framed and (len(r.peek(1)) == 0 or _plausible_structured_field_start(r)):
+        return
+    if r.tell() == field_start_offset:
+        r.skip(1)
+    while r.find(_CARRIAGE_CONTROL):
+        if _plausible_structured_field(r):
+            return
+        r.skip(1)
+
+def _instrument(parser_config, field_no, field_start_offset, sf_type_id, sf_length, field_end_offset, start_ns):
+    """Update the counters and call the hooks of parser_config after reading a
+    structured field.
+    """
+    elapsed_ns = time.perf_counter_ns() - start_ns
+    counters = parser_config.counters
+    if counters is not None:
+        counters.bytes_read += field_end_offset - field_start_offset
+        counters.fields_decoded += 1
+    for hook in parser_config.hooks:
+        hook(field_no, field_start_offset, sf_type_id, sf_length, elapsed_ns)
 
 def load(f,
          allow_unknown_fields=False,
          allow_unknown_triplets=False,
          allow_unknown_functions=False,
-         strict=False):
+         strict=False,
+         lazy=False,
+         include=None,
+         exclude=None,
+         hooks=None,
+         counters=None,
+         compact=False,
+         recover=False):
     """Interface to the parser. Parse AFP file f.
 
     Returns a list of structured fields in the AFP file. Note that this causes
@@ -595,7 +1051,11 @@ def load(f,
             for sf in fields:
                 # Do something with structured field sf
 
-    Open AFP files in binary as the encoding is not ASCII but EBCDIC.
+    As with stream, f can be a file opened in binary or the path of a file,
+    lazy returns lazily-parsed structured fields, include and exclude filter
+    the structured fields by type, compact returns records in place of
+    dictionaries, cutting the memory the list takes, and recover skips past
+    errors rather than raising them.
 
     For the configuration arguments see the ParserConfig object at the top of
     this file.
@@ -605,6 +1065,60 @@ def load(f,
                      allow_unknown_fields=allow_unknown_fields,
                      allow_unknown_triplets=allow_unknown_triplets,
                      allow_unknown_functions=allow_unknown_functions,
-                     strict=strict):
+                     strict=strict,
+                     lazy=lazy,
+                     include=include,
+                     exclude=exclude,
+                     hooks=hooks,
+                     counters=counters,
+                     compact=compact,
+                     recover=recover):
         field_list.append(sf)
     return field_list
+
+def scan(f):
+    """Scan AFP file f, reading only the Structured Field Introducers.
+
+    Returns a generator of a FieldHeader for each structured field in the file.
+    The structured field data is skipped without being parsed so this is much
+    quicker than stream. As with stream, f can be a file opened in binary or the
+    path of a file.
+    """
+    r = reader.open_reader(f)
+    try:
+        yield from scan_structured_fields(r)
+    finally:
+        r.close()
+
+def scan_structured_fields(r, field_no=1):
+    """Generator scanning the Structured Field Introducers in reader r until EOF.
+
+    field_no is the field number of the first structured field read, used to
+    number the fields in errors.
+    """
+    debug = logger.isEnabledFor(logging.DEBUG)
+    field_start_offset = r.tell()
+    try:
+        while True:
+            sf_length = read_structured_field_length(r, debug=debug)
+            if sf_length is None:
+                break
+            if sf_length < SFI_LENGTH:
+                raise exceptions.InvalidStructuredFieldError('Structured field incorrect length')
+            b = r.peek(SF_TYPE_ID_LENGTH + 1)
+            if len(b) < SF_TYPE_ID_LENGTH + 1:
+                raise exceptions.InvalidStructuredFieldError('Not enough data to read structured field')
+            sf_type_id = int.from_bytes(b[:SF_TYPE_ID_LENGTH], 'big')
+            if sf_type_id >> 16 != MODCA_CLASS_CODE:
+                raise exceptions.UnrecognizedIdentifierCodeError('Unrecognized class code 0x{0:06X} - MO:DCA uses class code 0x{1:02X}'.format(sf_type_id, MODCA_CLASS_CODE))
+            flag_byte = b[SF_TYPE_ID_LENGTH]
+            skip_structured_field_data(r, sf_length, debug=debug)
+            field_end_offset = r.tell()
+            yield FieldHeader(field_start_offset, field_end_offset, sf_length, sf_type_id, flag_byte)
+            field_no += 1
+            field_start_offset = field_end_offset
+    except exceptions.ParseError as e:
+        e.field_no = field_no
+        e.field_start_offset = field_start_offset
+        logger.error(e)
+        raise e
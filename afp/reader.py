@@ -0,0 +1,269 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Readers used by the parser to get at the bytes of an AFP file.
+
+   A reader behaves much like a binary file opened for reading, except that it
+   never needs to seek backwards: the parser can peek at bytes without consuming
+   them. Where possible the file is memory-mapped and read by walking a running
+   offset over the mapping, otherwise it is read through a buffer.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import mmap
+import os
+import stat
+
+# The number of bytes read at a time by a BufferedFileReader
+DEFAULT_BUFFER_SIZE = 256 * 1024
+
+class MemoryReader:
+    """Reads from a byte buffer already in memory.
+
+    The bytes returned by read and peek are memoryview slices of the buffer so
+    no data is copied.
+    """
+    def __init__(self, buffer, offset=0, end=None, base_offset=0, name=None):
+        """
+        Arguments:
+        buffer - The object supporting the buffer protocol to read from.
+        offset - The position in the buffer to start reading from.
+        end - The position in the buffer to stop reading at. None means the end
+              of the buffer.
+        base_offset - The offset within the file of the start of the buffer, so
+                      that tell returns file offsets.
+        name - The name of the file, for logging.
+        """
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+        self._pos = offset
+        self._end = len(self._view) if end is None else end
+        self._base_offset = base_offset
+        self.name = name
+
+    def tell(self):
+        """Return the file offset of the next byte to be read."""
+        return self._base_offset + self._pos
+
+    def peek(self, n):
+        """Return up to n bytes without consuming them."""
+        return self._view[self._pos:min(self._pos + n, self._end)]
+
+    def read(self, n):
+        """Read and return up to n bytes. Fewer bytes are returned at EOF."""
+        b = self._view[self._pos:min(self._pos + n, self._end)]
+        self._pos += len(b)
+        return b
+
+    def skip(self, n):
+        """Consume up to n bytes without returning them.
+
+        Returns the number of bytes skipped.
+        """
+        n = max(0, min(n, self._end - self._pos))
+        self._pos += n
+        return n
+
+    def find(self, sub):
+        """Skip forward to the next occurrence of bytes sub.
+
+        Returns True if it is found, with sub the next bytes to be read, or
+        False with everything consumed.
+        """
+        find = getattr(self._buffer, 'find', None)
+        if find is not None:
+            i = find(sub, self._pos, self._end)
+        else:
+            i = bytes(self._view[self._pos:self._end]).find(sub)
+            if i >= 0:
+                i += self._pos
+        if i < 0:
+            self._pos = self._end
+            return False
+        self._pos = i
+        return True
+
+    def close(self):
+        """Release the buffer."""
+        self._view.release()
+
+class MappedFileReader(MemoryReader):
+    """Reads a regular file through a read-only memory mapping.
+
+    Reading starts from the current position of the file. When the reader is
+    closed the file position is set to just after the last byte consumed.
+    """
+    def __init__(self, f, close_file=False):
+        """
+        Arguments:
+        f - The file to read, opened in binary mode.
+        close_file - If True, close the file when the reader is closed.
+        """
+        self._file = f
+        self._close_file = close_file
+        self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        super().__init__(self._mmap, offset=f.tell(), name=getattr(f, 'name', None))
+
+    def close(self):
+        """Unmap the file and leave its position after the bytes consumed."""
+        self._file.seek(self.tell())
+        super().close()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Parse results still hold views of the mapping; it's unmapped when
+            # the last of them is released.
+            pass
+        if self._close_file:
+            self._file.close()
+
+class BufferedFileReader:
+    """Reads a file, pipe or socket through a buffer.
+
+    Needs nothing but the read method of the file, so it works with inputs that
+    cannot seek or be memory-mapped such as stdin. Peeking looks ahead in the
+    buffer rather than seeking back in the file.
+    """
+    def __init__(self, f, buffer_size=DEFAULT_BUFFER_SIZE, close_file=False):
+        """
+        Arguments:
+        f - The file to read, opened in binary mode.
+        buffer_size - The number of bytes to read from the file at a time.
+        close_file - If True, close the file when the reader is closed.
+        """
+        self._file = f
+        self._close_file = close_file
+        self._buffer_size = buffer_size
+        self._buffer = memoryview(b'')
+        self._pos = 0
+        # The file offset of the start of the buffer
+        try:
+            self._buffer_offset = f.tell()
+        except (AttributeError, OSError):
+            self._buffer_offset = 0
+        self.name = getattr(f, 'name', None)
+
+    def _fill(self, n):
+        """Make sure there are at least n unconsumed bytes in the buffer, unless
+        we reach EOF first.
+        """
+        available = len(self._buffer) - self._pos
+        if available >= n:
+            return
+        chunks = [self._buffer[self._pos:]]
+        while available < n:
+            chunk = self._file.read(max(self._buffer_size, n - available))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            available += len(chunk)
+        self._buffer_offset += self._pos
+        self._buffer = memoryview(b''.join(chunks))
+        self._pos = 0
+
+    def tell(self):
+        """Return the file offset of the next byte to be read."""
+        return self._buffer_offset + self._pos
+
+    def peek(self, n):
+        """Return up to n bytes without consuming them."""
+        self._fill(n)
+        return self._buffer[self._pos:self._pos + n]
+
+    def read(self, n):
+        """Read and return up to n bytes. Fewer bytes are returned at EOF."""
+        self._fill(n)
+        b = self._buffer[self._pos:self._pos + n]
+        self._pos += len(b)
+        return b
+
+    def skip(self, n):
+        """Consume up to n bytes without returning them.
+
+        Returns the number of bytes skipped.
+        """
+        skipped = min(n, len(self._buffer) - self._pos)
+        self._pos += skipped
+        while skipped < n:
+            chunk = self._file.read(min(self._buffer_size, n - skipped))
+            if not chunk:
+                break
+            self._buffer_offset += len(chunk)
+            skipped += len(chunk)
+        return skipped
+
+    def find(self, sub):
+        """Skip forward to the next occurrence of bytes sub.
+
+        Returns True if it is found, with sub the next bytes to be read, or
+        False with everything consumed.
+        """
+        while True:
+            # The buffer is always a view of a whole bytes object
+            i = self._buffer.obj.find(sub, self._pos)
+            if i >= 0:
+                self._pos = i
+                return True
+            # Keep the bytes that may be the start of sub and read on
+            self._pos = max(self._pos, len(self._buffer) - len(sub) + 1)
+            available = len(self._buffer) - self._pos
+            self._fill(available + 1)
+            if len(self._buffer) - self._pos == available:
+                self._pos = len(self._buffer)
+                return False
+
+    def close(self):
+        """Leave the file position after the bytes consumed, if the file can
+        seek.
+        """
+        if self._close_file:
+            self._file.close()
+            return
+        try:
+            if self._file.seekable():
+                self._file.seek(self.tell())
+        except (AttributeError, OSError, ValueError):
+            pass
+
+def _mappable(f):
+    """Return True if file f is a non-empty regular file we can memory-map."""
+    try:
+        if not f.seekable():
+            return False
+        st = os.fstat(f.fileno())
+    except (AttributeError, OSError, ValueError):
+        # io.UnsupportedOperation is both an OSError and a ValueError
+        return False
+    return stat.S_ISREG(st.st_mode) and st.st_size > 0
+
+def open_reader(f):
+    """Return a reader for f, which is either a path or a file opened in binary
+    mode.
+
+    Regular files are memory-mapped. Anything else - pipes, sockets, in-memory
+    files - is read through a buffer. If f is a path the file is closed when the
+    reader is closed.
+    """
+    close_file = False
+    if isinstance(f, (str, bytes, os.PathLike)):
+        f = open(f, 'rb')
+        close_file = True
+    if _mappable(f):
+        try:
+            return MappedFileReader(f, close_file=close_file)
+        except (OSError, ValueError):
+            # Fall back to buffered reading if the mapping fails
+            pass
+    return BufferedFileReader(f, close_file=close_file)
@@ -0,0 +1,197 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Compact records for the parser results.
+
+   By default the parser returns each structured field, triplet, PTOCA control
+   sequence and repeating group as a dictionary. With the compact option it
+   returns records instead: objects of a class generated for each syntax, with
+   a __slots__ entry for every parameter the syntax can produce. A record takes
+   a fraction of the memory of a dictionary and the parameter names are held
+   once in the class rather than in every result.
+
+   The parameter names that parser._add_param numbers when a name appears more
+   than once in a syntax - Reserved, Reserved-2 and so on - are worked out when
+   the class is generated, so the records have exactly the keys the
+   dictionaries would.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import collections.abc
+
+from . import fields
+from . import functions
+from . import triplets
+
+# Name of the parse result key holding the list of exceptions - as
+# parser.PNAME_EXCEPTIONS, which can't be imported here as the parser imports
+# this module.
+_PNAME_EXCEPTIONS = '_exceptions'
+_PNAME_REPEATING_GROUP = 'RepeatingGroup'
+
+# The parameters added to the parameters of a syntax by the parser
+FIELD_LEADING_NAMES = tuple(param.name for param in fields.SYNTAX_SFI) + (fields.PNAME_SF_LENGTH,)
+TRIPLET_TRAILING_NAMES = (triplets.PNAME_T_LENGTH, triplets.PNAME_T_ID)
+FUNCTION_TRAILING_NAMES = (functions.PNAME_CS_LENGTH, functions.PNAME_CS_TYPE)
+
+class Record(collections.abc.MutableMapping):
+    """Base class of the compact records. A record is a mapping with the same
+    keys and values as the dictionary the parser would otherwise return.
+
+    Parameters that aren't in the record's layout, which the parser doesn't
+    produce for the syntax the class was generated for, are kept in a
+    dictionary of their own.
+
+    Records are pickled as dictionaries.
+    """
+    __slots__ = ('_extra',)
+    # Parameter name: slot name, and the (name, slot name) pairs in order
+    _slot_names = {}
+    _layout = ()
+
+    def __getitem__(self, key):
+        slot = self._slot_names.get(key)
+        if slot is not None:
+            try:
+                return getattr(self, slot)
+            except AttributeError:
+                raise KeyError(key) from None
+        try:
+            return self._extra[key]
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        slot = self._slot_names.get(key)
+        if slot is not None:
+            setattr(self, slot, value)
+            return
+        try:
+            self._extra[key] = value
+        except AttributeError:
+            self._extra = {key: value}
+
+    def __delitem__(self, key):
+        slot = self._slot_names.get(key)
+        try:
+            if slot is not None:
+                delattr(self, slot)
+            else:
+                del self._extra[key]
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key):
+        slot = self._slot_names.get(key)
+        if slot is not None:
+            return hasattr(self, slot)
+        try:
+            return key in self._extra
+        except AttributeError:
+            return False
+
+    def __iter__(self):
+        for name, slot in self._layout:
+            if hasattr(self, slot):
+                yield name
+        try:
+            yield from self._extra
+        except AttributeError:
+            pass
+
+    def __len__(self):
+        n = 0
+        for name, slot in self._layout:
+            if hasattr(self, slot):
+                n += 1
+        try:
+            n += len(self._extra)
+        except AttributeError:
+            pass
+        return n
+
+    def copy(self):
+        """Return a shallow copy of the record."""
+        result = type(self)()
+        for key, value in self.items():
+            result[key] = value
+        return result
+
+    def __reduce__(self):
+        return (dict, (dict(self.items()),))
+
+    def __repr__(self):
+        return '<{0} {1}>'.format(type(self).__name__, dict(self.items()))
+
+def syntax_names(syntax, leading=(), trailing=()):
+    """Return the names of all the parameters the parser can produce for a
+    syntax, in order, numbered as parser._add_param numbers them.
+
+    leading are the names of parameters already in the result when the syntax
+    is parsed, such as those of the Structured Field Introducer; trailing those
+    added after it.
+    """
+    appearances = {}
+    names = []
+    def add(name):
+        count = appearances.get(name, 0) + 1
+        appearances[name] = count
+        names.append(name if count == 1 else '{0}-{1}'.format(name, count))
+    for name in leading:
+        add(name)
+    for param in syntax:
+        add(_PNAME_REPEATING_GROUP if type(param) == list else param.name)
+    for name in trailing:
+        add(name)
+    if _PNAME_EXCEPTIONS not in names:
+        names.append(_PNAME_EXCEPTIONS)
+    return names
+
+# Generated record classes, keyed by the id of the syntax and the names added
+# to it
+_classes = {}
+
+def record_class(syntax, leading=(), trailing=(), name='Record'):
+    """Return the record class for results of a syntax, generating it on first
+    use. For leading and trailing see syntax_names.
+    """
+    key = (id(syntax), leading, trailing)
+    entry = _classes.get(key)
+    if entry is None or entry[0] is not syntax:
+        names = syntax_names(syntax, leading, trailing)
+        slots = tuple('_{0}'.format(i) for i in range(len(names)))
+        cls = type(name, (Record,), {
+            '__slots__': slots,
+            '_slot_names': dict(zip(names, slots)),
+            '_layout': tuple(zip(names, slots)),
+        })
+        entry = (syntax, cls)
+        _classes[key] = entry
+    return entry[1]
+
+def field_record_class(sf_type_id):
+    """Return the record class of structured fields of type sf_type_id."""
+    sf_type = fields.SF_TYPES.get(sf_type_id)
+    if sf_type is None or sf_type.syntax is None:
+        return record_class(fields.SYNTAX_FIELD_RAW, leading=FIELD_LEADING_NAMES, name='UnknownField')
+    return record_class(sf_type.syntax, leading=FIELD_LEADING_NAMES, name=sf_type.abbreviation.replace('-', '_'))
+
+def triplet_record_class(syntax):
+    """Return the record class of triplets of a syntax."""
+    return record_class(syntax, trailing=TRIPLET_TRAILING_NAMES, name='Triplet')
+
+def function_record_class(syntax):
+    """Return the record class of PTOCA control sequences of a syntax."""
+    return record_class(syntax, trailing=FUNCTION_TRAILING_NAMES, name='ControlSequence')
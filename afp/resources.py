@@ -0,0 +1,375 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Index and cache of the resources in an AFP file.
+
+   The resources held in inline resource groups - each one from its Begin
+   Resource (BRS) to its End Resource (ERS) - are found by reading the
+   Structured Field Introducers, parsing only the BRS for the name of the
+   resource and its type from the Resource Object Type triplet (0x21).
+
+   A resource is parsed the first time it is asked for and kept in a cache,
+   shared by default between all files, keyed by its name, type, a digest of
+   its bytes and the parser settings it was parsed with. So an overlay
+   included on every page, or repeated in the resource group of every file in
+   a concatenated spool, is only parsed once. The cache evicts the least
+   recently used resources when the bytes of the resources it holds go over
+   its size.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import bisect
+import collections
+import hashlib
+import logging
+
+from . import exceptions
+from . import fields
+from . import parser
+from . import reader
+from . import triplets
+
+logger = logging.getLogger(__name__)
+
+# Resource Object Types, triplet 0x21 ObjType
+OBJ_TYPE_GOCA = 0x03
+OBJ_TYPE_BCOCA = 0x05
+OBJ_TYPE_IOCA = 0x06
+OBJ_TYPE_FONT_CHARACTER_SET = 0x40
+OBJ_TYPE_CODE_PAGE = 0x41
+OBJ_TYPE_CODED_FONT = 0x42
+OBJ_TYPE_OBJECT_CONTAINER = 0x92
+OBJ_TYPE_DOCUMENT = 0xA8
+OBJ_TYPE_PAGE_SEGMENT = 0xFB
+OBJ_TYPE_OVERLAY = 0xFC
+OBJ_TYPE_FORM_MAP = 0xFE
+
+# Triplet 0x02 FQN types that refer to resources, and the type of resource
+FQN_TYPE_OBJ_TYPES = {
+    0x84: OBJ_TYPE_OVERLAY,                 # Begin Resource Object Reference
+    0x85: OBJ_TYPE_CODE_PAGE,               # Code Page Name Reference
+    0x86: OBJ_TYPE_FONT_CHARACTER_SET,      # Font Character Set Name Reference
+    0x8E: OBJ_TYPE_CODED_FONT,              # Coded Font Name Reference
+}
+
+# The total size in bytes of the resources kept by a ResourceCache by default
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+
+# A resource in an AFP file
+# name - The RSName from the BRS.
+# obj_type - The ObjType from the BRS Resource Object Type triplet, or None if
+#            it doesn't have one.
+# start_offset - The byte number where the BRS starts.
+# end_offset - The byte number just after the ERS.
+# field_no - The field number in the file of the BRS.
+Resource = collections.namedtuple('Resource', ['name', 'obj_type', 'start_offset', 'end_offset', 'field_no'])
+
+def _brs_resource(brs, start_offset, field_no):
+    """Make the Resource begun by parsed BRS structured field brs, without its
+    end offset.
+    """
+    obj_type = None
+    for triplet in brs.get(fields.PNAME_TRIPLETS, []):
+        if triplet[triplets.PNAME_T_ID] == triplets.TT_21:
+            obj_type = triplet.get('ObjType')
+            break
+    return Resource(brs.get('RSName'), obj_type, start_offset, None, field_no)
+
+def references(sf):
+    """Return the resources referred to by a parsed structured field.
+
+    Overlays are found from IPO and MPO, page segments from IPS and fonts and
+    code pages from MCF and MCF-1.
+
+    Returns:
+    List of (name, obj_type) of each resource referred to.
+    """
+    sf_type_id = sf[fields.PNAME_SF_TYPE_ID]
+    result = []
+    if sf_type_id == fields.SF_IPO:
+        result.append((sf.get('OvlyName'), OBJ_TYPE_OVERLAY))
+    elif sf_type_id == fields.SF_IPS:
+        result.append((sf.get('PsegName'), OBJ_TYPE_PAGE_SEGMENT))
+    elif sf_type_id == fields.SF_MCF_1:
+        for group in sf.get(parser.PNAME_REPEATING_GROUP, []):
+            result.append((group.get('CFName'), OBJ_TYPE_CODED_FONT))
+            result.append((group.get('CPName'), OBJ_TYPE_CODE_PAGE))
+            result.append((group.get('FCSName'), OBJ_TYPE_FONT_CHARACTER_SET))
+    elif sf_type_id in (fields.SF_MCF, fields.SF_MPO):
+        for group in sf.get(parser.PNAME_REPEATING_GROUP, []):
+            for triplet in group.get(fields.PNAME_TRIPLETS, []):
+                if triplet[triplets.PNAME_T_ID] == triplets.TT_02 and triplet.get('FQNType') in FQN_TYPE_OBJ_TYPES:
+                    result.append((triplet.get('FQName'), FQN_TYPE_OBJ_TYPES[triplet['FQNType']]))
+    return [(name, obj_type) for name, obj_type in result if name]
+
+class ResourceIndex:
+    """The byte ranges of the resources in an AFP file.
+
+    Attributes:
+    resources - List of a Resource for each BRS to ERS in the file, in the
+                order they appear.
+    """
+    def __init__(self):
+        self.resources = []
+        # The resources by name, then by (name, obj_type): (start offsets,
+        # resources) in file order
+        self._by_name = {}
+        self._by_key = {}
+
+    def _add(self, resource):
+        """Add a resource to the index."""
+        self.resources.append(resource)
+        for key, table in ((resource.name, self._by_name), ((resource.name, resource.obj_type), self._by_key)):
+            starts, found = table.setdefault(key, ([], []))
+            starts.append(resource.start_offset)
+            found.append(resource)
+
+    @classmethod
+    def build(cls, f):
+        """Build the resource index of AFP file f, which can be a file opened
+        in binary or the path of a file.
+        """
+        index = cls()
+        parser_config = parser.ParserConfig(allow_unknown_fields=True,
+                                            allow_unknown_triplets=True,
+                                            allow_unknown_functions=True)
+        r = reader.open_reader(f)
+        try:
+            field_no = 1
+            field_start_offset = r.tell()
+            resource = None
+            try:
+                while True:
+                    sf_length = parser.read_structured_field_length(r, debug=parser_config.debug)
+                    if sf_length is None:
+                        break
+                    sf_type_id = parser.peek_sf_type_id(r)
+                    if sf_type_id == fields.SF_BRS:
+                        if resource is not None:
+                            raise exceptions.InvalidStructuredFieldError('Begin resource within a resource')
+                        data = parser.read_structured_field_data(r, sf_length, debug=parser_config.debug)
+                        brs = parser.parse_structured_field(sf_length, data, parser_config)
+                        resource = _brs_resource(brs, field_start_offset, field_no)
+                    else:
+                        parser.skip_structured_field_data(r, sf_length, debug=parser_config.debug)
+                        if sf_type_id == fields.SF_ERS and resource is not None:
+                            index._add(resource._replace(end_offset=r.tell()))
+                            resource = None
+                    field_no += 1
+                    field_start_offset = r.tell()
+                if resource is not None:
+                    raise exceptions.InvalidStructuredFieldError('End of file within a resource')
+            except exceptions.ParseError as e:
+                if e.field_no is None:
+                    e.field_no = field_no
+                    e.field_start_offset = field_start_offset
+                    parser.logger.error(e)
+                raise e
+        finally:
+            r.close()
+        logger.debug('Indexed {0} resources'.format(len(index.resources)))
+        return index
+
+    def __len__(self):
+        return len(self.resources)
+
+    def find(self, name, obj_type=None, offset=None):
+        """Find a resource by its name, and its type if obj_type is given.
+
+        Where the same resource appears more than once, the last one starting
+        before byte offset is returned - the one in scope for a structured
+        field at that offset - or the last in the file if offset is None.
+
+        Returns the Resource, or None if there is none.
+        """
+        if obj_type is None:
+            entry = self._by_name.get(name)
+        else:
+            entry = self._by_key.get((name, obj_type))
+        if entry is None:
+            return None
+        starts, found = entry
+        if offset is None:
+            return found[-1]
+        i = bisect.bisect_left(starts, offset)
+        if i == 0:
+            return None
+        return found[i - 1]
+
+class ResourceCache:
+    """A least recently used cache of parsed resources, limited by the total
+    size of the resources in the file.
+
+    Attributes:
+    max_size - The most bytes of resources to hold.
+    size - The bytes of the resources held.
+    hits, misses - The number of lookups that found, or didn't find, their
+                   resource in the cache.
+    """
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # key: (value, size), least recently used first
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the value cached for key, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value, size):
+        """Cache value for key, counting it as size bytes. A value bigger than
+        max_size is not cached.
+        """
+        if key in self._entries:
+            self.size -= self._entries.pop(key)[1]
+        if size > self.max_size:
+            return
+        self._entries[key] = (value, size)
+        self.size += size
+        while self.size > self.max_size:
+            self.size -= self._entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        """Empty the cache."""
+        self._entries.clear()
+        self.size = 0
+
+# The cache shared by the ResourceFiles not given one of their own
+shared_cache = ResourceCache()
+
+class ResourceFile:
+    """The resources of an AFP file, parsed when they are asked for.
+
+    The structured fields of a resource are returned as a list from its BRS to
+    its ERS. The list and structured fields are shared through the cache with
+    every caller loading the same resource with the same parser settings, from
+    this file or another, so they must not be changed. Copy them first to
+    change them.
+    """
+    def __init__(self,
+                 path,
+                 index=None,
+                 cache=None,
+                 allow_unknown_fields=False,
+                 allow_unknown_triplets=False,
+                 allow_unknown_functions=False,
+                 strict=False,
+                 compact=False):
+        """
+        Arguments:
+        path - The path of the AFP file.
+        index - The ResourceIndex of the file. Built if not given.
+        cache - The ResourceCache to use. Defaults to shared_cache.
+
+        For the other arguments see the ParserConfig object in parser.py.
+        """
+        self.path = path
+        self.index = ResourceIndex.build(path) if index is None else index
+        self.cache = shared_cache if cache is None else cache
+        self._parser_config = parser.ParserConfig(allow_unknown_fields=allow_unknown_fields,
+                                                  allow_unknown_triplets=allow_unknown_triplets,
+                                                  allow_unknown_functions=allow_unknown_functions,
+                                                  strict=strict,
+                                                  compact=compact)
+        # The parser settings that change the parsed structured fields, which
+        # are part of the cache keys
+        self._config_key = (allow_unknown_fields,
+                            allow_unknown_triplets,
+                            allow_unknown_functions,
+                            strict,
+                            compact)
+        self._file = open(path, 'rb')
+        # Cache keys by resource start offset, so each resource is only read
+        # and digested once
+        self._keys = {}
+
+    def close(self):
+        """Close the file."""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _read(self, resource):
+        """Read the bytes of a resource."""
+        self._file.seek(resource.start_offset)
+        return self._file.read(resource.end_offset - resource.start_offset)
+
+    def load(self, resource):
+        """Return the parsed structured fields of a Resource of the file.
+
+        The list returned may be shared with other callers through the cache
+        and must not be changed - see ResourceFile.
+        """
+        key = self._keys.get(resource.start_offset)
+        data = None
+        if key is None:
+            data = self._read(resource)
+            key = (resource.name, resource.obj_type, hashlib.sha1(data).digest(), self._config_key)
+            self._keys[resource.start_offset] = key
+        result = self.cache.get(key)
+        if result is not None:
+            return result
+        if data is None:
+            data = self._read(resource)
+        r = reader.MemoryReader(data, base_offset=resource.start_offset, name=self.path)
+        result = list(parser.read_structured_fields(r, self._parser_config, field_no=resource.field_no))
+        self.cache.put(key, result, len(data))
+        return result
+
+    def get(self, name, obj_type=None, offset=None):
+        """Return the parsed structured fields of a resource found by name, as
+        for ResourceIndex.find, or None if the file doesn't hold it.
+        """
+        resource = self.index.find(name, obj_type, offset)
+        if resource is None:
+            return None
+        return self.load(resource)
+
+    def resolve(self, sf, offset=None):
+        """Return the resources referred to by a parsed structured field that
+        the file holds, as for references.
+
+        Returns:
+        Dictionary of the parsed structured fields of each resource by
+        (name, obj_type).
+        """
+        result = {}
+        for name, obj_type in references(sf):
+            resource_fields = self.get(name, obj_type, offset)
+            if resource_fields is not None:
+                result[(name, obj_type)] = resource_fields
+        return result
+
+def open_resources(path, cache=None, **kwargs):
+    """Open the resources of the AFP file at path.
+
+    Returns a ResourceFile. The other arguments are passed on to ResourceFile.
+    """
+    return ResourceFile(path, cache=cache, **kwargs)
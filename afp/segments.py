@@ -0,0 +1,238 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Reassembly of segmented structured fields.
+
+   Data too long for one structured field, such as image or object container
+   data, can be split across consecutive structured fields of the same type.
+   Each segment but the last has the segmented flag set in its Structured
+   Field Introducer. stream in this module returns such a run of segments as
+   one logical structured field - either parsed from the data of all the
+   segments joined together, or as a SegmentedField whose data is read a
+   segment at a time, so that even very large objects are never held in
+   memory whole.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from . import exceptions
+from . import fields
+from . import parser
+from . import reader
+
+# The offset of the flag byte in the Structured Field Introducer, after the
+# SFTypeID
+_FLAG_BYTE_OFFSET = parser.SF_TYPE_ID_LENGTH
+# The length of the Structured Field Introducer without its extension, after
+# the structured field length
+_SFI_BASE_LENGTH = 6
+
+def _segmented(data):
+    """Return True if the structured field in data, following its length, has
+    the segmented flag set.
+    """
+    return len(data) > _FLAG_BYTE_OFFSET and fields.sfi_seg_flag(data[_FLAG_BYTE_OFFSET])
+
+def _data_start(data):
+    """Return the offset of the structured field data in data, following the
+    structured field length, after the Structured Field Introducer and its
+    extension.
+    """
+    if len(data) < _SFI_BASE_LENGTH:
+        raise exceptions.InvalidStructuredFieldError('Not enough data to read structured field introducer')
+    start = _SFI_BASE_LENGTH
+    if fields.sfi_ext_flag(data[_FLAG_BYTE_OFFSET]):
+        if len(data) == _SFI_BASE_LENGTH:
+            raise exceptions.InvalidStructuredFieldError('Not enough data to read structured field introducer')
+        start += data[_SFI_BASE_LENGTH]
+    return start
+
+class SegmentedField:
+    """A run of segments of a structured field, whose data is read a segment
+    at a time.
+
+    The data is read from the file as chunks is iterated over, so it must be
+    read before the stream moves on to the next structured field. Whatever
+    hasn't been read then is skipped.
+
+    Attributes:
+    header - Dictionary of the Structured Field Introducer parameters of the
+             first segment.
+    sf_type_id - The SFTypeID of the segments.
+    field_no - The field number in the file of the first segment.
+    field_start_offset - The byte number where the first segment begins.
+    segment_count - The number of segments read so far.
+    """
+    def __init__(self, r, first, field_no, field_start_offset, parser_config):
+        """
+        Arguments:
+        r - The reader, positioned after the first segment.
+        first - The first segment, as a lazily-parsed StructuredField.
+        field_no - The field number in the file of the first segment.
+        field_start_offset - The byte number where the first segment begins.
+        parser_config - A ParserConfig object.
+        """
+        self.header = first.header
+        self.sf_type_id = self.header[fields.PNAME_SF_TYPE_ID]
+        self.field_no = field_no
+        self.field_start_offset = field_start_offset
+        self.segment_count = 1
+        self._r = r
+        self._parser_config = parser_config
+        self._first = first.data
+        self._started = False
+        self._done = False
+
+    def _read_segment(self):
+        """Read the next segment from the reader.
+
+        Returns a buffer of the segment's data, following its Structured Field
+        Introducer.
+        """
+        r = self._r
+        debug = self._parser_config.debug
+        field_no = self.field_no + self.segment_count
+        field_start_offset = r.tell()
+        try:
+            sf_length = parser.read_structured_field_length(r, debug=debug)
+            if sf_length is None:
+                raise exceptions.InvalidStructuredFieldError('End of file within segmented structured field 0x{0:06X}'.format(self.sf_type_id))
+            if parser.peek_sf_type_id(r) != self.sf_type_id:
+                raise exceptions.InvalidStructuredFieldError('Segmented structured field 0x{0:06X} is not continued'.format(self.sf_type_id))
+            data = parser.read_structured_field_data(r, sf_length, debug=debug)
+            start = _data_start(data)
+            if fields.sfi_pad_flag(data[_FLAG_BYTE_OFFSET]):
+                end = len(data) - parser.pad_length(data, start)
+            else:
+                end = len(data)
+        except exceptions.ParseError as e:
+            e.field_no = field_no
+            e.field_start_offset = field_start_offset
+            parser.logger.error(e)
+            raise e
+        self.segment_count += 1
+        if not _segmented(data):
+            self._done = True
+        return data[start:end]
+
+    def chunks(self):
+        """Return a generator of the data of each segment in turn, following
+        its Structured Field Introducer. It can only be called once.
+        """
+        if self._started:
+            raise exceptions.Error('The segments of a structured field can only be read once')
+        self._started = True
+        yield self._first
+        self._first = None
+        while not self._done:
+            yield self._read_segment()
+
+    def _skip_rest(self):
+        """Read past the segments that haven't been read."""
+        self._started = True
+        self._first = None
+        while not self._done:
+            self._read_segment()
+
+    def __repr__(self):
+        return '<SegmentedField 0x{0:06X} field {1} {2} segments read>'.format(self.sf_type_id,
+                                                                              self.field_no,
+                                                                              self.segment_count)
+
+def _join(segmented, first_raw, parser_config, lazy):
+    """Parse the logical structured field made of all the segments of a
+    SegmentedField. first_raw is the first segment following its length.
+
+    The logical structured field has the introducer of the first segment, with
+    the segmented and padding flags cleared, followed by the data of every
+    segment without its padding.
+    """
+    data = bytearray(first_raw[:_data_start(first_raw)])
+    data[_FLAG_BYTE_OFFSET] &= ~(fields.SFI_SEG_FLAG | fields.SFI_PAD_FLAG)
+    for chunk in segmented.chunks():
+        data += chunk
+    sf = parser.parse_structured_field(len(data) + 2, memoryview(data), parser_config, lazy=lazy)
+    if lazy:
+        sf.field_no = segmented.field_no
+        sf.field_start_offset = segmented.field_start_offset
+        # The bytes are no longer those of a structured field in the file, so
+        # the writer encodes the parameters rather than copying them
+        sf.raw = None
+    return sf
+
+def stream(f,
+           allow_unknown_fields=False,
+           allow_unknown_triplets=False,
+           allow_unknown_functions=False,
+           strict=False,
+           lazy=False,
+           chunked=False):
+    """Parse AFP file f, reassembling segmented structured fields.
+
+    Returns a generator of the structured fields, as parser.stream does, except
+    that each run of segments is returned as one structured field:
+
+    - If chunked is False, the data of the segments is joined and parsed as
+      one structured field, with the introducer of the first segment and the
+      segmented flag cleared. Its SFLength is the length of the joined
+      structured field, which may be more than a structured field can hold.
+    - If chunked is True, a SegmentedField is returned, whose chunks method
+      reads the data a segment at a time without joining it. The memory used
+      is then that of a single segment, however large the object.
+
+    The field number of the logical structured field is that of its first
+    segment. As with parser.stream, f can be a file opened in binary or the
+    path of a file. For the configuration arguments see the ParserConfig
+    object in parser.py.
+    """
+    parser_config = parser.ParserConfig(allow_unknown_fields=allow_unknown_fields,
+                                        allow_unknown_triplets=allow_unknown_triplets,
+                                        allow_unknown_functions=allow_unknown_functions,
+                                        strict=strict)
+    debug = parser_config.debug
+    r = reader.open_reader(f)
+    try:
+        field_no = 1
+        field_start_offset = r.tell()
+        try:
+            while True:
+                sf_length = parser.read_structured_field_length(r, debug=debug)
+                if sf_length is None:
+                    break
+                data = parser.read_structured_field_data(r, sf_length, debug=debug)
+                if _segmented(data):
+                    first = parser.parse_structured_field(sf_length, data, parser_config, lazy=True)
+                    segmented = SegmentedField(r, first, field_no, field_start_offset, parser_config)
+                    if chunked:
+                        yield segmented
+                        segmented._skip_rest()
+                    else:
+                        yield _join(segmented, data, parser_config, lazy)
+                    field_no += segmented.segment_count
+                else:
+                    sf = parser.parse_structured_field(sf_length, data, parser_config, lazy=lazy)
+                    if lazy:
+                        sf.field_no = field_no
+                        sf.field_start_offset = field_start_offset
+                    yield sf
+                    field_no += 1
+                field_start_offset = r.tell()
+        except exceptions.ParseError as e:
+            if e.field_no is None:
+                e.field_no = field_no
+                e.field_start_offset = field_start_offset
+                parser.logger.error(e)
+            raise e
+    finally:
+        r.close()
@@ -0,0 +1,225 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Splitting and merging AFP files by copying byte ranges.
+
+   Documents (BDT to EDT), named page groups (BNG to ENG) and pages (BPG to EPG)
+   are found by reading only the Structured Field Introducers, and their bytes
+   are copied to the output files as they are, without being parsed. Where the
+   operating system allows it the bytes are copied inside the kernel.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import collections
+import os
+
+from . import exceptions
+from . import fields
+from . import parser
+from . import reader
+
+# The units a file can be split into, and the structured fields that begin and
+# end them
+UNIT_DOCUMENT = 'document'
+UNIT_GROUP = 'group'
+UNIT_PAGE = 'page'
+UNITS = {
+    UNIT_DOCUMENT: (fields.SF_BDT, fields.SF_EDT),
+    UNIT_GROUP:    (fields.SF_BNG, fields.SF_ENG),
+    UNIT_PAGE:     (fields.SF_BPG, fields.SF_EPG),
+}
+
+# The number of bytes copied at a time when copying through a buffer
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# A unit of an AFP file
+# name - The name from the first parameter of the begin structured field, or
+#        None if it has none
+# start_offset - The byte number where the begin structured field starts
+# end_offset - The byte number just after the end structured field
+# field_no - The field number in the file of the begin structured field
+# field_count - The number of structured fields in the unit
+Unit = collections.namedtuple('Unit', ['name', 'start_offset', 'end_offset', 'field_no', 'field_count'])
+
+def _unit_name(sf_length, data, parser_config):
+    """Return the name of a unit from the bytes of its begin structured field,
+    or None if it has none.
+
+    The name is the first parameter of BDT, BNG and BPG.
+    """
+    sf = parser.parse_structured_field(sf_length, data, parser_config, lazy=True)
+    name_param = fields.SF_TYPES[sf[fields.PNAME_SF_TYPE_ID]].syntax[0]
+    return sf.get(name_param.name)
+
+def units(f, unit=UNIT_DOCUMENT):
+    """Find the documents, named page groups or pages in AFP file f.
+
+    Returns a generator of a Unit for each one. Only the Structured Field
+    Introducers are read, along with the begin structured field of each unit
+    for its name. As with parser.stream, f can be a file opened in binary or
+    the path of a file.
+
+    Arguments:
+    f - The AFP file.
+    unit - One of UNIT_DOCUMENT, UNIT_GROUP or UNIT_PAGE.
+    """
+    begin_type, end_type = UNITS[unit]
+    parser_config = parser.ParserConfig(allow_unknown_fields=True,
+                                        allow_unknown_triplets=True,
+                                        allow_unknown_functions=True)
+    r = reader.open_reader(f)
+    try:
+        field_no = 1
+        field_start_offset = r.tell()
+        begin = None
+        try:
+            while True:
+                sf_length = parser.read_structured_field_length(r, debug=parser_config.debug)
+                if sf_length is None:
+                    break
+                sf_type_id = parser.peek_sf_type_id(r)
+                if sf_type_id == begin_type:
+                    if begin is not None:
+                        raise exceptions.InvalidStructuredFieldError('Begin {0} within a {0}'.format(unit))
+                    data = parser.read_structured_field_data(r, sf_length, debug=parser_config.debug)
+                    begin = (_unit_name(sf_length, data, parser_config), field_start_offset, field_no)
+                else:
+                    parser.skip_structured_field_data(r, sf_length, debug=parser_config.debug)
+                    if sf_type_id == end_type and begin is not None:
+                        name, start_offset, begin_field_no = begin
+                        yield Unit(name, start_offset, r.tell(), begin_field_no, field_no - begin_field_no + 1)
+                        begin = None
+                field_no += 1
+                field_start_offset = r.tell()
+            if begin is not None:
+                raise exceptions.InvalidStructuredFieldError('End of file within a {0}'.format(unit))
+        except exceptions.ParseError as e:
+            if e.field_no is None:
+                e.field_no = field_no
+                e.field_start_offset = field_start_offset
+                parser.logger.error(e)
+            raise e
+    finally:
+        r.close()
+
+def copy_range(infile, outfile, start_offset, end_offset):
+    """Copy bytes start_offset up to end_offset of binary file infile to the
+    current position of binary file outfile.
+
+    Uses os.copy_file_range or os.sendfile to copy inside the kernel where they
+    are available, otherwise copies through a buffer.
+    """
+    outfile.flush()
+    count = end_offset - start_offset
+    offset = start_offset
+    try:
+        in_fd = infile.fileno()
+        out_fd = outfile.fileno()
+    except (AttributeError, OSError):
+        in_fd = out_fd = None
+    if in_fd is not None:
+        for copy in (getattr(os, 'copy_file_range', None), getattr(os, 'sendfile', None)):
+            if copy is None:
+                continue
+            try:
+                while count > 0:
+                    if copy is os.sendfile:
+                        n = copy(out_fd, in_fd, offset, count)
+                    else:
+                        n = copy(in_fd, out_fd, count, offset)
+                    if n == 0:
+                        break
+                    offset += n
+                    count -= n
+            except OSError:
+                # Not supported between these files - try the next way
+                continue
+            if count == 0:
+                # Bring the file object up to date with the position of the
+                # file descriptor that was written through
+                outfile.seek(os.lseek(out_fd, 0, os.SEEK_CUR))
+                return
+            break
+    infile.seek(offset)
+    while count > 0:
+        b = infile.read(min(COPY_BUFFER_SIZE, count))
+        if not b:
+            raise exceptions.Error('Unexpected end of file copying bytes {0} to {1}'.format(start_offset, end_offset))
+        outfile.write(b)
+        count -= len(b)
+
+def split(path, outdir='.', unit=UNIT_DOCUMENT, per_file=1, with_header=False, name_format=None):
+    """Split the AFP file at path into files of per_file documents, named page
+    groups or pages each.
+
+    Arguments:
+    path - The path of the AFP file to split.
+    outdir - The directory to write the files to.
+    unit - One of UNIT_DOCUMENT, UNIT_GROUP or UNIT_PAGE.
+    per_file - The number of units to write to each file.
+    with_header - If True, the structured fields before the first unit - such
+                  as an inline resource group - are copied to the start of every
+                  file.
+    name_format - A format string for the names of the files, given the file
+                  number counting from 1 as {0}, the name of the first unit in
+                  the file as {1} and the name of the AFP file without its
+                  extension as {2}. Defaults to '{2}.{0:05d}.afp'.
+
+    Returns the list of the paths of the files written.
+    """
+    if name_format is None:
+        name_format = '{2}.{0:05d}.afp'
+    base = os.path.splitext(os.path.basename(path))[0]
+    os.makedirs(outdir, exist_ok=True)
+    paths = []
+    with open(path, 'rb') as infile:
+        outfile = None
+        header_end = None
+        count = 0
+        try:
+            for u in units(path, unit):
+                if header_end is None:
+                    header_end = u.start_offset
+                if count % per_file == 0:
+                    if outfile is not None:
+                        outfile.close()
+                    out_path = os.path.join(outdir, name_format.format(len(paths) + 1, u.name, base))
+                    outfile = open(out_path, 'wb')
+                    paths.append(out_path)
+                    if with_header and header_end > 0:
+                        copy_range(infile, outfile, 0, header_end)
+                copy_range(infile, outfile, u.start_offset, u.end_offset)
+                count += 1
+        finally:
+            if outfile is not None:
+                outfile.close()
+    return paths
+
+def merge(paths, out_path, check=True):
+    """Merge AFP files into one by copying them one after another.
+
+    Arguments:
+    paths - The paths of the AFP files to merge.
+    out_path - The path of the file to write.
+    check - If True, the Structured Field Introducers of each file are read
+            first to check it is an AFP file made of whole structured fields.
+    """
+    with open(out_path, 'wb') as outfile:
+        for path in paths:
+            if check:
+                for header in parser.scan(path):
+                    pass
+            with open(path, 'rb') as infile:
+                copy_range(infile, outfile, 0, os.fstat(infile.fileno()).st_size)
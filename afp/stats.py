@@ -0,0 +1,183 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Statistics on the structured fields, triplets and PTOCA control sequences
+   in an AFP file.
+
+   The statistics are collected by the parser as it decodes the file, through
+   the profile hook of ParserConfig, so they include the time taken to decode
+   each type of structured field, triplet and control sequence.
+
+   Counters holds running totals of the parser's work for the counters
+   argument of ParserConfig.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import time
+
+from . import fields
+from . import functions
+from . import parser
+from . import reader
+from . import triplets
+
+class TypeStatistics:
+    """Statistics on one type of structured field, triplet or control sequence.
+
+    Attributes:
+    count - The number decoded.
+    total_bytes - Their total length in bytes.
+    max_bytes - The length of the longest.
+    elapsed_ns - The total time taken to decode them, in nanoseconds.
+    """
+    def __init__(self):
+        self.count = 0
+        self.total_bytes = 0
+        self.max_bytes = 0
+        self.elapsed_ns = 0
+
+    def average_bytes(self):
+        """Return the average length in bytes."""
+        if self.count == 0:
+            return 0
+        return self.total_bytes / self.count
+
+    def __repr__(self):
+        return '<TypeStatistics count={0} total_bytes={1} max_bytes={2} elapsed_ns={3}>'.format(self.count,
+                                                                                                  self.total_bytes,
+                                                                                                  self.max_bytes,
+                                                                                                  self.elapsed_ns)
+
+class Statistics:
+    """Statistics on an AFP file.
+
+    An instance can be given to ParserConfig as its profile.
+
+    Attributes:
+    fields - Dictionary of the TypeStatistics of each SFTypeID.
+    triplets - Dictionary of the TypeStatistics of each triplet ID.
+    functions - Dictionary of the TypeStatistics of each PTOCA function type.
+                The chained and unchained versions of a function are counted
+                separately.
+    file_size - The number of bytes read.
+    elapsed_ns - The time taken to read and parse the file, in nanoseconds.
+    """
+    def __init__(self):
+        self.fields = {}
+        self.triplets = {}
+        self.functions = {}
+        self.file_size = 0
+        self.elapsed_ns = 0
+        self._tables = {
+            parser.PROFILE_FIELD: self.fields,
+            parser.PROFILE_TRIPLET: self.triplets,
+            parser.PROFILE_FUNCTION: self.functions,
+        }
+
+    def record(self, kind, key, length, elapsed_ns):
+        """Record the decoding of a structured field, triplet or control
+        sequence. Called by the parser.
+        """
+        table = self._tables[kind]
+        type_stats = table.get(key)
+        if type_stats is None:
+            type_stats = table[key] = TypeStatistics()
+        type_stats.count += 1
+        type_stats.total_bytes += length
+        if length > type_stats.max_bytes:
+            type_stats.max_bytes = length
+        type_stats.elapsed_ns += elapsed_ns
+
+class Counters:
+    """Running totals of the parser's work, for the counters argument of
+    ParserConfig, parser.stream and parser.load.
+
+    The same Counters can be given to any number of streams to total them, for
+    example to export metrics from a long-running process.
+
+    Attributes:
+    bytes_read - The bytes of structured fields read, including those
+                 filtered-out.
+    fields_decoded - The number of structured fields decoded.
+    exceptions_recorded - The number of errors recorded in _exceptions rather
+                          than raised, when not parsing strictly.
+    unknown_fields - The number of unknown structured fields returned as raw
+                     data.
+    unknown_triplets - The number of unknown triplets returned as raw data.
+    unknown_functions - The number of unknown PTOCA functions returned as raw
+                        data.
+    """
+    def __init__(self):
+        self.bytes_read = 0
+        self.fields_decoded = 0
+        self.exceptions_recorded = 0
+        self.unknown_fields = 0
+        self.unknown_triplets = 0
+        self.unknown_functions = 0
+
+    def as_dict(self):
+        """Return the counters as a dictionary."""
+        return dict(vars(self))
+
+    def __repr__(self):
+        return '<Counters {0}>'.format(self.as_dict())
+
+def field_name(sf_type_id):
+    """Return the abbreviation of a structured field type, or '' if unknown."""
+    sf_type = fields.SF_TYPES.get(sf_type_id)
+    return '' if sf_type is None else sf_type.abbreviation
+
+def triplet_name(t_id):
+    """Return the name of a triplet type, or '' if unknown."""
+    triplet_type = triplets.TRIPLET_TYPES.get(t_id)
+    return '' if triplet_type is None else triplet_type.name
+
+def function_name(function):
+    """Return the abbreviation of a PTOCA function type, or '' if unknown."""
+    fn_info = functions.FUNCTIONS.get(function)
+    if fn_info is None:
+        return ''
+    if functions.chained_function(function):
+        return '{0} (chained)'.format(fn_info.abbreviation)
+    return fn_info.abbreviation
+
+def collect(f,
+            allow_unknown_fields=False,
+            allow_unknown_triplets=False,
+            allow_unknown_functions=False,
+            strict=False):
+    """Parse AFP file f and return its Statistics.
+
+    As with parser.stream, f can be a file opened in binary or the path of a
+    file. For the configuration arguments see the ParserConfig object in
+    parser.py.
+    """
+    statistics = Statistics()
+    parser_config = parser.ParserConfig(allow_unknown_fields=allow_unknown_fields,
+                                        allow_unknown_triplets=allow_unknown_triplets,
+                                        allow_unknown_functions=allow_unknown_functions,
+                                        strict=strict,
+                                        profile=statistics)
+    start_ns = time.perf_counter_ns()
+    r = reader.open_reader(f)
+    try:
+        start_offset = r.tell()
+        for sf in parser.read_structured_fields(r, parser_config):
+            pass
+        statistics.file_size = r.tell() - start_offset
+    finally:
+        r.close()
+    statistics.elapsed_ns = time.perf_counter_ns() - start_ns
+    return statistics
@@ -0,0 +1,126 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Lazily-parsed structured fields.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import collections.abc
+import time
+
+from . import compiler
+from . import exceptions
+from . import fields
+from . import parser
+
+# The parameters of the Structured Field Introducer, which are parsed up-front
+HEADER_NAMES = frozenset([param.name for param in fields.SYNTAX_SFI] + [fields.PNAME_SF_LENGTH])
+
+class StructuredField(collections.abc.Mapping):
+    """A structured field whose data is only parsed when it is needed.
+
+    The Structured Field Introducer is parsed when the object is created. The
+    rest of the structured field - its parameters, triplets, PTOCA control
+    sequences and so on - is parsed the first time any of them is accessed and
+    then cached.
+
+    The object is a read-only mapping with the same keys and values as the
+    dictionary returned by the parser in non-lazy mode.
+
+    The bytes of the structured field are kept so that the writer can copy them
+    straight to a new AFP stream without encoding the parameters again.
+
+    Attributes:
+    header - Dictionary of the Structured Field Introducer parameters.
+    data - Buffer of the structured field data following the introducer, or
+           None once it has been parsed.
+    raw - Buffer of the whole structured field following the structured field
+          length, introducer included.
+    field_no - The field number in the file.
+    field_start_offset - The byte number where the field begins.
+    """
+    def __init__(self, header, data, syntax, parser_config, param_appearance_counters,
+                 field_no=None, field_start_offset=None, raw=None):
+        """
+        Arguments:
+        header - Dictionary of the parsed Structured Field Introducer.
+        data - Buffer of the structured field data following the introducer.
+        syntax - The syntax to parse data with.
+        parser_config - A ParserConfig object.
+        param_appearance_counters - The parameter name counters from parsing
+                                    the introducer.
+        field_no - The field number in the file.
+        field_start_offset - The byte number where the field begins.
+        raw - Buffer of the structured field following its length.
+        """
+        self.header = header
+        self.data = data
+        self.raw = raw
+        self.field_no = field_no
+        self.field_start_offset = field_start_offset
+        self._syntax = syntax
+        self._parser_config = parser_config
+        self._param_appearance_counters = param_appearance_counters
+        self._fields = header
+
+    def _parse(self):
+        """Parse the structured field data and cache the result."""
+        result = self.header.copy()
+        if parser.PNAME_EXCEPTIONS in result:
+            result[parser.PNAME_EXCEPTIONS] = list(result[parser.PNAME_EXCEPTIONS])
+        profile = self._parser_config.profile
+        if profile is not None:
+            start_ns = time.perf_counter_ns()
+        try:
+            compiler.decode_syntax(self.data,
+                                   self._syntax,
+                                   self._parser_config,
+                                   result=result,
+                                   param_appearance_counters=dict(self._param_appearance_counters))
+        except exceptions.ParseError as e:
+            e.field_no = self.field_no
+            e.field_start_offset = self.field_start_offset
+            raise e
+        if profile is not None:
+            profile.record(parser.PROFILE_FIELD,
+                           result[fields.PNAME_SF_TYPE_ID],
+                           result[fields.PNAME_SF_LENGTH],
+                           time.perf_counter_ns() - start_ns)
+        if self._parser_config.debug:
+            parser.logger.debug('Structured Field: {0}'.format(result))
+        self._fields = result
+        self.data = None
+        self._syntax = None
+        self._param_appearance_counters = None
+
+    def __getitem__(self, key):
+        if self.data is not None and key not in HEADER_NAMES:
+            self._parse()
+        return self._fields[key]
+
+    def __iter__(self):
+        if self.data is not None:
+            self._parse()
+        return iter(self._fields)
+
+    def __len__(self):
+        if self.data is not None:
+            self._parse()
+        return len(self._fields)
+
+    def __repr__(self):
+        if self.data is not None:
+            return '<StructuredField {0} unparsed>'.format(self.header)
+        return '<StructuredField {0}>'.format(self._fields)
@@ -0,0 +1,215 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Fast extraction of the text on each page.
+
+   Rather than parsing each PTOCA control sequence into a dictionary, the data
+   of the Presentation Text Data (PTX) structured fields is scanned in place
+   for Transparent Data (TRN) and for the functions that move the current
+   position or change the font: AMI, AMB, RMI, RMB and SCFL. All other
+   functions are stepped over. The text of a whole page is gathered into one
+   buffer and decoded with one call for each code page used on the page - the
+   code page of each font is taken from the MCF and MCF-1 structured fields on
+   the page, see codepages.py.
+
+   As in afp2ascii.py, the position is not moved on by the width of the text
+   printed, as that needs the font metrics, and the position and font carry on
+   from one PTX to the next on a page.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import array
+import collections
+
+from . import codepages
+from . import exceptions
+from . import fields
+from . import functions
+from . import page
+from . import parser
+
+# The font local ID at the start of a page, before any SCFL
+DEFAULT_FONT_LOCAL_ID = 0xFF
+
+# Indexes of the page position state
+_INLINE = 0
+_BASELINE = 1
+_FONT = 2
+
+_ESCAPE_SEQUENCE = parser.PTX_ESCAPE_SEQUENCE.to_bytes(2, 'big')
+
+# A piece of text on a page
+# baseline - The baseline (y) position where the text starts.
+# inline - The inline (x) position where the text starts.
+# font - The font local ID set by the last SCFL.
+# text - The text, with leading and trailing whitespace removed as for TRNDATA
+#        returned by the parser.
+TextRecord = collections.namedtuple('TextRecord', ['baseline', 'inline', 'font', 'text'])
+
+# The text of a page
+# page_no - The page number in the file, counting from 1.
+# name - The PageName from the BPG, or None if it doesn't have one.
+# records - List of a TextRecord for each TRN on the page, in the order they
+#           appear.
+PageText = collections.namedtuple('PageText', ['page_no', 'name', 'records'])
+
+class _PageState:
+    """The position state and the text gathered so far on a page.
+
+    The position state - inline, baseline and font - is kept in a flat list
+    indexed by _INLINE, _BASELINE and _FONT. Each TRN is recorded as an entry
+    in the parallel arrays, holding where it was printed and where its bytes
+    are in the page's text buffer. font_tables holds the decoding table of
+    each font local ID whose code page is known.
+    """
+    def __init__(self):
+        self.state = [0, 0, DEFAULT_FONT_LOCAL_ID]
+        self.font_tables = {}
+        self.baselines = array.array('l')
+        self.inlines = array.array('l')
+        self.fonts = array.array('B')
+        self.ends = array.array('L')
+        self.text = bytearray()
+
+    def map_fonts(self, sf):
+        """Take the code pages of the fonts mapped by MCF or MCF-1 sf."""
+        for lid, cpgid in codepages.font_code_pages(sf).items():
+            self.font_tables[lid] = codepages.decoding_table(cpgid)
+
+    def records(self, decoding_table=None):
+        """Decode the text of the page and return a list of TextRecord.
+
+        The whole text buffer is decoded once with each decoding table in use,
+        which is quicker than decoding each TRN on its own as the code pages
+        have one byte per character.
+        """
+        if decoding_table is None:
+            decoding_table = codepages.decoding_table()
+        texts = {}
+        for table in set(self.font_tables.get(font, decoding_table) for font in set(self.fonts)):
+            texts[table] = codepages.decode(self.text, table)
+        records = []
+        start = 0
+        for baseline, inline, font, end in zip(self.baselines, self.inlines, self.fonts, self.ends):
+            text = texts[self.font_tables.get(font, decoding_table)]
+            records.append(TextRecord(baseline, inline, font, text[start:end].strip()))
+            start = end
+        return records
+
+def _scan_ptoca(data, page_state):
+    """Scan the PTOCA data of a PTX structured field, updating the position
+    state in page_state and adding its TRNs to it.
+    """
+    data = bytes(data)
+    state = page_state.state
+    i = state[_INLINE]
+    b = state[_BASELINE]
+    font = state[_FONT]
+    baselines = page_state.baselines
+    inlines = page_state.inlines
+    fonts = page_state.fonts
+    ends = page_state.ends
+    text = page_state.text
+    n = len(data)
+    p = 0
+    count = 0
+    chained = False
+    while p < n:
+        count += 1
+        if not chained:
+            if data[p:p + 2] != _ESCAPE_SEQUENCE:
+                if p + 2 > n:
+                    raise exceptions.InvalidControlSequenceError('Not enough data to parse control sequence {0} escape sequence'.format(count))
+                raise exceptions.InvalidControlSequenceError('Missing 0x{0:X} escape sequence before control sequence {1}'.format(parser.PTX_ESCAPE_SEQUENCE, count))
+            p += 2
+        if p + 2 > n:
+            raise exceptions.InvalidControlSequenceError('Not enough data to parse control sequence {0} function'.format(count))
+        length = data[p]
+        function = data[p + 1]
+        end = p + length
+        if length < 2 or end > n:
+            raise exceptions.InvalidControlSequenceError('Not enough data to parse control sequence {0} function data'.format(count))
+        # The unchained and chained versions of a function differ in the
+        # lowest bit
+        fn = function & 0xFE
+        if fn == functions.FN_U_TRN:
+            text += data[p + 2:end]
+            baselines.append(b)
+            inlines.append(i)
+            fonts.append(font)
+            ends.append(len(text))
+        elif fn == functions.FN_U_SCFL:
+            if length < 3:
+                raise exceptions.InvalidControlSequenceError('Not enough data to parse control sequence {0} function data'.format(count))
+            font = data[p + 2]
+        elif fn in (functions.FN_U_AMI, functions.FN_U_AMB, functions.FN_U_RMI, functions.FN_U_RMB):
+            if length < 4:
+                raise exceptions.InvalidControlSequenceError('Not enough data to parse control sequence {0} function data'.format(count))
+            value = int.from_bytes(data[p + 2:p + 4], 'big', signed=True)
+            if fn == functions.FN_U_AMI:
+                i = value
+            elif fn == functions.FN_U_AMB:
+                b = value
+            elif fn == functions.FN_U_RMI:
+                i += value
+            else:
+                b += value
+        chained = function & 1
+        p = end
+    state[_INLINE] = i
+    state[_BASELINE] = b
+    state[_FONT] = font
+
+def page_text(pg, decoding_table=None):
+    """Extract the text of a page.Page.
+
+    Returns a list of a TextRecord for each TRN on the page.
+    """
+    page_state = _PageState()
+    for sf in pg.fields():
+        sf_type_id = sf.header[fields.PNAME_SF_TYPE_ID]
+        if sf_type_id in (fields.SF_MCF, fields.SF_MCF_1):
+            page_state.map_fonts(sf)
+        elif sf_type_id == fields.SF_PTX:
+            try:
+                _scan_ptoca(sf.data, page_state)
+            except exceptions.ParseError as e:
+                e.field_no = sf.field_no
+                e.field_start_offset = sf.field_start_offset
+                parser.logger.error(e)
+                raise e
+    return page_state.records(decoding_table)
+
+def extract_text(f, decoding_table=None):
+    """Extract the text of each page of AFP file f.
+
+    Returns a generator of a PageText for each page. As with parser.stream, f
+    can be a file opened in binary or the path of a file. Only the BPG and PTX
+    structured fields are looked at, and the PTX only as far as it takes to
+    find the text and its position.
+
+    Arguments:
+    f - The AFP file.
+    decoding_table - A string of 256 characters giving the character for each
+                     byte of text in a font whose code page isn't known, see
+                     codepages.decoding_table. Defaults to that of
+                     codepages.DEFAULT_CPGID.
+    """
+    for pg in page.pages(f,
+                         allow_unknown_fields=True,
+                         allow_unknown_triplets=True,
+                         allow_unknown_functions=True,
+                         lazy=True):
+        yield PageText(pg.page_no, pg.name, page_text(pg, decoding_table))
@@ -0,0 +1,281 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Writer to encode structured fields back into an AFP stream.
+
+   Structured fields are encoded from the dictionaries returned by the parser
+   using the same syntaxes that the parser reads them with - see fields.py,
+   triplets.py and functions.py. Lengths are calculated from the encoded data
+   rather than taken from the dictionary, so parameters can be changed, added
+   or removed before writing: the structured field length, triplet Tlength,
+   control sequence LENGTH and repeating group lengths are all recalculated.
+
+   Structured fields read by the parser with lazy=True are written by copying
+   their original bytes, without encoding them again.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import os
+
+from . import exceptions
+from . import fields
+from . import functions
+from . import parser
+from . import structured_field
+from . import triplets
+
+# The longest structured field allowed, including the structured field length
+MAX_SF_LENGTH = 32767
+# The longest triplet or control sequence allowed, including its length
+MAX_TRIPLET_LENGTH = 255
+MAX_CONTROL_SEQUENCE_LENGTH = 255
+# The byte CHAR parameters are padded with - an EBCDIC space
+CHAR_PADDING = b'\x40'
+
+# The padding flag of the Structured Field Introducer flag byte
+PAD_FLAG = fields.SFI_PAD_FLAG
+
+_CARRIAGE_CONTROL = bytes((parser.CARRIAGE_CONTROL_CHAR,))
+_ESCAPE_SEQUENCE = parser.PTX_ESCAPE_SEQUENCE.to_bytes(2, 'big')
+
+def _unique_name(name, values, param_appearance_counters):
+    """Return the name the parser would have given the next parameter called
+    name in dictionary values, or None if values doesn't hold it.
+
+    This mirrors parser._add_param, which appends a counter to the names of
+    parameters that appear more than once.
+    """
+    count = param_appearance_counters.get(name, 0)
+    unique_name = name if count == 0 else '{0}-{1}'.format(name, count + 1)
+    if unique_name not in values:
+        return None
+    param_appearance_counters[name] = count + 1
+    return unique_name
+
+def _encode_int(value, length, signed, name):
+    """Encode an integer parameter. A length of zero means as many bytes as the
+    value needs.
+    """
+    if length == 0:
+        length = max(1, (value.bit_length() + 8 if signed else value.bit_length() + 7) // 8)
+    try:
+        return value.to_bytes(length, 'big', signed=signed)
+    except OverflowError:
+        raise exceptions.EncodeError('Parameter {0} value {1} does not fit in {2} bytes'.format(name, value, length))
+
+def encode_value(value, param):
+    """Encode the value of parameter param. Returns bytes."""
+    if param.datatype in (fields.PTYPE_CODE, fields.PTYPE_UBIN):
+        return _encode_int(value, param.length, False, param.name)
+    elif param.datatype == fields.PTYPE_SBIN:
+        return _encode_int(value, param.length, True, param.name)
+    elif param.datatype == fields.PTYPE_BYTE:
+        if isinstance(value, int):
+            return bytes((value,))
+        return bytes(value)
+    elif param.datatype == fields.PTYPE_CHAR:
+        b = value.encode('EBCDIC-CP-BE')
+        if param.length != 0:
+            if len(b) > param.length:
+                raise exceptions.EncodeError('Parameter {0} value {1!r} is longer than {2} bytes'.format(param.name, value, param.length))
+            b = b.ljust(param.length, CHAR_PADDING)
+        return b
+    elif param.datatype == fields.PTYPE_TRIPLET:
+        return encode_triplets(value)
+    elif param.datatype == fields.PTYPE_PTOCA:
+        return encode_ptoca(value)
+    raise exceptions.EncodeError('Unknown data type {0} of parameter {1}'.format(param.datatype, param.name))
+
+def _put(data, offset, b):
+    """Place bytes b in bytearray data at offset, filling any gap before it with
+    zeros.
+    """
+    if len(data) < offset:
+        data.extend(bytes(offset - len(data)))
+    data[offset:offset + len(b)] = b
+
+def encode_syntax(values, syntax, param_appearance_counters=None):
+    """Encode a dictionary of parameters with a syntax - the reverse of
+    parser.parse_syntax.
+
+    Parameters missing from values are left out, along with any optional
+    parameters following them. Repeating group lengths are recalculated.
+
+    Arguments:
+    values - The dictionary of parameters, as returned by the parser.
+    syntax - The syntax of the structured field, triplet or PTOCA function.
+    param_appearance_counters - Dictionary that tracks how many times parameter
+                                names have been used, as for parse_syntax.
+
+    Returns:
+    The encoded bytes.
+    """
+    if param_appearance_counters is None:
+        param_appearance_counters = {}
+    data = bytearray()
+    # Where a parameter holding the length of the next repeating group, or of
+    # this repeating group, is to be written: (offset, param)
+    next_group_length = None
+    this_group_length = None
+    for param in syntax:
+        if type(param) == list:
+            # A repeating group
+            name = _unique_name(parser.PNAME_REPEATING_GROUP, values, param_appearance_counters)
+            if name is not None:
+                groups = [encode_syntax(group, param) for group in values[name]]
+                if next_group_length is not None and len(groups) > 0:
+                    offset, length_param = next_group_length
+                    if any(len(group) != len(groups[0]) for group in groups):
+                        raise exceptions.EncodeError('Repeating groups following {0} have different lengths'.format(length_param.name))
+                    _put(data, offset, encode_value(len(groups[0]), length_param))
+                data.extend(b''.join(groups))
+            next_group_length = None
+            continue
+        if param.preproc is not None:
+            param = param.preproc(values, param)
+            if param is None:
+                continue
+        name = _unique_name(param.name, values, param_appearance_counters)
+        if param.preproc == fields._next_group_length:
+            next_group_length = (param.offset, param)
+        elif param.preproc == fields._this_group_length:
+            this_group_length = (param.offset, param)
+        if name is None:
+            if param.preproc in (fields._next_group_length, fields._this_group_length):
+                # Reserve the space, the length is filled in later
+                _put(data, param.offset, bytes(param.length))
+            continue
+        _put(data, param.offset, encode_value(values[name], param))
+    if this_group_length is not None:
+        offset, length_param = this_group_length
+        _put(data, offset, encode_value(len(data), length_param))
+    return bytes(data)
+
+def encode_triplets(triplet_list):
+    """Encode a list of triplets. Returns bytes."""
+    data = bytearray()
+    for triplet in triplet_list:
+        t_id = triplet[triplets.PNAME_T_ID]
+        syntax = triplets.SYNTAX_TRIPLET_RAW
+        if t_id in triplets.TRIPLET_TYPES and triplets.TRIPLET_TYPES[t_id].syntax is not None:
+            syntax = triplets.TRIPLET_TYPES[t_id].syntax
+        contents = encode_syntax(triplet, syntax)
+        t_length = len(contents) + 2
+        if t_length > MAX_TRIPLET_LENGTH:
+            raise exceptions.EncodeError('Triplet 0x{0:02X} is {1} bytes long, the most allowed is {2}'.format(t_id, t_length, MAX_TRIPLET_LENGTH))
+        data.append(t_length)
+        data.append(t_id)
+        data.extend(contents)
+    return bytes(data)
+
+def encode_ptoca(ctrl_sequences):
+    """Encode a list of PTOCA control sequences. Returns bytes.
+
+    The escape sequence is written before each unchained control sequence, that
+    is the first one and any following a control sequence with an unchained
+    function type.
+    """
+    data = bytearray()
+    chained = False
+    for ctrl_sequence in ctrl_sequences:
+        function = ctrl_sequence[functions.PNAME_CS_TYPE]
+        syntax = functions.SYNTAX_FUNCTION_RAW
+        if function in functions.FUNCTIONS and functions.FUNCTIONS[function].syntax is not None:
+            syntax = functions.FUNCTIONS[function].syntax
+        params = encode_syntax(ctrl_sequence, syntax)
+        length = len(params) + 2
+        if length > MAX_CONTROL_SEQUENCE_LENGTH:
+            raise exceptions.EncodeError('Control sequence 0x{0:02X} is {1} bytes long, the most allowed is {2}'.format(function, length, MAX_CONTROL_SEQUENCE_LENGTH))
+        if not chained:
+            data.extend(_ESCAPE_SEQUENCE)
+        data.append(length)
+        data.append(function)
+        data.extend(params)
+        chained = functions.chained_function(function)
+    return bytes(data)
+
+def encode_structured_field(sf):
+    """Encode a structured field, as returned by the parser, into the bytes of
+    the structured field following the carriage control character - its length,
+    introducer and data.
+
+    A StructuredField read with lazy=True is not encoded, its original bytes
+    are returned as they are.
+    """
+    if isinstance(sf, structured_field.StructuredField) and sf.raw is not None:
+        return (len(sf.raw) + 2).to_bytes(2, 'big') + bytes(sf.raw)
+    return b''.join(_encode_structured_field(sf))
+
+def _encode_structured_field(sf):
+    """Return the structured field length and the rest of structured field sf
+    as a pair of byte buffers.
+    """
+    if isinstance(sf, structured_field.StructuredField) and sf.raw is not None:
+        return (len(sf.raw) + 2).to_bytes(2, 'big'), sf.raw
+    sf_type_id = sf[fields.PNAME_SF_TYPE_ID]
+    # Structured fields are written without padding
+    flag_byte = sf[fields.PNAME_FLAG_BYTE] & ~PAD_FLAG
+    data = bytearray(sf_type_id.to_bytes(3, 'big'))
+    data.append(flag_byte)
+    data.extend(encode_value(sf.get('Reserved', [0, 0]), fields.SYNTAX_SFI[2]))
+    param_appearance_counters = {fields.PNAME_SF_TYPE_ID: 1,
+                                 fields.PNAME_FLAG_BYTE: 1,
+                                 'Reserved': 1}
+    if fields.sfi_ext_flag(flag_byte):
+        ext_data = bytes(sf.get(fields.PNAME_EXT_DATA, []))
+        data.append(len(ext_data) + 1)
+        data.extend(ext_data)
+        param_appearance_counters[fields.PNAME_EXT_LENGTH] = 1
+        param_appearance_counters[fields.PNAME_EXT_DATA] = 1
+    syntax = fields.SYNTAX_FIELD_RAW
+    if sf_type_id in fields.SF_TYPES and fields.SF_TYPES[sf_type_id].syntax is not None:
+        syntax = fields.SF_TYPES[sf_type_id].syntax
+    data.extend(encode_syntax(sf, syntax, param_appearance_counters))
+    sf_length = len(data) + 2
+    if sf_length > MAX_SF_LENGTH:
+        raise exceptions.EncodeError('Structured field 0x{0:06X} is {1} bytes long, the most allowed is {2}'.format(sf_type_id, sf_length, MAX_SF_LENGTH))
+    return sf_length.to_bytes(2, 'big'), data
+
+def write_structured_field(f, sf):
+    """Write structured field sf to binary file f, starting with the carriage
+    control character.
+    """
+    sf_length, data = _encode_structured_field(sf)
+    f.write(_CARRIAGE_CONTROL + sf_length)
+    f.write(data)
+
+def write(f, structured_fields):
+    """Write structured fields to AFP file f, which can be a file opened in
+    binary or the path of a file to create.
+
+    Each structured field is a dictionary as returned by the parser, or a
+    StructuredField read with lazy=True, whose bytes are copied unchanged. For
+    example, to strip the NOPs from a file:
+
+        afp.write('out.afp', (sf for sf in afp.stream('in.afp', lazy=True)
+                              if sf['SFTypeID'] != afp.SF_NOP))
+
+    Every structured field is written with a carriage control character.
+
+    Returns the number of structured fields written.
+    """
+    if isinstance(f, (str, bytes, os.PathLike)):
+        with open(f, 'wb') as outfile:
+            return write(outfile, structured_fields)
+    count = 0
+    for sf in structured_fields:
+        write_structured_field(f, sf)
+        count += 1
+    return count
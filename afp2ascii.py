@@ -23,7 +23,8 @@
    See the License for the specific language governing permissions and
    limitations under the License.
 
-   usage: afp2ascii.py [-h] [--outfile OUTFILE] afp-file [afp-file ...]
+   usage: afp2ascii.py [-h] [--jobs JOBS] [--outdir OUTDIR] [--outfile OUTFILE]
+                       afp-file [afp-file ...]
 
    Read an AFP file or files and output an ASCII representation
 
@@ -32,11 +33,18 @@
 
    optional arguments:
      -h, --help            show this help message and exit
+     --jobs JOBS, -j JOBS  process the files in batch mode with this many
+                           processes in parallel, reporting the time taken and
+                           any error for each file on stderr and carrying on past
+                           files that fail
+     --outdir OUTDIR       process the files in batch mode writing the output of
+                           each file to its own file in this directory
      --outfile OUTFILE, -o OUTFILE
                            the filename for the output (defaults to stdout)
 """
 
 import afp
+import afp.batch
 import argparse
 import logging
 import os
@@ -166,6 +174,12 @@ def afp_to_ascii(infile, outfile=sys.stdout):
                          allow_unknown_functions=True):
         process_field(sf, context, outfile)
 
+def print_file_header(filename, outfile=sys.stdout):
+    """Print the heading for the output of an AFP file when printing multiple
+    files.
+    """
+    print('File: {0}'.format(filename), file=outfile)
+
 def multiple_afp_to_ascii(afp_files, outfile=sys.stdout):
     """Print multiple AFP files specified by filename 'afp_files' to the output
     'outfile'.
@@ -173,7 +187,7 @@ def multiple_afp_to_ascii(afp_files, outfile=sys.stdout):
     for filename in afp_files:
         with open(filename, 'rb') as infile:
             if len(afp_files) > 1:
-                print('File: {0}'.format(filename), file=outfile)
+                print_file_header(filename, outfile)
             afp_to_ascii(infile, outfile=outfile)
 
 def parse_command_line():
@@ -184,6 +198,18 @@ def parse_command_line():
         metavar='afp-file',
         nargs='+',
         help='an AFP file')
+    parser.add_argument(
+        '--jobs', '-j',
+        dest='jobs',
+        type=int,
+        help='process the files in batch mode with this many processes in parallel, '
+             'reporting the time taken and any error for each file on stderr '
+             'and carrying on past files that fail')
+    parser.add_argument(
+        '--outdir',
+        dest='outdir',
+        help='process the files in batch mode writing the output of each file '
+             'to its own file in this directory')
     parser.add_argument(
         '--outfile', '-o',
         dest='outfile',
@@ -194,7 +220,21 @@ def main():
     args = parse_command_line()
     logging.basicConfig(level=logging.FATAL, format='%(levelname)s %(message)s')
     try:
-        if args.outfile is None:
+        if args.jobs is not None or args.outdir is not None:
+            outfile = sys.stdout if args.outfile is None else open(args.outfile, 'w')
+            try:
+                failures = afp.batch.process_files(afp_to_ascii,
+                                                   args.afp_files,
+                                                   jobs=args.jobs or 1,
+                                                   outdir=args.outdir,
+                                                   outfile=outfile,
+                                                   header=print_file_header)
+            finally:
+                if outfile is not sys.stdout:
+                    outfile.close()
+            if failures:
+                exit(1)
+        elif args.outfile is None:
             multiple_afp_to_ascii(args.afp_files)
         else:
             with open(args.outfile, 'w') as outfile:
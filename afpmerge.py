@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+"""Utility to merge AFP files into one.
+
+   The files are copied one after another without being parsed, so merging
+   files takes about as long as copying them. By default the Structured Field
+   Introducers of each file are read first to check that it is an AFP file.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+   usage: afpmerge.py [-h] --outfile OUTFILE [--no-check] afp-file [afp-file ...]
+"""
+
+import afp
+import afp.split
+import argparse
+import logging
+import os
+import sys
+
+def parse_command_line():
+    """Parse the utility's command-line arguments."""
+    parser = argparse.ArgumentParser(description='Merge AFP files into one')
+    parser.add_argument(
+        'afp_files',
+        metavar='afp-file',
+        nargs='+',
+        help='an AFP file to merge')
+    parser.add_argument(
+        '--outfile', '-o',
+        dest='outfile',
+        required=True,
+        help='the filename for the merged AFP file')
+    parser.add_argument(
+        '--no-check',
+        dest='check',
+        action='store_false',
+        help="don't check that each file is an AFP file before copying it")
+    return parser.parse_args()
+
+def main():
+    args = parse_command_line()
+    logging.basicConfig(level=logging.FATAL, format='%(levelname)s %(message)s')
+    try:
+        afp.split.merge(args.afp_files, args.outfile, check=args.check)
+    except (FileNotFoundError, afp.Error) as e:
+        print('{0}: error: {1}'.format(os.path.basename(sys.argv[0]), str(e).lower()), file=sys.stderr)
+        exit(1)
+    except KeyboardInterrupt:
+        # Exit quietly on ctrl-c
+        exit(1)
+
+if __name__ == '__main__':
+    main()
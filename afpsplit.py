@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+"""Utility to split an AFP file into documents, named page groups or pages.
+
+   The boundaries are found by reading only the Structured Field Introducers
+   and the bytes are copied to the output files as they are, so splitting a
+   file takes about as long as copying it.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+   usage: afpsplit.py [-h] [--unit {document,group,page}] [--per-file PER_FILE]
+                      [--outdir OUTDIR] [--name-format NAME_FORMAT]
+                      [--with-header] [--verbose]
+                      afp-file
+"""
+
+import afp
+import afp.split
+import argparse
+import logging
+import os
+import sys
+
+def parse_command_line():
+    """Parse the utility's command-line arguments."""
+    parser = argparse.ArgumentParser(description='Split an AFP file into documents, named page groups or pages')
+    parser.add_argument(
+        'afp_file',
+        metavar='afp-file',
+        help='the AFP file to split')
+    parser.add_argument(
+        '--unit', '-u',
+        dest='unit',
+        choices=sorted(afp.split.UNITS),
+        default=afp.split.UNIT_DOCUMENT,
+        help='what to split the file into (defaults to document)')
+    parser.add_argument(
+        '--per-file', '-n',
+        dest='per_file',
+        type=int,
+        default=1,
+        help='the number of documents, groups or pages in each output file (defaults to 1)')
+    parser.add_argument(
+        '--outdir', '-d',
+        dest='outdir',
+        default='.',
+        help='the directory to write the output files to (defaults to the current directory)')
+    parser.add_argument(
+        '--name-format',
+        dest='name_format',
+        help='the format of the output file names, given the file number as {0}, '
+             'the name of its first document, group or page as {1} and the name '
+             'of the AFP file without its extension as {2} (defaults to {2}.{0:05d}.afp)')
+    parser.add_argument(
+        '--with-header',
+        dest='with_header',
+        action='store_true',
+        help='copy the structured fields before the first document, group or '
+             'page - such as inline resources - to the start of every output file')
+    parser.add_argument(
+        '--verbose', '-v',
+        dest='verbose',
+        action='store_true',
+        help='print the name of each output file written')
+    return parser.parse_args()
+
+def main():
+    args = parse_command_line()
+    logging.basicConfig(level=logging.FATAL, format='%(levelname)s %(message)s')
+    if args.per_file < 1:
+        print('{0}: error: --per-file must be at least 1'.format(os.path.basename(sys.argv[0])), file=sys.stderr)
+        exit(1)
+    try:
+        paths = afp.split.split(args.afp_file,
+                                outdir=args.outdir,
+                                unit=args.unit,
+                                per_file=args.per_file,
+                                with_header=args.with_header,
+                                name_format=args.name_format)
+        if args.verbose:
+            for path in paths:
+                print(path)
+    except (FileNotFoundError, afp.Error) as e:
+        print('{0}: error: {1}'.format(os.path.basename(sys.argv[0]), str(e).lower()), file=sys.stderr)
+        exit(1)
+    except KeyboardInterrupt:
+        # Exit quietly on ctrl-c
+        exit(1)
+
+if __name__ == '__main__':
+    main()
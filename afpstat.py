@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+"""Utility to report statistics on the structured fields, triplets and PTOCA
+   control sequences in an AFP file or files.
+
+   For each type it reports how many there are, their total size in bytes and
+   their average and largest size. With --profile it also reports the time
+   taken to decode each type, to show which ones dominate the time it takes to
+   parse a file. The time for a structured field includes its triplets and
+   control sequences.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+   usage: afpstat.py [-h] [--outfile OUTFILE] [--profile] [--strict]
+                     afp-file [afp-file ...]
+
+   Report statistics on the structured fields, triplets and PTOCA control
+   sequences in an AFP file or files
+
+   positional arguments:
+     afp-file              an AFP file
+
+   optional arguments:
+     -h, --help            show this help message and exit
+     --outfile OUTFILE, -o OUTFILE
+                           the filename for the output (defaults to stdout)
+     --profile             also report the time taken to decode each type of
+                           structured field, triplet and control sequence
+     --strict              enable strict parsing - missing mandatory fields are
+                           not allowed
+"""
+
+import afp
+import afp.stats
+import argparse
+import logging
+import os
+import sys
+
+def print_table(title, table, name_func, key_format, profile=False, outfile=sys.stdout):
+    """Print the statistics of each type in a dictionary of TypeStatistics.
+
+    The types are sorted by total bytes, or by time when profiling.
+    """
+    heading = '{0:<10} {1:<48} {2:>9} {3:>12} {4:>9} {5:>7}'.format(title, 'Name', 'Count', 'Bytes', 'Avg', 'Max')
+    if profile:
+        heading += ' {0:>10} {1:>10}'.format('Time ms', 'us each')
+    print(heading, file=outfile)
+    if profile:
+        sort_key = lambda item: item[1].elapsed_ns
+    else:
+        sort_key = lambda item: item[1].total_bytes
+    for key, type_stats in sorted(table.items(), key=sort_key, reverse=True):
+        line = '{0:<10} {1:<48} {2:>9} {3:>12} {4:>9.1f} {5:>7}'.format(key_format.format(key),
+                                                                     name_func(key),
+                                                                     type_stats.count,
+                                                                     type_stats.total_bytes,
+                                                                     type_stats.average_bytes(),
+                                                                     type_stats.max_bytes)
+        if profile:
+            line += ' {0:>10.1f} {1:>10.2f}'.format(type_stats.elapsed_ns / 1000000,
+                                                    type_stats.elapsed_ns / 1000 / type_stats.count)
+        print(line, file=outfile)
+    print(file=outfile)
+
+def print_statistics(statistics, profile=False, outfile=sys.stdout):
+    """Print the Statistics of an AFP file to outfile."""
+    field_count = sum(type_stats.count for type_stats in statistics.fields.values())
+    print('{0} structured fields, {1} bytes'.format(field_count, statistics.file_size), file=outfile)
+    if profile:
+        seconds = statistics.elapsed_ns / 1000000000
+        print('Parsed in {0:.3f}s, {1:.0f} fields/s, {2:.2f} MB/s'.format(seconds,
+                                                                       field_count / seconds if seconds else 0,
+                                                                       statistics.file_size / 1000000 / seconds if seconds else 0),
+              file=outfile)
+    print(file=outfile)
+    print_table('SFTypeID', statistics.fields, afp.stats.field_name, '0x{0:06X}', profile, outfile)
+    print_table('Triplet', statistics.triplets, afp.stats.triplet_name, '0x{0:02X}', profile, outfile)
+    print_table('Function', statistics.functions, afp.stats.function_name, '0x{0:02X}', profile, outfile)
+
+def print_file_header(filename, outfile=sys.stdout):
+    """Print the heading for the output of an AFP file when printing multiple
+    files.
+    """
+    print('File: {0}'.format(filename), file=outfile)
+
+def afp_stats(afp_files, profile=False, strict=False, outfile=sys.stdout):
+    """Print the statistics of AFP files specified by filename 'afp_files' to
+    the output 'outfile'.
+    """
+    for filename in afp_files:
+        if len(afp_files) > 1:
+            print_file_header(filename, outfile)
+        statistics = afp.stats.collect(filename,
+                                       allow_unknown_fields=True,
+                                       allow_unknown_triplets=True,
+                                       allow_unknown_functions=True,
+                                       strict=strict)
+        print_statistics(statistics, profile=profile, outfile=outfile)
+
+def parse_command_line():
+    """Parse the utility's command-line arguments."""
+    parser = argparse.ArgumentParser(description='Report statistics on the structured fields, '
+                                                 'triplets and PTOCA control sequences in an AFP file or files')
+    parser.add_argument(
+        'afp_files',
+        metavar='afp-file',
+        nargs='+',
+        help='an AFP file')
+    parser.add_argument(
+        '--outfile', '-o',
+        dest='outfile',
+        help='the filename for the output (defaults to stdout)')
+    parser.add_argument(
+        '--profile',
+        dest='profile',
+        action='store_true',
+        help='also report the time taken to decode each type of structured '
+             'field, triplet and control sequence')
+    parser.add_argument(
+        '--strict',
+        dest='strict',
+        action='store_true',
+        help='enable strict parsing - missing mandatory fields are not allowed')
+    return parser.parse_args()
+
+def main():
+    args = parse_command_line()
+    logging.basicConfig(level=logging.FATAL, format='%(levelname)s %(message)s')
+    try:
+        if args.outfile is None:
+            afp_stats(args.afp_files, profile=args.profile, strict=args.strict)
+        else:
+            with open(args.outfile, 'w') as outfile:
+                afp_stats(args.afp_files, profile=args.profile, strict=args.strict, outfile=outfile)
+    except FileNotFoundError as e:
+        print('{0}: error: {1}'.format(os.path.basename(sys.argv[0]), str(e).lower()), file=sys.stderr)
+        exit(1)
+    except BrokenPipeError as e:
+        # If we pipe the output to a utility such as head we will get a BrokenPipeError
+        # when head closes stdout. Ignore that error here.
+
+        # Close stdout explicitly otherwise we get an error when it closes during
+        # shutdown.
+        try:
+            sys.stdout.close()
+        except BrokenPipeError:
+            pass
+        # We deem this process has done its work so exit successfully
+        exit(0)
+    except afp.Error as e:
+        print('{0}: error: {1}'.format(os.path.basename(sys.argv[0]), str(e).lower()), file=sys.stderr)
+        exit(1)
+    except KeyboardInterrupt:
+        # Exit quietly on ctrl-c
+        exit(1)
+
+if __name__ == '__main__':
+    main()
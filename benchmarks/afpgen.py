@@ -0,0 +1,236 @@
+"""Deterministic generator of synthetic AFP streams for the benchmarks.
+
+   The generated files are made up of N documents of M pages each, using only
+   structured fields, triplets and control sequence functions that the parser
+   knows about, so they can be parsed with all of the 'allow' options off.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+   usage: afpgen.py [-h] [--documents DOCUMENTS] [--pages PAGES] [--seed SEED]
+                    [--pad PAD]
+                    filename
+"""
+
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import afp
+
+from afp import triplets
+
+WORDS = ['ACCOUNT', 'BALANCE', 'STATEMENT', 'PAYMENT', 'DUE', 'DATE', 'TOTAL',
+         'AMOUNT', 'INTEREST', 'CREDIT', 'DEBIT', 'REFERENCE', 'CUSTOMER',
+         'NUMBER', 'PERIOD', 'OPENING', 'CLOSING', 'TRANSFER', 'FEE', 'RATE']
+
+def ebcdic(text, length=None):
+    """Encode text as EBCDIC, padding with spaces to length if specified."""
+    if length is not None:
+        text = '{0:<{width}}'.format(text, width=length)[:length]
+    return text.encode('cp500')
+
+def ubin(value, length):
+    """Encode an unsigned binary number."""
+    return value.to_bytes(length, 'big')
+
+def sbin(value, length):
+    """Encode a signed binary number."""
+    return value.to_bytes(length, 'big', signed=True)
+
+def padding(length):
+    """Encode length bytes of structured field padding. The last byte holds the
+    length, or for 256 bytes or more is zero with the length before it.
+    """
+    if length < 256:
+        return bytes(length - 1) + ubin(length, 1)
+    return bytes(length - 3) + ubin(length, 2) + b'\x00'
+
+def structured_field(sf_type_id, data=b'', flag_byte=0x00, pad=0, carriage_control=True):
+    """Encode a structured field, with pad bytes of padding if pad is not zero
+    and a carriage control character if carriage_control is True.
+    """
+    if pad != 0:
+        flag_byte |= 0b00001000
+        data += padding(pad)
+    return ((b'\x5A' if carriage_control else b'') +
+            ubin(len(data) + 8, 2) +
+            ubin(sf_type_id, 3) +
+            bytes((flag_byte, 0x00, 0x00)) +
+            data)
+
+def triplet(t_id, contents):
+    """Encode a triplet."""
+    return ubin(len(contents) + 2, 1) + ubin(t_id, 1) + contents
+
+def fqn(fqn_type, name):
+    """Encode a Fully Qualified Name triplet."""
+    return triplet(triplets.TT_02, bytes((fqn_type, 0x00)) + ebcdic(name))
+
+def control_sequences(sequences):
+    """Encode a chain of PTOCA control sequences.
+
+    Arguments:
+    sequences - A list of (unchained function type, parameter bytes) tuples.
+                All but the last are chained.
+    """
+    data = bytearray(b'\x2B\xD3')
+    for i, (function, params) in enumerate(sequences):
+        if i < len(sequences) - 1:
+            function += 1
+        data += ubin(len(params) + 2, 1) + ubin(function, 1) + params
+    return bytes(data)
+
+class Generator:
+    """Generates a synthetic AFP stream."""
+    def __init__(self, seed=0, lines_per_page=40, words_per_line=6, pad=0):
+        self.random = random.Random(seed)
+        self.lines_per_page = lines_per_page
+        self.words_per_line = words_per_line
+        self.pad = pad
+
+    def structured_field(self, sf_type_id, data=b''):
+        return structured_field(sf_type_id, data, pad=self.pad)
+
+    def text(self):
+        return ' '.join(self.random.choice(WORDS) for i in range(self.words_per_line))
+
+    def mcf_1(self):
+        groups = b''
+        for lid, font in ((1, 'X0GT10'), (2, 'X0GT12'), (3, 'X0H200')):
+            groups += (ubin(lid, 1) + b'\x00' + ubin(0, 1) + b'\x00' +
+                       ebcdic(font, 8) + ebcdic('T1V10500', 8) + ebcdic('C0H20000', 8) +
+                       ubin(0, 2))
+        return self.structured_field(afp.SF_MCF_1, ubin(30, 1) + b'\x00\x00\x00' + groups)
+
+    def mcf(self):
+        data = b''
+        for lid, font in ((4, 'C0H20000'), (5, 'C0H20080')):
+            contents = (fqn(0x86, 'T1V10500') +
+                        fqn(0x8E, font) +
+                        triplet(triplets.TT_24, bytes((0x05, lid))) +
+                        triplet(triplets.TT_26, ubin(0, 2)) +
+                        triplet(triplets.TT_01, ubin(0xFFFF, 2) + ubin(500, 2)))
+            data += ubin(len(contents) + 2, 2) + contents
+        return self.structured_field(afp.SF_MCF, data)
+
+    def ptx(self):
+        sequences = [(afp.FN_U_STO, ubin(0, 2) + ubin(0x2D00, 2))]
+        baseline = 200
+        for line in range(self.lines_per_page):
+            sequences.append((afp.FN_U_AMB, sbin(baseline, 2)))
+            sequences.append((afp.FN_U_AMI, sbin(150 + self.random.randrange(0, 100), 2)))
+            sequences.append((afp.FN_U_SCFL, ubin(self.random.choice((1, 2, 3)), 1)))
+            sequences.append((afp.FN_U_TRN, ebcdic(self.text())))
+            if line % 10 == 9:
+                sequences.append((afp.FN_U_RMI, sbin(40, 2)))
+                sequences.append((afp.FN_U_DIR, sbin(1200, 2) + sbin(4, 3)))
+            baseline += 60
+        sequences.append((afp.FN_U_NOP, b''))
+        return self.structured_field(afp.SF_PTX, control_sequences(sequences))
+
+    def page(self, page_no):
+        name = 'P{0:07d}'.format(page_no)
+        fields = [
+            self.structured_field(afp.SF_BPG, ebcdic(name, 8) + fqn(0x01, name)),
+            self.structured_field(afp.SF_BAG),
+            self.mcf_1(),
+            self.mcf(),
+            self.structured_field(afp.SF_PGD, bytes((0, 0)) + ubin(14400, 2) + ubin(14400, 2) +
+                             ubin(12240, 3) + ubin(15840, 3) + b'\x00\x00\x00'),
+            self.structured_field(afp.SF_PTD, bytes((0, 0)) + ubin(14400, 2) + ubin(14400, 2) +
+                             ubin(12240, 3) + ubin(15840, 3) + b'\x00\x00'),
+            self.structured_field(afp.SF_EAG),
+            self.structured_field(afp.SF_IPS, ebcdic('S1LOGO', 8) + sbin(100, 3) + sbin(-100, 3)),
+            self.structured_field(afp.SF_IPO, ebcdic('O1FORM', 8) + sbin(0, 3) + sbin(0, 3) + ubin(0, 2)),
+            self.structured_field(afp.SF_BPT, ebcdic('TEXT', 8)),
+            self.ptx(),
+            self.structured_field(afp.SF_EPT, ebcdic('TEXT', 8)),
+            self.structured_field(afp.SF_EPG, ebcdic(name, 8)),
+        ]
+        return b''.join(fields)
+
+    def document(self, doc_no, pages, first_page_no):
+        name = 'D{0:07d}'.format(doc_no)
+        fields = [
+            self.structured_field(afp.SF_BDT, ebcdic(name, 8) + b'\x00\x00' +
+                             triplet(triplets.TT_01, ubin(0xFFFF, 2) + ubin(500, 2))),
+            self.structured_field(afp.SF_BNG, ebcdic(name, 8)),
+            self.structured_field(afp.SF_TLE, fqn(0x0B, 'ACCOUNT') +
+                             triplet(triplets.TT_36, b'\x00\x00' + ebcdic(str(1000000 + doc_no)))),
+            self.structured_field(afp.SF_TLE, fqn(0x0B, 'CUSTOMER') +
+                             triplet(triplets.TT_36, b'\x00\x00' + ebcdic(self.text()))),
+            self.structured_field(afp.SF_NOP, ebcdic('GENERATED BY AFPGEN')),
+        ]
+        fields.extend(self.page(first_page_no + i) for i in range(pages))
+        fields.append(self.structured_field(afp.SF_ENG, ebcdic(name, 8)))
+        fields.append(self.structured_field(afp.SF_EDT, ebcdic(name, 8)))
+        return b''.join(fields)
+
+    def generate(self, documents, pages):
+        """Return the bytes of an AFP stream of documents x pages."""
+        return b''.join(self.document(i + 1, pages, i * pages + 1) for i in range(documents))
+
+def generate(documents=10, pages=10, seed=0, pad=0):
+    """Return the bytes of a synthetic AFP stream. If pad is not zero every
+    structured field is padded with pad bytes.
+    """
+    return Generator(seed=seed, pad=pad).generate(documents, pages)
+
+def write(path, documents=10, pages=10, seed=0, pad=0):
+    """Write a synthetic AFP stream to the file at path."""
+    with open(path, 'wb') as f:
+        f.write(generate(documents=documents, pages=pages, seed=seed, pad=pad))
+
+def parse_command_line():
+    """Parse the generator's command-line arguments."""
+    parser = argparse.ArgumentParser(description='Write a synthetic AFP stream to a file')
+    parser.add_argument(
+        'filename',
+        help='the file to write')
+    parser.add_argument(
+        '--documents',
+        dest='documents',
+        type=int,
+        default=10,
+        help='the number of documents in the stream')
+    parser.add_argument(
+        '--pages',
+        dest='pages',
+        type=int,
+        default=10,
+        help='the number of pages per document')
+    parser.add_argument(
+        '--seed',
+        dest='seed',
+        type=int,
+        default=0,
+        help='the seed for the random text on the pages')
+    parser.add_argument(
+        '--pad',
+        dest='pad',
+        type=int,
+        default=0,
+        help='the number of bytes of padding on every structured field')
+    return parser.parse_args()
+
+def main():
+    args = parse_command_line()
+    write(args.filename, documents=args.documents, pages=args.pages, seed=args.seed, pad=args.pad)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+"""Benchmark of the compiled syntax decoders against parser.parse_syntax.
+
+   Every structured field, triplet and PTOCA control sequence in a synthetic
+   AFP stream is decoded with both parser.parse_syntax and its compiled
+   decoder. The results are checked to be identical before the times are
+   reported.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+   usage: bench_compiler.py [-h] [--documents DOCUMENTS] [--pages PAGES]
+"""
+
+import argparse
+import sys
+import time
+
+import afpgen
+
+from afp import compiler
+from afp import fields
+from afp import functions
+from afp import parser
+from afp import triplets
+
+def split_fields(data):
+    """Return a list of (syntax, data) for the introducer and the body of each
+    structured field in the byte buffer data.
+    """
+    result = []
+    p = 0
+    while p < len(data):
+        if data[p] == parser.CARRIAGE_CONTROL_CHAR:
+            p += 1
+        sf_length = int.from_bytes(data[p:p + 2], 'big')
+        sf_data = data[p + 2:p + sf_length]
+        p += sf_length
+        result.append((fields.SYNTAX_SFI, sf_data))
+        sf_type_id = int.from_bytes(sf_data[0:3], 'big')
+        body_start = 6
+        if fields.sfi_ext_flag(sf_data[3]):
+            body_start += sf_data[6]
+        syntax = fields.SYNTAX_FIELD_RAW
+        if sf_type_id in fields.SF_TYPES:
+            syntax = fields.SF_TYPES[sf_type_id].syntax
+        result.append((syntax, sf_data[body_start:]))
+    return result
+
+def split_triplets(data, offset):
+    """Return a list of (syntax, data) for each triplet in data."""
+    result = []
+    p = offset
+    while p < len(data):
+        t_length = data[p]
+        syntax = triplets.SYNTAX_TRIPLET_RAW
+        if data[p + 1] in triplets.TRIPLET_TYPES:
+            syntax = triplets.TRIPLET_TYPES[data[p + 1]].syntax
+        result.append((syntax, data[p + 2:p + t_length]))
+        p += t_length
+    return result
+
+def split_control_sequences(data):
+    """Return a list of (syntax, data) for each control sequence in the PTOCA
+    data.
+    """
+    result = []
+    p = 0
+    chained = False
+    while p < len(data):
+        if not chained:
+            p += 2
+        length = data[p]
+        function = data[p + 1]
+        syntax = functions.SYNTAX_FUNCTION_RAW
+        if function in functions.FUNCTIONS:
+            syntax = functions.FUNCTIONS[function].syntax
+        result.append((syntax, data[p + 2:p + length]))
+        p += length
+        chained = functions.chained_function(function)
+    return result
+
+def work_items(data):
+    """Return the list of (syntax, data) for every structured field, triplet
+    and control sequence in data.
+    """
+    items = split_fields(data)
+    for syntax, item_data in list(items):
+        if syntax == fields.SYNTAX_FIELD_PTX:
+            items.extend(split_control_sequences(item_data))
+        elif len(syntax) > 0 and type(syntax[-1]) != list and syntax[-1].datatype == fields.PTYPE_TRIPLET:
+            items.extend(split_triplets(item_data, syntax[-1].offset))
+    return items
+
+def time_decoder(decode, items, parser_config):
+    """Return the results of decoding all the items and the time taken."""
+    start = time.perf_counter()
+    results = [decode(item_data, syntax, parser_config) for syntax, item_data in items]
+    return results, time.perf_counter() - start
+
+def parse_command_line():
+    """Parse the benchmark's command-line arguments."""
+    parser = argparse.ArgumentParser(description='Benchmark the compiled syntax decoders against parse_syntax')
+    parser.add_argument(
+        '--documents',
+        dest='documents',
+        type=int,
+        default=50,
+        help='the number of documents in the generated stream')
+    parser.add_argument(
+        '--pages',
+        dest='pages',
+        type=int,
+        default=20,
+        help='the number of pages per document in the generated stream')
+    return parser.parse_args()
+
+def main():
+    args = parse_command_line()
+    data = memoryview(afpgen.generate(documents=args.documents, pages=args.pages))
+    items = work_items(data)
+    parser_config = parser.ParserConfig()
+    expected, interpreted_time = time_decoder(parser.parse_syntax, items, parser_config)
+    actual, compiled_time = time_decoder(compiler.decode_syntax, items, parser_config)
+    if actual != expected:
+        for (syntax, item_data), a, e in zip(items, actual, expected):
+            if a != e:
+                print('Mismatch decoding {0}: {1} != {2}'.format(list(item_data), a, e), file=sys.stderr)
+        sys.exit(1)
+    print('{0} syntaxes decoded identically'.format(len(items)))
+    print('parse_syntax:  {0:.3f}s'.format(interpreted_time))
+    print('decode_syntax: {0:.3f}s'.format(compiled_time))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+"""Benchmark of the cost of debug logging in the afp parser.
+
+   Parses a synthetic AFP stream with debug logging disabled, which takes the
+   parser's logging-free path, and with debug logging enabled but discarded by
+   a NullHandler, which formats every debug message. The difference is the
+   cost that the parser avoids when debug output is off.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+   usage: bench_logging.py [-h] [--documents DOCUMENTS] [--pages PAGES]
+                           [--repeat REPEAT]
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import afpgen
+
+import afp
+
+def time_load(filename, repeat):
+    """Return the number of fields and the best time of repeat calls to
+    afp.load on the file filename.
+    """
+    best = None
+    count = 0
+    for i in range(repeat):
+        start = time.perf_counter()
+        count = len(afp.load(filename))
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return count, best
+
+def parse_command_line():
+    """Parse the benchmark's command-line arguments."""
+    parser = argparse.ArgumentParser(description='Benchmark the cost of debug logging in the afp parser')
+    parser.add_argument(
+        '--documents',
+        dest='documents',
+        type=int,
+        default=10,
+        help='the number of documents in the generated stream')
+    parser.add_argument(
+        '--pages',
+        dest='pages',
+        type=int,
+        default=20,
+        help='the number of pages per document in the generated stream')
+    parser.add_argument(
+        '--repeat',
+        dest='repeat',
+        type=int,
+        default=3,
+        help='the number of times to parse the stream, the best time is reported')
+    return parser.parse_args()
+
+def main():
+    args = parse_command_line()
+    logger = logging.getLogger('afp')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, 'bench.afp')
+        afpgen.write(filename, documents=args.documents, pages=args.pages)
+        logger.setLevel(logging.WARNING)
+        count, quiet = time_load(filename, args.repeat)
+        logger.setLevel(logging.DEBUG)
+        count, debug = time_load(filename, args.repeat)
+    print('debug off: {0} fields in {1:.3f}s - {2:.0f} fields/s'.format(count, quiet, count / quiet))
+    print('debug on:  {0} fields in {1:.3f}s - {2:.0f} fields/s'.format(count, debug, count / debug))
+    print('debug logging costs {0:.1f}x'.format(debug / quiet))
+
+if __name__ == '__main__':
+    main()
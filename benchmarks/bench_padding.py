@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+"""Benchmark of the afp parser on synthetic AFP streams with and without
+   structured field padding.
+
+   The same stream is generated twice, once with every structured field padded,
+   and afp.load is timed on each. Padding is stripped by narrowing the window
+   on the structured field data, so the padded stream should parse in about the
+   same time as the unpadded one, which takes the parser's usual path.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+   usage: bench_padding.py [-h] [--documents DOCUMENTS] [--pages PAGES]
+                           [--pad PAD] [--repeat REPEAT]
+"""
+
+import argparse
+import os
+import tempfile
+
+import afpgen
+import bench_parser
+
+def parse_command_line():
+    """Parse the benchmark's command-line arguments."""
+    parser = argparse.ArgumentParser(description='Benchmark the afp parser on synthetic AFP streams with and '
+                                                 'without structured field padding')
+    parser.add_argument(
+        '--documents',
+        dest='documents',
+        type=int,
+        default=50,
+        help='the number of documents in the generated streams')
+    parser.add_argument(
+        '--pages',
+        dest='pages',
+        type=int,
+        default=20,
+        help='the number of pages per document in the generated streams')
+    parser.add_argument(
+        '--pad',
+        dest='pad',
+        type=int,
+        default=16,
+        help='the number of bytes of padding on every structured field of the padded stream')
+    parser.add_argument(
+        '--repeat',
+        dest='repeat',
+        type=int,
+        default=3,
+        help='the number of times to parse each stream, the best time is reported')
+    return parser.parse_args()
+
+def main():
+    args = parse_command_line()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, pad in (('unpadded', 0), ('padded', args.pad)):
+            filename = os.path.join(tmpdir, '{0}.afp'.format(name))
+            afpgen.write(filename, documents=args.documents, pages=args.pages, pad=pad)
+            size = os.path.getsize(filename)
+            count, elapsed = bench_parser.time_load(filename, args.repeat)
+            print('afp.load {0:<8}: {1} fields, {2} bytes in {3:.3f}s - {4:.0f} fields/s, {5:.2f} MB/s'.format(
+                name,
+                count,
+                size,
+                elapsed,
+                count / elapsed,
+                size / elapsed / 1000000))
+
+if __name__ == '__main__':
+    main()
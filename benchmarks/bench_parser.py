@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+"""Benchmark of the afp parser on a synthetic AFP stream.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+   usage: bench_parser.py [-h] [--documents DOCUMENTS] [--pages PAGES]
+                          [--repeat REPEAT]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import afpgen
+
+import afp
+
+def time_load(filename, repeat):
+    """Return the number of fields and the best time of repeat calls to
+    afp.load on the file filename.
+    """
+    best = None
+    count = 0
+    for i in range(repeat):
+        with open(filename, 'rb') as f:
+            start = time.perf_counter()
+            count = len(afp.load(f))
+            elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return count, best
+
+def parse_command_line():
+    """Parse the benchmark's command-line arguments."""
+    parser = argparse.ArgumentParser(description='Benchmark the afp parser on a synthetic AFP stream')
+    parser.add_argument(
+        '--documents',
+        dest='documents',
+        type=int,
+        default=50,
+        help='the number of documents in the generated stream')
+    parser.add_argument(
+        '--pages',
+        dest='pages',
+        type=int,
+        default=20,
+        help='the number of pages per document in the generated stream')
+    parser.add_argument(
+        '--repeat',
+        dest='repeat',
+        type=int,
+        default=3,
+        help='the number of times to parse the stream, the best time is reported')
+    return parser.parse_args()
+
+def main():
+    args = parse_command_line()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, 'bench.afp')
+        afpgen.write(filename, documents=args.documents, pages=args.pages)
+        size = os.path.getsize(filename)
+        count, elapsed = time_load(filename, args.repeat)
+    print('afp.load: {0} fields, {1} bytes in {2:.3f}s - {3:.0f} fields/s, {4:.2f} MB/s'.format(
+        count,
+        size,
+        elapsed,
+        count / elapsed,
+        size / elapsed / 1000000))
+
+if __name__ == '__main__':
+    main()
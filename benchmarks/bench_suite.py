@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+
+"""Benchmark suite for the afp package and utilities.
+
+   Generates a deterministic synthetic AFP stream with afpgen.py and times
+   afp.stream, afp.load, afp.extract_text, afp.load_ptoca_columns,
+   dumpafp.dump_afp_file and afp2ascii.afp_to_ascii on it. Each benchmark runs
+   in its own process so that its peak resident set size can be measured.
+   Results can be written to a JSON file and compared against the JSON of an
+   earlier run to catch regressions.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+   usage: bench_suite.py [-h] [--documents DOCUMENTS] [--pages PAGES]
+                         [--seed SEED] [--repeat REPEAT]
+                         [--benchmark BENCHMARK] [--json JSON]
+                         [--compare COMPARE] [--threshold THRESHOLD]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import afpgen
+
+import afp
+import afp2ascii
+import dumpafp
+
+def bench_stream(filename):
+    """Iterate over afp.stream. Returns the number of fields."""
+    count = 0
+    for sf in afp.stream(filename):
+        count += 1
+    return count
+
+def bench_load(filename):
+    """Call afp.load. Returns the number of fields."""
+    return len(afp.load(filename))
+
+def bench_extract_text(filename):
+    """Iterate over afp.extract_text. Returns the number of text records."""
+    count = 0
+    for page_text in afp.extract_text(filename):
+        count += len(page_text.records)
+    return count
+
+def bench_load_ptoca_columns(filename):
+    """Call afp.load_ptoca_columns. Returns the number of control sequences."""
+    return len(afp.load_ptoca_columns(filename))
+
+def bench_dump_afp_file(filename):
+    """Call dumpafp.dump_afp_file, discarding the output. Returns None."""
+    with open(filename, 'rb') as infile, open(os.devnull, 'w') as outfile:
+        dumpafp.dump_afp_file(infile, outfile=outfile)
+
+def bench_afp_to_ascii(filename):
+    """Call afp2ascii.afp_to_ascii, discarding the output. Returns None."""
+    with open(filename, 'rb') as infile, open(os.devnull, 'w') as outfile:
+        afp2ascii.afp_to_ascii(infile, outfile=outfile)
+
+# The benchmarks, in the order they are run
+BENCHMARKS = {
+    'stream': bench_stream,
+    'load': bench_load,
+    'extract_text': bench_extract_text,
+    'load_ptoca_columns': bench_load_ptoca_columns,
+    'dump_afp_file': bench_dump_afp_file,
+    'afp_to_ascii': bench_afp_to_ascii,
+}
+
+def peak_rss_kb():
+    """Return the peak resident set size of this process in kilobytes."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # macOS reports bytes rather than kilobytes
+        rss //= 1024
+    return rss
+
+def run_benchmark(name, filename, repeat):
+    """Run benchmark name on filename repeat times in this process.
+
+    Returns a dictionary of the results.
+    """
+    func = BENCHMARKS[name]
+    size = os.path.getsize(filename)
+    fields = sum(1 for header in afp.scan(filename))
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func(filename)
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    return {
+        'benchmark': name,
+        'fields': fields,
+        'bytes': size,
+        'best_seconds': best,
+        'times': times,
+        'fields_per_second': fields / best,
+        'mb_per_second': size / best / 1000000,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+def run_in_subprocess(name, filename, repeat):
+    """Run benchmark name in a fresh process and return its results."""
+    result = subprocess.run([sys.executable,
+                             os.path.abspath(__file__),
+                             '--worker', name, filename,
+                             '--repeat', str(repeat)],
+                            stdout=subprocess.PIPE,
+                            check=True,
+                            universal_newlines=True)
+    return json.loads(result.stdout)
+
+def compare(results, baseline, threshold):
+    """Compare results with those of an earlier run.
+
+    Prints the change in speed of each benchmark. Returns the names of the
+    benchmarks that are more than threshold percent slower.
+    """
+    previous = {r['benchmark']: r for r in baseline['results']}
+    regressions = []
+    for r in results:
+        if r['benchmark'] not in previous:
+            continue
+        before = previous[r['benchmark']]['fields_per_second']
+        change = (r['fields_per_second'] - before) / before * 100
+        print('{0:<15} {1:+7.1f}% fields/s against baseline'.format(r['benchmark'], change))
+        if change < -threshold:
+            regressions.append(r['benchmark'])
+    return regressions
+
+def parse_command_line():
+    """Parse the benchmark's command-line arguments."""
+    parser = argparse.ArgumentParser(description='Benchmark suite for the afp package and utilities')
+    parser.add_argument(
+        '--documents',
+        dest='documents',
+        type=int,
+        default=50,
+        help='the number of documents in the generated stream')
+    parser.add_argument(
+        '--pages',
+        dest='pages',
+        type=int,
+        default=20,
+        help='the number of pages per document in the generated stream')
+    parser.add_argument(
+        '--seed',
+        dest='seed',
+        type=int,
+        default=0,
+        help='the seed for the generated stream')
+    parser.add_argument(
+        '--repeat',
+        dest='repeat',
+        type=int,
+        default=3,
+        help='the number of times to run each benchmark, the best time is reported')
+    parser.add_argument(
+        '--benchmark',
+        dest='benchmarks',
+        action='append',
+        choices=list(BENCHMARKS),
+        help='a benchmark to run, can be given more than once (defaults to all)')
+    parser.add_argument(
+        '--json',
+        dest='json',
+        help='the filename to write the results to as JSON')
+    parser.add_argument(
+        '--compare',
+        dest='compare',
+        help='the JSON results of an earlier run to compare against')
+    parser.add_argument(
+        '--threshold',
+        dest='threshold',
+        type=float,
+        default=10.0,
+        help='the percentage slowdown against --compare counted as a regression (defaults to 10)')
+    parser.add_argument(
+        '--worker',
+        dest='worker',
+        nargs=2,
+        metavar=('BENCHMARK', 'FILE'),
+        help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def main():
+    args = parse_command_line()
+    if args.worker is not None:
+        name, filename = args.worker
+        print(json.dumps(run_benchmark(name, filename, args.repeat)))
+        return
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, 'bench.afp')
+        afpgen.write(filename, documents=args.documents, pages=args.pages, seed=args.seed)
+        for name in args.benchmarks or BENCHMARKS:
+            r = run_in_subprocess(name, filename, args.repeat)
+            print('{0:<15} {1:8.3f}s {2:9.0f} fields/s {3:7.2f} MB/s {4:8d} KB peak RSS'.format(
+                name,
+                r['best_seconds'],
+                r['fields_per_second'],
+                r['mb_per_second'],
+                r['peak_rss_kb']))
+            results.append(r)
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'documents': args.documents,
+        'pages': args.pages,
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print('Regressions: {0}'.format(', '.join(regressions)))
+            exit(1)
+
+if __name__ == '__main__':
+    main()
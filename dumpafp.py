@@ -17,8 +17,8 @@
    limitations under the License.
 
    usage: dumpafp.py [-h] [--allow-unknown-fields] [--allow-unknown-functions]
-                     [--allow-unknown-triplets] [--debug] [--outfile OUTFILE]
-                     [--strict] [--warn]
+                     [--allow-unknown-triplets] [--debug] [--jobs JOBS]
+                     [--outdir OUTDIR] [--outfile OUTFILE] [--strict] [--warn]
                      afp-file [afp-file ...]
 
    Read an AFP file or files and output a human-readable version
@@ -38,6 +38,12 @@
                            allow triplets not supported by the parser in the
                            output
      --debug               print debugging information to stderr
+     --jobs JOBS, -j JOBS  process the files in batch mode with this many
+                           processes in parallel, reporting the time taken and
+                           any error for each file on stderr and carrying on past
+                           files that fail
+     --outdir OUTDIR       process the files in batch mode writing the output of
+                           each file to its own file in this directory
      --outfile OUTFILE, -o OUTFILE
                            the filename for the output (defaults to stdout)
      --strict              enable strict parsing - missing mandatory fields are
@@ -46,7 +52,9 @@
 """
 
 import afp
+import afp.batch
 import argparse
+import functools
 import logging
 import os
 import sys
@@ -143,6 +151,12 @@ def dump_afp_file(infile,
         print_structured_field(sf, file=outfile)
         i += 1
 
+def print_file_header(filename, file=sys.stdout):
+    """Print the heading for the output of an AFP file when dumping multiple
+    files.
+    """
+    print_line('__File {0}__'.format(filename), file=file)
+
 def dump_afp_files(afp_files,
                    outfile=sys.stdout,
                    allow_unknown_fields=False,
@@ -155,7 +169,7 @@ def dump_afp_files(afp_files,
     for filename in afp_files:
         with open(filename, 'rb') as infile:
             if len(afp_files) > 1:
-                print_line('__File {0}__'.format(filename), file=outfile)
+                print_file_header(filename, outfile)
             dump_afp_file(infile,
                           outfile=outfile,
                           allow_unknown_fields=allow_unknown_fields,
@@ -191,6 +205,18 @@ def parse_command_line():
         dest='debug',
         action='store_true',
         help='print debugging information to stderr')
+    parser.add_argument(
+        '--jobs', '-j',
+        dest='jobs',
+        type=int,
+        help='process the files in batch mode with this many processes in parallel, '
+             'reporting the time taken and any error for each file on stderr '
+             'and carrying on past files that fail')
+    parser.add_argument(
+        '--outdir',
+        dest='outdir',
+        help='process the files in batch mode writing the output of each file '
+             'to its own file in this directory')
     parser.add_argument(
         '--outfile', '-o',
         dest='outfile',
@@ -218,7 +244,26 @@ def main():
         log_level = logging.FATAL
     logging.basicConfig(level=log_level, format='%(levelname)s %(message)s')
     try:
-        if args.outfile is None:
+        if args.jobs is not None or args.outdir is not None:
+            dump = functools.partial(dump_afp_file,
+                                     allow_unknown_fields=args.allow_unknown_fields,
+                                     allow_unknown_triplets=args.allow_unknown_triplets,
+                                     allow_unknown_functions=args.allow_unknown_functions,
+                                     strict=args.strict)
+            outfile = sys.stdout if args.outfile is None else open(args.outfile, 'w')
+            try:
+                failures = afp.batch.process_files(dump,
+                                                   args.afp_files,
+                                                   jobs=args.jobs or 1,
+                                                   outdir=args.outdir,
+                                                   outfile=outfile,
+                                                   header=print_file_header)
+            finally:
+                if outfile is not sys.stdout:
+                    outfile.close()
+            if failures:
+                exit(1)
+        elif args.outfile is None:
             dump_afp_files(args.afp_files,
                            allow_unknown_fields=args.allow_unknown_fields,
                            allow_unknown_triplets=args.allow_unknown_triplets,
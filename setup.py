@@ -7,8 +7,9 @@ setup(
     author_email='matt@matthewneale.net',
     url='https://github.com/mdneale/afp',
     description='Python package and utilities for reading AFP (Advanced Function Presentation) files',
-    py_modules=['afp2ascii', 'dumpafp'],
+    py_modules=['afp2ascii', 'afpmerge', 'afpsplit', 'afpstat', 'dumpafp'],
     packages=['afp'],
+    python_requires='>=3.7',
     classifiers=[
         'Programming Language :: Python',
         'Programming Language :: Python :: 3',
@@ -34,9 +35,9 @@ An afp package for Python, allowing the caller to read and decode AFP (Advanced
 Function Presentation) print files. For more information on AFP see the website
 of the AFP Consortium http://afpcinc.org.
 
-The repository also contains two utilities that make use of the library -
-dumpafp.py and afp2ascii.py.
+The repository also contains utilities that make use of the library -
+dumpafp.py, afp2ascii.py, afpstat.py, afpsplit.py and afpmerge.py.
 
-The code is pure Python 3.
+The code is pure Python 3 and needs Python 3.7 or later.
 """
 )
@@ -0,0 +1,75 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Helpers for building AFP data in the tests. The encoders are those of the
+   benchmarks' synthetic AFP generator, benchmarks/afpgen.py.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+from afpgen import control_sequences
+from afpgen import ebcdic
+from afpgen import padding
+from afpgen import sbin
+from afpgen import structured_field
+from afpgen import triplet
+from afpgen import ubin
+
+from afp import fields
+from afp import functions
+from afp import triplets
+
+# The data of a BDT with a Coded Graphic Character Set Global Identifier
+# triplet
+BDT_DATA = ebcdic('DOC1', 8) + b'\x00\x00' + triplet(triplets.TT_01, b'\xFF\xFF\x01\xF4')
+
+def document(carriage_control=True):
+    """Return the bytes of a small AFP document: a page holding a NOP."""
+    return b''.join([
+        structured_field(fields.SF_BDT, BDT_DATA, carriage_control=carriage_control),
+        structured_field(fields.SF_BPG, ebcdic('PAGE1', 8), carriage_control=carriage_control),
+        structured_field(fields.SF_NOP, ebcdic('COMMENT'), carriage_control=carriage_control),
+        structured_field(fields.SF_EPG, ebcdic('PAGE1', 8), carriage_control=carriage_control),
+        structured_field(fields.SF_EDT, ebcdic('DOC1', 8), carriage_control=carriage_control),
+    ])
+
+def rich_document():
+    """Return the bytes of an AFP document with triplets, both kinds of
+    repeating group and PTOCA control sequences.
+    """
+    mcf_1_group = (b'\x01\x00\x00\x00' + ebcdic('X0GT10', 8) +
+                   ebcdic('T1V10500', 8) + ebcdic('C0H20000', 8) + b'\x00\x00')
+    mcf_contents = (triplet(triplets.TT_02, b'\x86\x00' + ebcdic('T1V10500')) +
+                    triplet(triplets.TT_24, b'\x05\x04'))
+    ptx = control_sequences([(functions.FN_U_AMB, ubin(200, 2)),
+                             (functions.FN_U_AMI, ubin(150, 2)),
+                             (functions.FN_U_TRN, ebcdic('HELLO WORLD')),
+                             (functions.FN_U_NOP, b'')])
+    return b''.join([
+        structured_field(fields.SF_BDT, BDT_DATA),
+        structured_field(fields.SF_BPG, ebcdic('PAGE1', 8)),
+        structured_field(fields.SF_MCF_1, ubin(30, 1) + b'\x00\x00\x00' + mcf_1_group * 2),
+        structured_field(fields.SF_MCF, ubin(len(mcf_contents) + 2, 2) + mcf_contents),
+        structured_field(fields.SF_BPT, ebcdic('TEXT', 8)),
+        structured_field(fields.SF_PTX, ptx),
+        structured_field(fields.SF_EPT, ebcdic('TEXT', 8)),
+        structured_field(fields.SF_NOP, ebcdic('COMMENT')),
+        structured_field(fields.SF_EPG, ebcdic('PAGE1', 8)),
+        structured_field(fields.SF_EDT, ebcdic('DOC1', 8)),
+    ])
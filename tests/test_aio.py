@@ -0,0 +1,110 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Tests of parsing AFP from an asyncio StreamReader.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import asyncio
+import concurrent.futures
+import io
+import logging
+import unittest
+
+import afp
+
+from afp import exceptions
+from afp import fields
+
+from . import afpdata
+
+async def _astream(data, chunk_size=None, **kwargs):
+    """Parse data fed to a StreamReader, chunk_size bytes at a time.
+
+    Returns the structured fields and the ParseError that stopped the parser,
+    or None.
+    """
+    stream_reader = asyncio.StreamReader()
+    chunk_size = chunk_size or len(data) or 1
+    for i in range(0, len(data), chunk_size):
+        stream_reader.feed_data(data[i:i + chunk_size])
+    stream_reader.feed_eof()
+    structured_fields = []
+    try:
+        async for sf in afp.astream(stream_reader, **kwargs):
+            structured_fields.append(sf)
+    except exceptions.ParseError as e:
+        return structured_fields, e
+    return structured_fields, None
+
+async def _serve(data, **kwargs):
+    """Serve data on a localhost socket and parse it from a connection."""
+    async def handle(reader, writer):
+        writer.write(data)
+        await writer.drain()
+        writer.close()
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    async with server:
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        structured_fields = [sf async for sf in afp.astream(reader, **kwargs)]
+        writer.close()
+        return structured_fields
+
+class AstreamTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_same_as_load(self):
+        for carriage_control in (True, False):
+            data = afpdata.document(carriage_control=carriage_control) + afpdata.rich_document()
+            expected = afp.load(io.BytesIO(data))
+            for chunk_size in (1, 7, None):
+                with self.subTest(carriage_control=carriage_control, chunk_size=chunk_size):
+                    self.assertEqual(asyncio.run(_astream(data, chunk_size)), (expected, None))
+
+    def test_filtered(self):
+        data = afpdata.rich_document()
+        expected = afp.load(io.BytesIO(data), include=[fields.SF_PTX, fields.SF_NOP])
+        self.assertEqual(asyncio.run(_astream(data, include=[fields.SF_PTX, fields.SF_NOP])), (expected, None))
+
+    def test_executor(self):
+        data = afpdata.rich_document()
+        expected = afp.load(io.BytesIO(data))
+        for executor_class in (concurrent.futures.ThreadPoolExecutor, concurrent.futures.ProcessPoolExecutor):
+            with self.subTest(executor=executor_class.__name__):
+                with executor_class(max_workers=2) as executor:
+                    self.assertEqual(asyncio.run(_astream(data, 5, executor=executor)), (expected, None))
+
+    def test_socket(self):
+        data = afpdata.rich_document()
+        self.assertEqual(asyncio.run(_serve(data)), afp.load(io.BytesIO(data)))
+
+    def test_truncated(self):
+        # The structured fields of the document start at bytes 0, 25, 42, 58
+        # and 75, and it ends at byte 92
+        document = afpdata.document()
+        for length, field_no, field_start_offset in ((30, 2, 25), (77, 5, 75), (91, 5, 75)):
+            with self.subTest(length=length):
+                structured_fields, e = asyncio.run(_astream(document[:length], 4))
+                self.assertIsInstance(e, exceptions.InvalidStructuredFieldError)
+                self.assertEqual((e.field_no, e.field_start_offset), (field_no, field_start_offset))
+                self.assertEqual(structured_fields, afp.load(io.BytesIO(document))[:field_no - 1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Tests of batch processing.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import io
+import os
+import tempfile
+import unittest
+
+import afp
+
+from afp import batch
+
+def _copy(infile, outfile):
+    """Write the bytes of infile to outfile as hex."""
+    outfile.write(infile.read().hex())
+
+def _header(filename, outfile):
+    """Write a heading naming filename to outfile."""
+    outfile.write('[{0}]'.format(os.path.basename(filename)))
+
+class BatchTestCase(unittest.TestCase):
+    def test_output_paths(self):
+        self.assertEqual(batch.output_paths(['a/x.afp', 'a/y.afp'], 'out'),
+                         [os.path.join('out', 'x.afp.txt'), os.path.join('out', 'y.afp.txt')])
+
+    def test_output_paths_same_name(self):
+        outpaths = batch.output_paths([os.path.join('spool', 'a', 'x.afp'),
+                                       os.path.join('spool', 'b', 'x.afp')],
+                                      'out')
+        self.assertEqual(outpaths,
+                         [os.path.join('out', 'a', 'x.afp.txt'), os.path.join('out', 'b', 'x.afp.txt')])
+
+    def test_output_paths_same_file(self):
+        with self.assertRaises(afp.Error):
+            batch.output_paths(['x.afp', os.path.join(os.curdir, 'x.afp')], 'out')
+
+    def test_process_files_same_name(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            afp_files = []
+            for name, data in (('a', b'\x01'), ('b', b'\x02')):
+                os.mkdir(os.path.join(tmpdir, name))
+                afp_files.append(os.path.join(tmpdir, name, 'x.afp'))
+                with open(afp_files[-1], 'wb') as f:
+                    f.write(data)
+            outdir = os.path.join(tmpdir, 'out')
+            failures = batch.process_files(_copy, afp_files, outdir=outdir, prog='test')
+            self.assertEqual(failures, 0)
+            for name, text in (('a', '01'), ('b', '02')):
+                with open(os.path.join(outdir, name, 'x.afp.txt')) as f:
+                    self.assertEqual(f.read(), text)
+
+    def test_process_files_outfile(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            afp_files = []
+            for i in range(3):
+                afp_files.append(os.path.join(tmpdir, '{0}.afp'.format(i)))
+                with open(afp_files[-1], 'wb') as f:
+                    f.write(bytes((i,)))
+            afp_files.append(os.path.join(tmpdir, 'missing.afp'))
+            for jobs in (1, 2):
+                with self.subTest(jobs=jobs):
+                    outfile = io.StringIO()
+                    failures = batch.process_files(_copy,
+                                                   afp_files,
+                                                   jobs=jobs,
+                                                   outfile=outfile,
+                                                   header=_header,
+                                                   prog='test')
+                    self.assertEqual(failures, 1)
+                    self.assertEqual(outfile.getvalue(), '[0.afp]00[1.afp]01[2.afp]02')
+            self.assertEqual(sorted(os.listdir(tmpdir)), ['0.afp', '1.afp', '2.afp'])
+
+if __name__ == '__main__':
+    unittest.main()
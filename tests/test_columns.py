@@ -0,0 +1,130 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Tests of the columnar loading of PTOCA control sequences.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import io
+import logging
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import afp
+import afp.columns
+
+from afp import exceptions
+from afp import fields
+from afp import functions
+
+from . import afpdata
+
+# The column of each operand of the parser's control sequence dictionaries
+OPERAND_COLUMNS = (
+    ('dsplcmnt', 'DSPLCMNT'),
+    ('incrment', 'INCRMENT'),
+    ('rlength', 'RLENGTH'),
+    ('rwidth', 'RWIDTH'),
+    ('lid', 'LID'),
+)
+
+def _ptoca_document():
+    """Return an AFP document with two PTX structured fields, one of chained
+    control sequences and one of unchained control sequences.
+    """
+    chained = afpdata.control_sequences([
+        (functions.FN_U_AMB, afpdata.sbin(1000, 2)),
+        (functions.FN_U_AMI, afpdata.sbin(-20, 2)),
+        (functions.FN_U_SCFL, afpdata.ubin(3, 1)),
+        (functions.FN_U_TRN, afpdata.ebcdic(' Hello ')),
+        (functions.FN_U_RMI, afpdata.sbin(-5, 2)),
+        (functions.FN_U_DIR, afpdata.sbin(300, 2) + afpdata.sbin(-4, 3)),
+        (functions.FN_U_DBR, afpdata.sbin(-150, 2)),
+        (functions.FN_U_RPS, afpdata.ubin(6, 2) + afpdata.ebcdic('AB')),
+        (functions.FN_U_TRN, afpdata.ebcdic('world')),
+    ])
+    unchained = (afpdata.control_sequences([(functions.FN_U_AMI, afpdata.sbin(7, 2))]) +
+                 afpdata.control_sequences([(functions.FN_U_TRN, afpdata.ebcdic('again'))]) +
+                 afpdata.control_sequences([(functions.FN_U_NOP, b'\x01\x02')]))
+    return (afpdata.structured_field(fields.SF_BDT, afpdata.BDT_DATA) +
+            afpdata.structured_field(fields.SF_PTX, chained) +
+            afpdata.structured_field(fields.SF_NOP, afpdata.ebcdic('COMMENT')) +
+            afpdata.structured_field(fields.SF_PTX, unchained) +
+            afpdata.structured_field(fields.SF_EDT, afpdata.ebcdic('DOC1', 8)))
+
+class ColumnsTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_same_as_parser(self):
+        data = _ptoca_document()
+        columns = afp.load_ptoca_columns(io.BytesIO(data))
+        expected = [(sf_no, control_sequence)
+                    for sf_no, sf in enumerate(afp.load(io.BytesIO(data)), 1)
+                    if sf[fields.PNAME_SF_TYPE_ID] == fields.SF_PTX
+                    for control_sequence in sf['PTOCAdat']]
+        self.assertEqual(len(columns), len(expected))
+        for i, (sf_no, control_sequence) in enumerate(expected):
+            with self.subTest(i=i):
+                self.assertEqual(columns.field_no[i], sf_no)
+                self.assertEqual(columns.function[i], control_sequence['TYPE'])
+                self.assertEqual(columns.length[i], control_sequence['LENGTH'])
+                for column, operand in OPERAND_COLUMNS:
+                    self.assertEqual(getattr(columns, column)[i], control_sequence.get(operand, 0))
+                if 'TRNDATA' in control_sequence:
+                    self.assertEqual(columns.text(i), control_sequence['TRNDATA'])
+                if 'RPTDATA' in control_sequence:
+                    self.assertEqual(columns.text(i), control_sequence['RPTDATA'])
+
+    def test_function_data(self):
+        columns = afp.load_ptoca_columns(io.BytesIO(_ptoca_document()))
+        self.assertEqual(bytes(columns.function_data(3)), afpdata.ebcdic(' Hello '))
+        self.assertEqual(bytes(columns.function_data(7)), afpdata.ubin(6, 2) + afpdata.ebcdic('AB'))
+        self.assertEqual(columns.text(7), 'AB')
+
+    def test_chained_to_end(self):
+        data = afpdata.control_sequences([(functions.FN_U_AMI, afpdata.sbin(7, 2))])
+        data = data[:3] + bytes([functions.FN_C_AMI]) + data[4:]
+        sfs = (afpdata.structured_field(fields.SF_NOP) +
+               afpdata.structured_field(fields.SF_PTX, data))
+        with self.assertRaises(exceptions.InvalidControlSequenceError):
+            afp.load(io.BytesIO(sfs))
+        with self.assertRaises(exceptions.InvalidControlSequenceError) as cm:
+            afp.load_ptoca_columns(io.BytesIO(sfs))
+        self.assertEqual(cm.exception.field_no, 2)
+
+    def test_empty(self):
+        columns = afp.load_ptoca_columns(io.BytesIO(afpdata.document()))
+        self.assertEqual(len(columns), 0)
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_to_numpy(self):
+        columns = afp.load_ptoca_columns(io.BytesIO(_ptoca_document()))
+        arrays = columns.to_numpy()
+        self.assertEqual(list(arrays), [name for name, typecode in afp.columns.COLUMNS])
+        for name, typecode in afp.columns.COLUMNS:
+            with self.subTest(name=name):
+                self.assertEqual(arrays[name].dtype, numpy.dtype(typecode))
+                self.assertEqual(arrays[name].tolist(), getattr(columns, name).tolist())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Tests that the compiled syntax decoders produce exactly what
+   parser.parse_syntax produces.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import logging
+import random
+import unittest
+
+from afp import compiler
+from afp import exceptions
+from afp import fields
+from afp import functions
+from afp import parser
+from afp import triplets
+
+from . import afpdata
+
+def _outcome(decode, data, syntax, parser_config, result=None, param_appearance_counters=None):
+    """Return what decode makes of data: the result and bytes processed, or the
+    type and message of the ParseError raised.
+
+    The decoders only keep count of the names that can clash, so
+    param_appearance_counters itself isn't compared.
+    """
+    try:
+        result, n = decode(data, syntax, parser_config, result, param_appearance_counters)
+        return dict(result), n
+    except exceptions.ParseError as e:
+        return type(e), str(e)
+
+def _all_syntaxes():
+    """Return (description, syntax) for every syntax of the explicitly-supported
+    structured fields, triplets and functions.
+    """
+    syntaxes = [('SFI', fields.SYNTAX_SFI)]
+    for sf_type_id, sf_type in sorted(fields.SF_TYPES.items()):
+        if sf_type.syntax is not None:
+            syntaxes.append(('field 0x{0:06X}'.format(sf_type_id), sf_type.syntax))
+    for t_id, triplet_type in sorted(triplets.TRIPLET_TYPES.items()):
+        syntaxes.append(('triplet 0x{0:02X}'.format(t_id), triplet_type.syntax))
+    for function, fn_info in sorted(functions.FUNCTIONS.items()):
+        syntaxes.append(('function 0x{0:02X}'.format(function), fn_info.syntax))
+    return syntaxes
+
+class CompilerTestCase(unittest.TestCase):
+    def setUp(self):
+        # Warnings about missing parameters would swamp the output
+        logging.disable(logging.WARNING)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def assert_same(self, data, syntax, strict=False, result=None, param_appearance_counters=None):
+        """Assert the compiled decoder and parse_syntax agree about data."""
+        parser_config = parser.ParserConfig(allow_unknown_triplets=True,
+                                            allow_unknown_functions=True,
+                                            strict=strict)
+        expected = _outcome(parser.parse_syntax,
+                            data,
+                            syntax,
+                            parser_config,
+                            None if result is None else dict(result),
+                            None if param_appearance_counters is None else dict(param_appearance_counters))
+        actual = _outcome(compiler.decode_syntax,
+                          data,
+                          syntax,
+                          parser_config,
+                          None if result is None else dict(result),
+                          None if param_appearance_counters is None else dict(param_appearance_counters))
+        self.assertEqual(actual, expected, 'decoding {0}'.format(list(data)))
+
+    def test_every_syntax(self):
+        rand = random.Random(0)
+        for description, syntax in _all_syntaxes():
+            with self.subTest(syntax=description):
+                for length in range(0, 64):
+                    for strict in (False, True):
+                        data = memoryview(bytes(rand.randrange(256) for i in range(length)))
+                        self.assert_same(data, syntax, strict=strict)
+
+    def test_truncated(self):
+        data = (afpdata.ebcdic('PAGE0001') + b'\x00\x00\x00\x01\x00\x02' +
+                afpdata.triplet(triplets.TT_02, b'\x01\x00' + afpdata.ebcdic('PAGE0001')))
+        syntax = fields.SF_TYPES[fields.SF_BPG].syntax
+        for n in range(len(data) + 1):
+            for strict in (False, True):
+                with self.subTest(length=n, strict=strict):
+                    self.assert_same(memoryview(data)[:n], syntax, strict=strict)
+
+    def test_remainder(self):
+        # The SFI extension is only decoded when the flag byte says so
+        for flag_byte in (0x00, 0x80):
+            data = afpdata.ubin(fields.SF_NOP, 3) + bytes((flag_byte, 0, 0, 4, 1, 2, 3))
+            for n in range(len(data) + 1):
+                with self.subTest(flag_byte=flag_byte, length=n):
+                    self.assert_same(memoryview(data)[:n], fields.SYNTAX_SFI)
+
+    def test_repeating_groups(self):
+        group = (b'\x01\x00\x00\x00' + afpdata.ebcdic('X0GT10', 8) +
+                 afpdata.ebcdic('T1V10500', 8) + afpdata.ebcdic('C0H20000', 8) + b'\x00\x00')
+        # Group length given before the group
+        data = afpdata.ubin(30, 1) + b'\x00\x00\x00' + group * 3
+        for n in range(len(data) + 1):
+            with self.subTest(syntax='MCF-1', length=n):
+                self.assert_same(memoryview(data)[:n], fields.SYNTAX_FIELD_MCF_1)
+        self.assert_same(b'\x00\x00\x00\x00' + group, fields.SYNTAX_FIELD_MCF_1)
+        # Group length given by the first parameter of each group
+        contents = afpdata.triplet(triplets.TT_02, b'\x86\x00' + afpdata.ebcdic('T1V10500'))
+        data = (afpdata.ubin(len(contents) + 2, 2) + contents) * 2
+        for n in range(len(data) + 1):
+            with self.subTest(syntax='MCF', length=n):
+                self.assert_same(memoryview(data)[:n], fields.SYNTAX_FIELD_MCF)
+        self.assert_same(b'\x00\x00' + contents, fields.SYNTAX_FIELD_MCF)
+        self.assert_same(b'\x00\xFF' + contents, fields.SYNTAX_FIELD_MCF)
+
+    def test_duplicate_names(self):
+        # The introducer's Reserved is already in the result, so the field's
+        # Reserved is numbered
+        sfi, n = parser.parse_syntax(afpdata.ubin(fields.SF_MCF_1, 3) + b'\x00\x00\x00',
+                                     fields.SYNTAX_SFI,
+                                     parser.ParserConfig())
+        param_appearance_counters = {name: 1 for name in sfi}
+        data = afpdata.ubin(30, 1) + b'\x00\x00\x00'
+        self.assert_same(data,
+                         fields.SYNTAX_FIELD_MCF_1,
+                         result=sfi,
+                         param_appearance_counters=param_appearance_counters)
+        result, n = compiler.decode_syntax(data,
+                                           fields.SYNTAX_FIELD_MCF_1,
+                                           parser.ParserConfig(),
+                                           dict(sfi),
+                                           dict(param_appearance_counters))
+        self.assertEqual(result['Reserved-2'], [0, 0, 0])
+        # A syntax naming the same parameter twice
+        syntax = [
+            fields.ParameterType(0, 1, fields.PTYPE_UBIN, 'Value', True,  None),
+            fields.ParameterType(1, 1, fields.PTYPE_UBIN, 'Value', True,  None),
+            fields.ParameterType(2, 1, fields.PTYPE_UBIN, 'Value', False, None),
+        ]
+        for n in range(4):
+            with self.subTest(length=n):
+                self.assert_same(b'\x01\x02\x03'[:n], syntax)
+        result, n = compiler.decode_syntax(b'\x01\x02\x03', syntax, parser.ParserConfig())
+        self.assertEqual(result, {'Value': 1, 'Value-2': 2, 'Value-3': 3})
+
+if __name__ == '__main__':
+    unittest.main()
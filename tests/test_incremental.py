@@ -0,0 +1,93 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Tests of the incremental parser.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import io
+import logging
+import unittest
+
+import afp
+
+from afp import exceptions
+from afp import fields
+
+from . import afpdata
+
+def _feed(data, chunk_size, **kwargs):
+    """Feed data to an IncrementalParser chunk_size bytes at a time."""
+    incremental_parser = afp.IncrementalParser(**kwargs)
+    structured_fields = []
+    for i in range(0, len(data), chunk_size):
+        structured_fields.extend(incremental_parser.feed(data[i:i + chunk_size]))
+    incremental_parser.close()
+    return structured_fields
+
+class IncrementalParserTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_same_as_load(self):
+        for carriage_control in (True, False):
+            data = afpdata.document(carriage_control=carriage_control)
+            expected = afp.load(io.BytesIO(data))
+            for chunk_size in (1, 2, 3, 7, len(data)):
+                with self.subTest(carriage_control=carriage_control, chunk_size=chunk_size):
+                    self.assertEqual(_feed(data, chunk_size), expected)
+
+    def test_filtered(self):
+        data = afpdata.document()
+        expected = afp.load(io.BytesIO(data), exclude=[fields.SF_NOP])
+        self.assertEqual(_feed(data, 5, exclude=[fields.SF_NOP]), expected)
+
+    def test_incomplete(self):
+        data = afpdata.document()
+        incremental_parser = afp.IncrementalParser()
+        structured_fields = incremental_parser.feed(data[:-1])
+        self.assertEqual(len(structured_fields), 4)
+        with self.assertRaises(exceptions.InvalidStructuredFieldError):
+            incremental_parser.close()
+
+    def test_error_after_fields(self):
+        bad_field = afpdata.structured_field(0xD3FFFF)
+        data = afpdata.document() + bad_field + afpdata.document()
+        incremental_parser = afp.IncrementalParser()
+        structured_fields = incremental_parser.feed(data)
+        self.assertEqual(structured_fields, afp.load(io.BytesIO(afpdata.document())))
+        with self.assertRaises(exceptions.UnrecognizedStructuredFieldError) as cm:
+            incremental_parser.feed(b'')
+        self.assertEqual(cm.exception.field_no, 6)
+        with self.assertRaises(exceptions.Error):
+            incremental_parser.feed(b'')
+
+    def test_error_held_until_close(self):
+        data = afpdata.document() + afpdata.structured_field(0xD3FFFF)
+        incremental_parser = afp.IncrementalParser()
+        self.assertEqual(len(incremental_parser.feed(data)), 5)
+        with self.assertRaises(exceptions.UnrecognizedStructuredFieldError):
+            incremental_parser.close()
+
+    def test_error_without_fields(self):
+        incremental_parser = afp.IncrementalParser()
+        with self.assertRaises(exceptions.UnrecognizedStructuredFieldError):
+            incremental_parser.feed(afpdata.structured_field(0xD3FFFF))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Tests of structured field padding.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import io
+import unittest
+
+import afp
+import afp.segments
+
+from afp import exceptions
+from afp import fields
+
+from . import afpdata
+
+def _without_introducer(sf):
+    """Return the parameters of a parsed structured field other than those
+    that padding changes.
+    """
+    return {name: value for name, value in sf.items()
+            if name not in (fields.PNAME_SF_LENGTH, fields.PNAME_FLAG_BYTE)}
+
+class PaddingTestCase(unittest.TestCase):
+    def assert_padding_ignored(self, pad, lazy=False):
+        unpadded = afp.load(io.BytesIO(afpdata.structured_field(fields.SF_BDT, afpdata.BDT_DATA)))
+        padded = afp.load(io.BytesIO(afpdata.structured_field(fields.SF_BDT, afpdata.BDT_DATA, pad=pad)), lazy=lazy)
+        self.assertEqual(_without_introducer(padded[0]), _without_introducer(unpadded[0]))
+        self.assertEqual(padded[0][fields.PNAME_SF_LENGTH], unpadded[0][fields.PNAME_SF_LENGTH] + pad)
+        self.assertTrue(fields.sfi_pad_flag(padded[0][fields.PNAME_FLAG_BYTE]))
+
+    def test_short_padding(self):
+        for pad in (1, 2, 255):
+            with self.subTest(pad=pad):
+                self.assert_padding_ignored(pad)
+
+    def test_long_padding(self):
+        for pad in (256, 1000):
+            with self.subTest(pad=pad):
+                self.assert_padding_ignored(pad)
+
+    def test_lazy(self):
+        self.assert_padding_ignored(10, lazy=True)
+
+    def test_padding_too_long(self):
+        data = bytearray(afpdata.structured_field(fields.SF_NOP, b'\x01\x02', pad=1))
+        data[-1] = 10
+        with self.assertRaises(exceptions.InvalidStructuredFieldError):
+            afp.load(io.BytesIO(bytes(data)))
+
+    def test_segments(self):
+        data = (afpdata.structured_field(fields.SF_NOP, b'\x01\x02', flag_byte=fields.SFI_SEG_FLAG, pad=3) +
+                afpdata.structured_field(fields.SF_NOP, b'\x03\x04', pad=300))
+        structured_fields = list(afp.segments.stream(io.BytesIO(data)))
+        self.assertEqual(len(structured_fields), 1)
+        self.assertEqual(structured_fields[0]['UndfData'], [1, 2, 3, 4])
+
+    def test_written_without_padding(self):
+        data = afpdata.structured_field(fields.SF_NOP, afpdata.ebcdic('COMMENT'), pad=10)
+        f = io.BytesIO()
+        afp.write(f, afp.load(io.BytesIO(data)))
+        self.assertEqual(f.getvalue(), afpdata.structured_field(fields.SF_NOP, afpdata.ebcdic('COMMENT')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Tests of parsing a file across a pool of worker processes.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import logging
+import os
+import tempfile
+import unittest
+
+import afp
+import afp.parallel
+
+from afp import exceptions
+from afp import fields
+
+from . import afpdata
+
+def _collect(structured_fields):
+    """Return the structured fields of a generator and the ParseError that
+    stopped it, or None.
+    """
+    result = []
+    try:
+        for sf in structured_fields:
+            result.append(sf)
+    except exceptions.ParseError as e:
+        return result, e
+    return result, None
+
+class ParallelTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'test.afp')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        logging.disable(logging.NOTSET)
+
+    def write(self, data):
+        with open(self.path, 'wb') as f:
+            f.write(data)
+
+    def test_same_as_stream(self):
+        self.write(afpdata.document() * 10)
+        self.assertEqual(afp.parallel.load(self.path, workers=2, chunk_size=64), afp.load(self.path))
+
+    def test_error_mid_chunk(self):
+        # The unknown structured field follows the BDT and BPG of the third
+        # document, more than one chunk into the file
+        bad_field = afpdata.structured_field(0xD3FFFF)
+        data = afpdata.document() * 2 + afpdata.document()[:42] + bad_field + afpdata.document() * 2
+        self.write(data)
+        expected, expected_error = _collect(afp.stream(self.path))
+        actual, error = _collect(afp.parallel.stream(self.path, workers=2, chunk_size=64))
+        self.assertEqual(len(expected), 12)
+        self.assertEqual(actual, expected)
+        self.assertIsInstance(error, exceptions.UnrecognizedStructuredFieldError)
+        self.assertEqual((error.field_no, error.field_start_offset),
+                         (expected_error.field_no, expected_error.field_start_offset))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Tests of the parser's recover mode.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import io
+import logging
+import unittest
+
+import afp
+
+from afp import exceptions
+from afp import fields
+
+from . import afpdata
+
+UNKNOWN_SF_TYPE_ID = 0xD3FFFF
+
+def _nops(n, carriage_control=True, bad=None, bad_field=None):
+    """Return n NOP structured fields, the one numbered bad (from 0) replaced
+    by the bytes bad_field.
+    """
+    data = b''
+    for i in range(n):
+        if i == bad:
+            data += bad_field
+        else:
+            data += afpdata.structured_field(fields.SF_NOP,
+                                             afpdata.ebcdic('NOP{0}'.format(i)),
+                                             carriage_control=carriage_control)
+    return data
+
+class RecoverTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def load(self, data):
+        recovery = afp.Recovery()
+        structured_fields = afp.load(io.BytesIO(data), recover=recovery)
+        return structured_fields, recovery
+
+    def test_no_errors(self):
+        data = _nops(5)
+        structured_fields, recovery = self.load(data)
+        self.assertEqual(structured_fields, afp.load(io.BytesIO(data)))
+        self.assertEqual(recovery.skipped, [])
+
+    def test_intact_field_in_error(self):
+        for carriage_control in (True, False):
+            with self.subTest(carriage_control=carriage_control):
+                bad_field = afpdata.structured_field(UNKNOWN_SF_TYPE_ID,
+                                                     b'\x01\x02',
+                                                     carriage_control=carriage_control)
+                data = _nops(20, carriage_control=carriage_control, bad=1, bad_field=bad_field)
+                with self.assertRaises(exceptions.UnrecognizedStructuredFieldError):
+                    afp.load(io.BytesIO(data))
+                structured_fields, recovery = self.load(data)
+                self.assertEqual(len(structured_fields), 19)
+                self.assertEqual([sf['UndfData'] for sf in structured_fields[:2]],
+                                 [list(afpdata.ebcdic('NOP0')), list(afpdata.ebcdic('NOP2'))])
+                self.assertEqual(len(recovery.skipped), 1)
+                skipped = recovery.skipped[0]
+                self.assertEqual(skipped.field_no, 2)
+                self.assertEqual(skipped.end - skipped.start, len(bad_field))
+                self.assertIsInstance(skipped.error, exceptions.UnrecognizedStructuredFieldError)
+
+    def test_corrupt_length(self):
+        bad_field = bytearray(afpdata.structured_field(fields.SF_NOP, b'\x01\x02'))
+        bad_field[2] += 100
+        data = _nops(10, bad=3, bad_field=bytes(bad_field))
+        structured_fields, recovery = self.load(data)
+        self.assertEqual(len(structured_fields), 9)
+        self.assertEqual(recovery.bytes_skipped, len(bad_field))
+
+    def test_truncated_extension(self):
+        # The extension flag is set but the introducer ends before ExtLength
+        bad_field = b'\x5A' + afpdata.ubin(8, 2) + afpdata.ubin(fields.SF_NOP, 3) + b'\x80\x00\x00'
+        data = _nops(5, bad=2, bad_field=bad_field)
+        structured_fields, recovery = self.load(data)
+        self.assertEqual(len(structured_fields), 4)
+        self.assertIsInstance(recovery.errors[0], exceptions.InvalidStructuredFieldError)
+
+    def test_truncated_file(self):
+        data = _nops(5)[:-3]
+        structured_fields, recovery = self.load(data)
+        self.assertEqual(len(structured_fields), 4)
+        self.assertEqual(recovery.skipped[0].end, len(data))
+
+if __name__ == '__main__':
+    unittest.main()
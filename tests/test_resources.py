@@ -0,0 +1,74 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Tests of the resource index and cache.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import os
+import tempfile
+import unittest
+
+import afp
+
+from afp import fields
+from afp import records
+from afp import resources
+from afp import triplets
+
+from . import afpdata
+
+def _resource_file(path):
+    """Write an AFP file holding an overlay resource to path."""
+    obj_type = afpdata.triplet(triplets.TT_21, bytes((resources.OBJ_TYPE_OVERLAY,)) + bytes(7))
+    with open(path, 'wb') as f:
+        f.write(afpdata.structured_field(fields.SF_BRG, afpdata.ebcdic('GROUP', 8)) +
+                afpdata.structured_field(fields.SF_BRS, afpdata.ebcdic('O1FORM', 8) + b'\x00\x00' + obj_type) +
+                afpdata.structured_field(fields.SF_NOP, afpdata.ebcdic('OVERLAY')) +
+                afpdata.structured_field(fields.SF_ERS, afpdata.ebcdic('O1FORM', 8)) +
+                afpdata.structured_field(fields.SF_ERG, afpdata.ebcdic('GROUP', 8)))
+
+class ResourceFileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'resources.afp')
+        _resource_file(self.path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_cached(self):
+        cache = resources.ResourceCache()
+        with afp.open_resources(self.path, cache=cache) as first, \
+             afp.open_resources(self.path, cache=cache) as second:
+            overlay = first.get('O1FORM', resources.OBJ_TYPE_OVERLAY)
+            self.assertEqual([sf[fields.PNAME_SF_TYPE_ID] for sf in overlay],
+                             [fields.SF_BRS, fields.SF_NOP, fields.SF_ERS])
+            self.assertIs(second.get('O1FORM', resources.OBJ_TYPE_OVERLAY), overlay)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_cached_per_parser_settings(self):
+        cache = resources.ResourceCache()
+        with afp.open_resources(self.path, cache=cache) as plain, \
+             afp.open_resources(self.path, cache=cache, compact=True) as compact:
+            overlay = plain.get('O1FORM')
+            compact_overlay = compact.get('O1FORM')
+        self.assertEqual(len(cache), 2)
+        self.assertIsInstance(overlay[0], dict)
+        self.assertIsInstance(compact_overlay[0], records.Record)
+        self.assertEqual([dict(sf) for sf in compact_overlay], overlay)
+
+if __name__ == '__main__':
+    unittest.main()
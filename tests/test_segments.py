@@ -0,0 +1,117 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Tests of the reassembly of segmented structured fields.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import io
+import logging
+import unittest
+
+import afp
+import afp.segments
+
+from afp import exceptions
+from afp import fields
+
+from . import afpdata
+
+def _segments(chunks, sf_type_id=fields.SF_NOP):
+    """Return a run of segments of a structured field holding each of chunks
+    in turn.
+    """
+    return b''.join(afpdata.structured_field(sf_type_id,
+                                             chunk,
+                                             flag_byte=fields.SFI_SEG_FLAG if i < len(chunks) - 1 else 0x00)
+                    for i, chunk in enumerate(chunks))
+
+CHUNKS = [b'\x01\x02', b'\x03\x04\x05', b'\x06']
+
+def _file():
+    """Return an AFP file with a run of segments between a BPG and an EPG."""
+    return (afpdata.structured_field(fields.SF_BPG, afpdata.ebcdic('PAGE1', 8)) +
+            _segments(CHUNKS) +
+            afpdata.structured_field(fields.SF_EPG, afpdata.ebcdic('PAGE1', 8)))
+
+class SegmentsTestCase(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_joined(self):
+        structured_fields = list(afp.segments.stream(io.BytesIO(_file())))
+        self.assertEqual([sf[fields.PNAME_SF_TYPE_ID] for sf in structured_fields],
+                         [fields.SF_BPG, fields.SF_NOP, fields.SF_EPG])
+        self.assertEqual(structured_fields[1]['UndfData'], [1, 2, 3, 4, 5, 6])
+        self.assertFalse(fields.sfi_seg_flag(structured_fields[1][fields.PNAME_FLAG_BYTE]))
+
+    def test_unsegmented(self):
+        data = afpdata.rich_document()
+        self.assertEqual(list(afp.segments.stream(io.BytesIO(data))), afp.load(io.BytesIO(data)))
+
+    def test_field_numbers(self):
+        structured_fields = list(afp.segments.stream(io.BytesIO(_file()), lazy=True))
+        self.assertEqual([sf.field_no for sf in structured_fields], [1, 2, 5])
+        self.assertEqual([sf.field_start_offset for sf in structured_fields], [0, 17, 17 + 11 + 12 + 10])
+
+    def test_chunked(self):
+        structured_fields = afp.segments.stream(io.BytesIO(_file()), chunked=True)
+        self.assertEqual(next(structured_fields)[fields.PNAME_SF_TYPE_ID], fields.SF_BPG)
+        segmented = next(structured_fields)
+        self.assertIsInstance(segmented, afp.segments.SegmentedField)
+        self.assertEqual((segmented.sf_type_id, segmented.field_no), (fields.SF_NOP, 2))
+        self.assertEqual([bytes(chunk) for chunk in segmented.chunks()], CHUNKS)
+        self.assertEqual(segmented.segment_count, 3)
+        with self.assertRaises(afp.Error):
+            list(segmented.chunks())
+        self.assertEqual(next(structured_fields)[fields.PNAME_SF_TYPE_ID], fields.SF_EPG)
+
+    def test_chunked_unread(self):
+        # Segments that aren't read are skipped
+        for chunks_read in (0, 1, 2):
+            with self.subTest(chunks_read=chunks_read):
+                structured_fields = afp.segments.stream(io.BytesIO(_file()), chunked=True)
+                next(structured_fields)
+                segmented = next(structured_fields)
+                chunks = segmented.chunks()
+                for i in range(chunks_read):
+                    next(chunks)
+                self.assertEqual(next(structured_fields)[fields.PNAME_SF_TYPE_ID], fields.SF_EPG)
+                self.assertEqual(segmented.segment_count, 3)
+
+    def test_not_continued(self):
+        data = (afpdata.structured_field(fields.SF_NOP, CHUNKS[0], flag_byte=fields.SFI_SEG_FLAG) +
+                afpdata.structured_field(fields.SF_EPG, afpdata.ebcdic('PAGE1', 8)))
+        with self.assertRaises(exceptions.InvalidStructuredFieldError) as cm:
+            list(afp.segments.stream(io.BytesIO(data)))
+        self.assertIn('not continued', str(cm.exception))
+        self.assertEqual((cm.exception.field_no, cm.exception.field_start_offset), (2, 11))
+
+    def test_eof_within_run(self):
+        data = afpdata.structured_field(fields.SF_NOP, CHUNKS[0], flag_byte=fields.SFI_SEG_FLAG)
+        for chunked in (False, True):
+            with self.subTest(chunked=chunked):
+                with self.assertRaises(exceptions.InvalidStructuredFieldError) as cm:
+                    for sf in afp.segments.stream(io.BytesIO(data), chunked=chunked):
+                        if chunked:
+                            list(sf.chunks())
+                self.assertIn('End of file', str(cm.exception))
+                self.assertEqual((cm.exception.field_no, cm.exception.field_start_offset), (2, len(data)))
+
+if __name__ == '__main__':
+    unittest.main()
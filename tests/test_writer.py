@@ -0,0 +1,58 @@
+"""Python package for reading AFP (Advanced Function Presentation) files.
+
+   Tests of the writer.
+
+   Copyright 2016 Matthew NEALE
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import io
+import unittest
+
+import afp
+
+from afp import fields
+
+from . import afpdata
+
+def _write(structured_fields):
+    """Write structured fields and return the bytes written."""
+    f = io.BytesIO()
+    afp.write(f, structured_fields)
+    return f.getvalue()
+
+class WriterTestCase(unittest.TestCase):
+    def test_round_trip(self):
+        data = afpdata.rich_document()
+        structured_fields = afp.load(io.BytesIO(data))
+        self.assertEqual(_write(structured_fields), data)
+
+    def test_round_trip_compact(self):
+        data = afpdata.rich_document()
+        self.assertEqual(_write(afp.load(io.BytesIO(data), compact=True)), data)
+
+    def test_lazy_copied(self):
+        data = afpdata.rich_document()
+        self.assertEqual(_write(afp.stream(io.BytesIO(data), lazy=True)), data)
+
+    def test_lengths_recalculated(self):
+        structured_fields = afp.load(io.BytesIO(afpdata.rich_document()))
+        nop = structured_fields[7]
+        nop['UndfData'] = list(afpdata.ebcdic('A LONGER COMMENT'))
+        reloaded = afp.load(io.BytesIO(_write(structured_fields)))
+        self.assertEqual(reloaded[7]['UndfData'], nop['UndfData'])
+        self.assertEqual(reloaded[7][fields.PNAME_SF_LENGTH], 8 + len(nop['UndfData']))
+
+if __name__ == '__main__':
+    unittest.main()